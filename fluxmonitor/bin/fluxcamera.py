@@ -10,6 +10,9 @@ from fluxmonitor.launcher import deamon_entry
 
 def main(params=None):
     parser = argparse.ArgumentParser(description='flux camera deamon')
+    parser.add_argument('--dump-dir', dest='dump_dir', type=str,
+                        default=None,
+                        help='Save analysed frames to this directory')
     add_daemon_arguments("fluxcamerad", parser)
 
     options = parser.parse_args(params)
@@ -13,6 +13,13 @@ def main(params=None):
     parser.add_argument('-c', '--cloud', dest='cloud', type=str,
                         default='https://neuron.fluxmach.com',
                         help='Set cloud endpoint')
+    parser.add_argument('--shadow-window', dest='shadow_window', type=float,
+                        default=6.0,
+                        help='Coalesce shadow updates in seconds while '
+                             'device is monitored')
+    parser.add_argument('--shadow-budget', dest='shadow_budget', type=int,
+                        default=1024,
+                        help='Max shadow update payload size in bytes')
 
     add_daemon_arguments("fluxcloudd", parser)
 
@@ -90,10 +90,10 @@ def try_config_network(dryrun=False):
 
         from ConfigParser import RawConfigParser
         from fluxmonitor.security import get_serial
-        from fluxmonitor.storage import Storage
+        from fluxmonitor.storage import meta_storage
         from hashlib import md5
 
-        storage = Storage("general", "meta")
+        storage = meta_storage()
         with open("/media/usb/config_flux.txt") as f:
             h = md5(f.read()).hexdigest()
             print("Fingerprint local=%s, disk=%s" %
@@ -16,6 +16,9 @@ def main(params=None):
                         help='Listen control socket at')
     parser.add_argument('--task', dest='taskfile', type=str, required=True,
                         help='F-Code to play')
+    parser.add_argument('--perf-log', dest='perf_log', type=str,
+                        default=None,
+                        help='Append performance counters to this file')
 
     options = parser.parse_args(params)
     apply_daemon_arguments(options)
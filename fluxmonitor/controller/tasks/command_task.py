@@ -20,7 +20,8 @@ from fluxmonitor.err_codes import (UNKNOWN_COMMAND, NOT_EXIST, TOO_LARGE,
 from fluxmonitor.diagnosis.god_mode import allow_god_mode
 from fluxmonitor.hal.net.monitor import Monitor as NetworkMonitor
 from fluxmonitor.hal.misc import get_deviceinfo
-from fluxmonitor.storage import Storage, UserSpace, Preference, metadata
+from fluxmonitor.storage import (Storage, UserSpace, Preference, metadata,
+                                meta_storage)
 from fluxmonitor.config import DEFAULT_H
 from fluxmonitor.misc import mimetypes
 
@@ -253,20 +254,20 @@ class PlayManagerMixIn(object):
 
     def __play_pause(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.pause())
+        manager.pause(handler.send_text)
 
     def __play_resume(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.resume())
+        manager.resume(handler.send_text)
 
     def __play_abort(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.abort())
+        manager.abort(handler.send_text)
 
     def __play_quit(self, handler):
         manager = self.__get_manager()
         if manager.is_terminated:
-            handler.send_text(manager.quit())
+            manager.quit(handler.send_text)
         else:
             raise RuntimeError(RESOURCE_BUSY)
 
@@ -288,10 +289,12 @@ class PlayManagerMixIn(object):
         handler.async_send_binary("text/json", len(metabuf), BytesIO(metabuf),
                                   end_meta__send_img)
 
-    def __play_report(self, handler):
+    def __play_report(self, handler, *args):
         component = self.stack.kernel.exclusive_component
-        if isinstance(component, PlayerManager):
-            handler.send_text(component.report())
+        if args and args[0] == "perf":
+            self.__get_manager().report_perf(handler.send_text)
+        elif isinstance(component, PlayerManager):
+            component.report(handler.send_text)
         elif component:
             handler.send_text('{"st_id": %i, "st_label": "OCCUPIED", '
                               '"info": "%s"}' % (component.st_id,
@@ -301,37 +304,37 @@ class PlayManagerMixIn(object):
 
     def __play_set_toolhead_operating(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.set_toolhead_operating())
+        manager.set_toolhead_operating(handler.send_text)
 
     def __play_set_toolhead_standby(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.set_toolhead_standby())
+        manager.set_toolhead_standby(handler.send_text)
 
     def __play_load_filament(self, handler, index):
         if index != "0":
             raise RuntimeError(BAD_PARAMS)
         else:
             manager = self.__get_manager()
-            handler.send_text(manager.load_filament(index))
+            manager.load_filament(index, handler.send_text)
 
     def __play_unload_filament(self, handler, index):
         if index != "0":
             raise RuntimeError(BAD_PARAMS)
         else:
             manager = self.__get_manager()
-            handler.send_text(manager.unload_filament(index))
+            manager.unload_filament(index, handler.send_text)
 
     def __set_toolhead_header(self, handler, index, temp):
         if index != "0":
             raise RuntimeError(BAD_PARAMS)
         else:
             manager = self.__get_manager()
-            handler.send_text(
-                manager.set_toolhead_header(int(index), float(temp)))
+            manager.set_toolhead_header(int(index), float(temp),
+                                        handler.send_text)
 
     def __play_press_button(self, handler):
         manager = self.__get_manager()
-        handler.send_text(manager.press_button())
+        manager.press_button(handler.send_text)
 
     def dispatch_playmanage_cmd(self, handler, cmd, *args):
         if cmd == "pause":
@@ -341,7 +344,7 @@ class PlayManagerMixIn(object):
         elif cmd == "abort":
             self.__play_abort(handler)
         elif cmd == "report":
-            self.__play_report(handler)
+            self.__play_report(handler, *args)
         elif cmd == "select":
             self.__select_file(handler, *args)
         elif cmd == "info":
@@ -438,7 +441,7 @@ class ConfigMixIn(object):
             raise RuntimeError(UNKNOWN_COMMAND)
 
     def __config_set(self, key, val):
-        storage = Storage("general", "meta")
+        storage = meta_storage()
         if key in self.__VALUES:
             struct = self.__VALUES[key]
 
@@ -491,7 +494,7 @@ class ConfigMixIn(object):
             raise RuntimeError(BAD_PARAMS)
 
     def __config_get(self, key):
-        storage = Storage("general", "meta")
+        storage = meta_storage()
         if key in self.__VALUES:
             struct = self.__VALUES[key]
             if hasattr(metadata, struct["key"]):
@@ -510,7 +513,7 @@ class ConfigMixIn(object):
             raise RuntimeError(BAD_PARAMS)
 
     def __config_del(self, key):
-        storage = Storage("general", "meta")
+        storage = meta_storage()
         if key in self.__VALUES:
             struct = self.__VALUES[key]
             if hasattr(metadata, struct["key"]):
@@ -606,7 +609,7 @@ class CommandTask(CommandMixIn, PlayManagerMixIn, FileManagerMixIn,
             elif cmd == "cloud_validation_code":
                 self.cloud_validation_code(handler)
             elif cmd == "oracle":
-                s = Storage("general", "meta")
+                s = meta_storage()
                 s["debug"] = args[0].encode("utf8")
                 handler.send_text("oracle")
             elif cmd == "fetch_log":
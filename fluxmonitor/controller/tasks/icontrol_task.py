@@ -1,8 +1,10 @@
 
 from collections import deque
 from logging import getLogger
+from math import isinf, isnan
 from weakref import proxy
 import socket
+import struct
 
 from msgpack import Unpacker, packb
 
@@ -16,6 +18,7 @@ from fluxmonitor.player.head_controller import (HeadController,
 
 
 from fluxmonitor.err_codes import SUBSYSTEM_ERROR
+from fluxmonitor.misc.systime import systime as time
 
 # from fluxmonitor.player import macro
 from fluxmonitor.storage import Metadata
@@ -34,6 +37,9 @@ logger = getLogger(__name__)
 #     Exec result:
 #       (0x00 ~ 0xfe, params_0, params_1, ..., keywords_dict)
 #
+# Batch commands (CMD_MOVB) carry N commands and take N indexes, next
+# command index is INDEX + N.
+#
 # Example:
 # SEND -> (0, CMD_G028)
 # SEND -> (1, CMD_G001, {"X": 3.2, "F": 10})     # Correct command
@@ -51,11 +57,16 @@ logger = getLogger(__name__)
 #
 #
 # UDP Connection part
-#   (i:0, s:salt, i:cmd_index, i:queued_size)
+#   Messages are sent when they changed, at most once each telemetry interval,
+#   and resent every heartbeat even if nothing changed. See CMD_TLMY.
+#
+#   (i:0, s:salt, i:cmd_index, i:queued_size[, a:position])
 #       * First integer 0 means it is a status message
 #       * salt: reserved
 #       * cmd_index: next command index should given
 #       * queued_size: command is waitting to be execute in system
+#       * position: (X, Y, Z) after queued moves or nil if unknown, only
+#         appended if TLMY_POSITION is requested
 #
 #   (i:1, s:salt, i:timestamp, i:head_error_code, obj:headstatus)
 #       * First integer 1 means it is a toolhead status message
@@ -81,6 +92,22 @@ CMD_G001 = 0x01
 # E1, E2, E3 can not set at same time
 # Dict must contains at least 1 key/value, otherwhise will get operation error
 
+CMD_MOVB = 0x04
+# Batched move
+# (a:fields, b:moves)
+#
+# fields: keys of each move, subset of F, X, Y, Z, E0, E1, E2. Only one of
+#         E0, E1, E2 can be given
+# moves: little-endian float32 array, len(fields) values for each move
+#
+# Example: fields = ("F", "X", "Y"), moves = pack("<6f", 600, 1, 1, 600, 2, 2)
+#          equals to (i, CMD_G001, {"F": 600, "X": 1, "Y": 1}) followed by
+#          (i + 1, CMD_G001, {"F": 600, "X": 2, "Y": 2})
+#
+# The whole batch is validated before queued, if any move is invalid or over
+# limit, nothing is queued and cmd index will not shift.
+# At most MOVB_MAX_SIZE moves in a batch.
+
 CMD_G004 = 0x02
 # Sleep (seconds)
 # (f:seconds)
@@ -152,6 +179,18 @@ CMD_THRC = 0x5e
 # Send raw command to toolhead, only vaild when toolhead type is USER/*
 # (s:command)
 
+CMD_THRP = 0x5d
+# Push toolhead raw response as they arrive, only valid when toolhead type is
+# USER/*
+# (i:enable)
+#    => (0x5d, i:seq, ["RESPONSE seq", "RESPONSE seq + 1", ...])
+#
+# seq: sequence number of first response in message. Each pushed response
+#      takes one sequence number from 0, a gap means responses were dropped
+#      because more then HEAD_RESP_MAXLEN responses were waiting.
+# Responses stacked before enabled are pushed immediately. CMD_REQH resets
+# sequence number and disables push.
+
 CMD_THRR = 0x5f
 # Recv raw command data from toolhead, only valid when toolhead type is USER/*
 # ()
@@ -200,6 +239,21 @@ CMD_CLHE = 0xf3
 # When toolhead raise an error, this error will appear in UDP message frame
 # until this command send.
 
+CMD_TLMY = 0xf4
+# Set UDP telemetry rate and fields
+# (f:interval, f:heartbeat, i:fields)
+#
+# interval: minimum seconds between two messages of the same type, a change
+#           is sent immediately if interval is reached
+# heartbeat: resend period of unchanged messages
+# fields is a composite bit
+# Bit 0: Status message (type 0)
+# Bit 1: Toolhead status message (type 1)
+# Bit 2: User toolhead status message (type 2)
+# Bit 3: Append position to status message
+#
+# operation error raised if interval or heartbeat out of range
+
 CMD_QUIT = 0xfe
 # Quit iContrl
 #              => (0xfe, i:ST)
@@ -219,6 +273,26 @@ MSG_UNKNOWN_ERROR = 0xff
 TARGET_MAINBOARD = 0
 TARGET_TOOLHEAD = 1
 
+HEAD_RESP_MAXLEN = 32
+
+TLMY_STATUS = 1
+TLMY_TOOLHEAD = 2
+TLMY_HEAD_RESP = 4
+TLMY_POSITION = 8
+TLMY_DEFAULT_FIELDS = TLMY_STATUS | TLMY_TOOLHEAD | TLMY_HEAD_RESP
+TLMY_DEFAULT_INTERVAL = 0.1
+TLMY_DEFAULT_HEARTBEAT = 1.0
+TLMY_MIN_INTERVAL = 0.01
+TLMY_MAX_HEARTBEAT = 60.0
+
+MOVB_FIELDS = {"F": "F%i", "X": "X%.5f", "Y": "Y%.5f", "Z": "Z%.5f",
+               "E0": "E%.5f", "E1": "E%.5f", "E2": "E%.5f"}
+MOVB_MAX_SIZE = 1024
+
+
+def is_valid_position(x, y, z):
+    return x ** 2 + y ** 2 <= 28900 and z <= 240 and z >= 0
+
 
 class IControlTask(DeviceOperationMixIn):
     st_id = -3  # Device status ID
@@ -231,6 +305,9 @@ class IControlTask(DeviceOperationMixIn):
     mainboard = None  # Mainborad Controller
     toolhead = None  # Headboard Controller
     head_resp_stack = None  # Toolhead raw rasponse stack
+    head_resp_push = False  # Push toolhead raw response to client
+    head_resp_seq = 0  # Sequence number of next pushed toolhead response
+    telemetry = None  # UDP message rate control
 
     def __init__(self, stack, handler):
         super(IControlTask, self).__init__(stack, handler)
@@ -260,6 +337,7 @@ class IControlTask(DeviceOperationMixIn):
 
         self.mainboard.bootstrap(on_mainboard_ready)
         self.unpacker = Unpacker()
+        self.telemetry = Telemetry(stack.loop, self.send_udp)
 
     def on_toolhead_ready(self, ctrl):
         self._ready |= 2
@@ -270,16 +348,33 @@ class IControlTask(DeviceOperationMixIn):
 
     def on_mainboard_empty(self, caller):
         self.fire()
+        self.send_udp0()
 
     def on_mainboard_sendable(self, caller):
         self.fire()
+        self.send_udp0()
 
     def toolhead_message_callback(self, sender, data):
-        if data and self.head_resp_stack is not None and \
-                len(self.head_resp_stack) <= 32:
+        if not data or self.head_resp_stack is None:
+            return
+
+        if self.head_resp_push:
+            # Keep newest responses, sequence number shows the gap
+            self.head_resp_stack.append(data)
+            self.head_resp_seq += 1
+            if len(self.head_resp_stack) > HEAD_RESP_MAXLEN:
+                del self.head_resp_stack[0]
+        elif len(self.head_resp_stack) < HEAD_RESP_MAXLEN:
             self.head_resp_stack.append(data)
             self.send_udp1(sender)
 
+    def push_head_resp(self):
+        # Responses arrived in one toolhead read are sent in one message
+        if self.head_resp_push and self.head_resp_stack:
+            seq = self.head_resp_seq - len(self.head_resp_stack)
+            self.handler.send(packb((CMD_THRP, seq, self.head_resp_stack)))
+            self.head_resp_stack = []
+
     def on_binary(self, buf, handler):
         self.unpacker.feed(buf)
         for payload in self.unpacker:
@@ -292,12 +387,10 @@ class IControlTask(DeviceOperationMixIn):
 
         fn = CMD_MATRIX.get(cmd)
         try:
-            if cmd < 0xf0:
-                fn(self, handler, *params)
-            else:
-                fn(self, handler, *params)
-
-            self.cmd_index += 1
+            # Batch command returns how many commands it carried
+            size = fn(self, handler, *params)
+            self.cmd_index += size if size else 1
+            self.send_udp0()
 
         except InternalError as e:
             self.handler.send(packb((0xff, self.cmd_index, e[1])))
@@ -308,7 +401,8 @@ class IControlTask(DeviceOperationMixIn):
             self.on_require_kill(handler)
 
     def fire(self):
-        if self.cmd_queue:
+        # Fill mainboard window instead of one command each callback
+        while self.cmd_queue:
             target, cmd = self.cmd_queue[0]
             if target == TARGET_MAINBOARD:
                 if self.mainboard.queue_full:
@@ -317,13 +411,12 @@ class IControlTask(DeviceOperationMixIn):
                     self.cmd_queue.popleft()
                     self.mainboard.send_cmd(cmd)
             elif target == TARGET_TOOLHEAD:
-                if self.mainboard.buffered_cmd_size == 0:
-                    if self.toolhead.sendable():
-                        self.cmd_queue.popleft()
-                        # TODO
-                        self.toolhead.send_cmd(cmd, self)
-                else:
-                    return
+                if self.mainboard.buffered_cmd_size == 0 and \
+                        self.toolhead.sendable():
+                    self.cmd_queue.popleft()
+                    # TODO
+                    self.toolhead.send_cmd(cmd, self)
+                return
 
     def on_mainboard_message(self, watcher, revent):
         try:
@@ -331,15 +424,17 @@ class IControlTask(DeviceOperationMixIn):
         except IOError:
             logger.error("Mainboard connection broken")
             self.stack.exit_task(self)
-            self.send_udp0()
+            self.send_udp0(force=True)
         except Exception:
             logger.exception("Unhandle Error")
 
     def on_headboard_message(self, watcher, revent):
         try:
             self.toolhead.handle_recv()
+            self.push_head_resp()
             check_toolhead_errno(self.toolhead, self.th_error_flag)
             self.fire()
+            self.send_udp1(self.toolhead)
 
         except IOError:
             logger.error("Headboard connection broken")
@@ -364,6 +459,7 @@ class IControlTask(DeviceOperationMixIn):
             else:
                 self.handler.send(packb((CMD_G028, 0, position)))
                 self.known_position = [0, 0, 240]
+                self.send_udp0()
 
         #   "DATA READ X:0.124 Y:0.234 Z:0.534 F0:1 F1:0 MB:0"
         if message.startswith("DATA READ "):
@@ -380,36 +476,40 @@ class IControlTask(DeviceOperationMixIn):
         if message.startswith("DATA ZPROBE "):
             self.handler.send(packb((CMD_G030, float(message[12:]))))
 
-    def send_udp0(self):
+    def send_udp(self, buf):
         if self.udp_sock:
             try:
-                buf = packb((0, "", self.cmd_index, self.buflen))
                 self.udp_sock.send(buf)
             except socket.error:
                 pass
 
-    def send_udp1(self, toolhead):
-        if self.udp_sock:
-            try:
-                if self.head_resp_stack is not None:
-                    buf = packb((2, "", 0, len(self.head_resp_stack)))
-                    self.udp_sock.send(buf)
-
-                if toolhead.ready:
-                    buf = packb((1, "", 0, toolhead.error_code,
-                                toolhead.status))
-                    self.udp_sock.send(buf)
+    def send_udp0(self, force=False):
+        telemetry = self.telemetry
+        if self.udp_sock and telemetry.fields & TLMY_STATUS:
+            if telemetry.fields & TLMY_POSITION:
+                buf = packb((0, "", self.cmd_index, self.buflen,
+                             self.known_position))
+            else:
+                buf = packb((0, "", self.cmd_index, self.buflen))
+            telemetry.update(0, buf, force)
 
-                # elif toolhead.ready_flag > 0:
-                #     buf = packb((1, "", 0, -1, {}))
-                #     self.udp_sock.send(buf)
+    def send_udp1(self, toolhead):
+        telemetry = self.telemetry
+        if not self.udp_sock:
+            return
 
-                else:
-                    buf = packb((1, "", 0, -2, {}))
-                    self.udp_sock.send(buf)
+        if self.head_resp_stack is not None and \
+                telemetry.fields & TLMY_HEAD_RESP:
+            telemetry.update(2, packb((2, "", 0, len(self.head_resp_stack))))
 
-            except socket.error:
-                pass
+        if telemetry.fields & TLMY_TOOLHEAD:
+            if toolhead.ready:
+                buf = packb((1, "", 0, toolhead.error_code, toolhead.status))
+            # elif toolhead.ready_flag > 0:
+            #     buf = packb((1, "", 0, -1, {}))
+            else:
+                buf = packb((1, "", 0, -2, {}))
+            telemetry.update(1, buf)
 
     def send_udps(self, signal):
         if self.udp_sock:
@@ -422,9 +522,11 @@ class IControlTask(DeviceOperationMixIn):
         self.meta.update_device_status(self.st_id, 0, "N/A",
                                        self.handler.address)
 
+        # Messages are sent only if changed or heartbeat required, timing of
+        # changes is handled by telemetry itself.
+        self.push_head_resp()
         self.send_udp0()
-        if not self._ready & 2:
-            self.send_udp1(self.toolhead)
+        self.send_udp1(self.toolhead)
 
         try:
             self.mainboard.patrol()
@@ -457,6 +559,7 @@ class IControlTask(DeviceOperationMixIn):
 
     def clean(self):
         self.mainboard.send_cmd("@HOME_BUTTON_TRIGGER\n")
+        self.telemetry.close()
 
         if self.toolhead:
             if self.toolhead.ready:
@@ -492,9 +595,7 @@ class IControlTask(DeviceOperationMixIn):
                     target[2] = Z
                     yield "Z%.5f" % Z
 
-                if (target[0] ** 2 + target[1] ** 2) > 28900:
-                    raise InternalError(CMD_G001, MSG_OPERATION_ERROR)
-                elif target[2] > 240 or target[2] < 0:
+                if not is_valid_position(*target):
                     raise InternalError(CMD_G001, MSG_OPERATION_ERROR)
 
             else:
@@ -521,6 +622,64 @@ class IControlTask(DeviceOperationMixIn):
         except TypeError:
             raise InternalError(CMD_G001, MSG_BAD_PARAMS)
 
+    def create_movement_batch(self, fields, moves):
+        # Return (moves count, gcode list). Position and E axis are updated
+        # only if every move in batch is valid.
+        try:
+            fields = tuple(fields)
+            width = len(fields)
+            template = "G1" + "".join(MOVB_FIELDS[f] for f in fields)
+            size, remainder = divmod(len(moves), width * 4)
+            if len(set(fields)) != width or remainder or \
+                    not 0 < size <= MOVB_MAX_SIZE:
+                raise InternalError(CMD_MOVB, MSG_BAD_PARAMS)
+            values = struct.unpack("<%if" % (size * width), moves)
+        except (TypeError, KeyError, ZeroDivisionError, struct.error):
+            raise InternalError(CMD_MOVB, MSG_BAD_PARAMS)
+
+        if any(isinf(v) or isnan(v) for v in values):
+            raise InternalError(CMD_MOVB, MSG_BAD_PARAMS)
+
+        axes = [fields.index(f) if f in fields else None
+                for f in ("X", "Y", "Z")]
+        eaxes = [int(f[1]) for f in fields if f[0] == "E"]
+        if len(eaxes) > 1:
+            raise InternalError(CMD_MOVB, MSG_OPERATION_ERROR)
+        # Feedrate is sent as integer, F below 1 would be formatted as F0
+        if "F" in fields and \
+                min(values[fields.index("F")::width]) < 1:
+            raise InternalError(CMD_MOVB, MSG_OPERATION_ERROR)
+
+        cmds = []
+        position = None
+        if axes != [None, None, None]:
+            if not self.known_position:
+                raise InternalError(CMD_MOVB, MSG_OPERATION_ERROR)
+            position = list(self.known_position)
+
+        for offset in xrange(0, size * width, width):
+            row = values[offset:offset + width]
+            if position:
+                for i, axis in enumerate(axes):
+                    if axis is not None:
+                        position[i] = row[axis]
+                if not is_valid_position(*position):
+                    raise InternalError(CMD_MOVB, MSG_OPERATION_ERROR)
+            cmds.append(template % row)
+
+        if eaxes and eaxes[0] != self.main_e_axis:
+            cmds.insert(0, "T%i" % eaxes[0])
+            self.main_e_axis = eaxes[0]
+        if position:
+            self.known_position = position
+        return size, cmds
+
+    def on_move_batch(self, handler, fields, moves):
+        size, cmds = self.create_movement_batch(fields, moves)
+        self.cmd_queue.extend((TARGET_MAINBOARD, cmd) for cmd in cmds)
+        self.fire()
+        return size
+
     def on_sleep(self, handler, secondes):
         try:
             cmd = "G4S%.4f" % secondes
@@ -591,6 +750,16 @@ class IControlTask(DeviceOperationMixIn):
     def on_toolhead_raw_command(self, handler, cmd):
         self.append_cmd(TARGET_TOOLHEAD, cmd)
 
+    def on_toolhead_raw_push(self, handler, enable):
+        if self.head_resp_stack is None:
+            raise InternalError(CMD_THRP, MSG_OPERATION_ERROR)
+
+        if enable and not self.head_resp_push:
+            # Stacked responses were not numbered yet
+            self.head_resp_seq += len(self.head_resp_stack)
+        self.head_resp_push = bool(enable)
+        self.push_head_resp()
+
     def on_toolhead_raw_response(self, handler):
         buf = packb((CMD_THRR, self.head_resp_stack))
         self.head_resp_stack = []
@@ -611,6 +780,13 @@ class IControlTask(DeviceOperationMixIn):
                 self.udp_sock.close()
         finally:
             self.udp_sock = s
+            self.telemetry.reset()
+
+    def on_set_telemetry(self, handler, interval, heartbeat, fields):
+        try:
+            self.telemetry.configure(interval, heartbeat, fields)
+        except (TypeError, ValueError):
+            raise InternalError(CMD_TLMY, MSG_OPERATION_ERROR)
 
     def on_require_head(self, handler, head_type):
         self.toolhead = HeadController(
@@ -619,6 +795,8 @@ class IControlTask(DeviceOperationMixIn):
             msg_callback=self.toolhead_message_callback)
 
         self.head_resp_stack = [] if head_type == "USER" else None
+        self.head_resp_push = False
+        self.head_resp_seq = 0
 
     def on_bootstrap_toolhead(self, handler):
         self.toolhead.bootstrap(self.on_toolhead_ready)
@@ -647,8 +825,80 @@ class InternalError(RuntimeError):
     pass
 
 
+class Telemetry(object):
+    """Send UDP messages of each type when they changed, at most once each
+    interval. Unchanged messages are resent when heartbeat reached."""
+    interval = TLMY_DEFAULT_INTERVAL
+    heartbeat = TLMY_DEFAULT_HEARTBEAT
+    fields = TLMY_DEFAULT_FIELDS
+
+    def __init__(self, loop, send_callback, clock=time):
+        self.send_callback = send_callback
+        self.clock = clock
+        # type => (last sent buf, sent at)
+        self.last = {}
+        # type => buf waiting interval
+        self.pending = {}
+        self.timer = loop.timer(0, 0, self.on_timer)
+
+    def configure(self, interval, heartbeat, fields):
+        interval, heartbeat, fields = float(interval), float(heartbeat), \
+            int(fields)
+        if not TLMY_MIN_INTERVAL <= interval <= heartbeat <= \
+                TLMY_MAX_HEARTBEAT:
+            raise ValueError("BAD_INTERVAL", interval, heartbeat)
+        self.interval, self.heartbeat, self.fields = \
+            interval, heartbeat, fields
+        self.reset()
+
+    def reset(self):
+        self.timer.stop()
+        self.last.clear()
+        self.pending.clear()
+
+    def update(self, msgtype, buf, force=False):
+        # Packed messages are compared, NaN in status will not look like
+        # a change
+        now = self.clock()
+        last_buf, sent_at = self.last.get(msgtype, (None, 0))
+        if buf == last_buf and now - sent_at < self.heartbeat and not force:
+            self.pending.pop(msgtype, None)
+        elif force or now - sent_at >= self.interval:
+            self.pending.pop(msgtype, None)
+            self.send(msgtype, buf, now)
+        else:
+            self.pending[msgtype] = buf
+            delay = sent_at + self.interval - now
+            if not self.timer.active or self.timer.remaining > delay:
+                self.timer.stop()
+                self.timer.set(delay, 0)
+                self.timer.start()
+
+    def send(self, msgtype, buf, now):
+        self.last[msgtype] = (buf, now)
+        self.send_callback(buf)
+
+    def on_timer(self, watcher, revent):
+        now = self.clock()
+        wait = None
+        for msgtype, buf in list(self.pending.items()):
+            remain = self.last[msgtype][1] + self.interval - now
+            if remain <= 0:
+                del self.pending[msgtype]
+                self.send(msgtype, buf, now)
+            elif wait is None or remain < wait:
+                wait = remain
+        if wait is not None:
+            watcher.set(wait, 0)
+            watcher.start()
+
+    def close(self):
+        self.reset()
+
+
 CMD_MATRIX = {
     CMD_G001: IControlTask.on_move,
+    CMD_MOVB: IControlTask.on_move_batch,
     CMD_G004: IControlTask.on_sleep,
     CMD_SLSR: IControlTask.on_scan_lasr,
     CMD_G028: IControlTask.on_home,
@@ -662,8 +912,10 @@ CMD_MATRIX = {
     CMD_VALU: IControlTask.on_query_value,
     CMD_THPF: IControlTask.on_toolhead_profile,
     CMD_THRC: IControlTask.on_toolhead_raw_command,
+    CMD_THRP: IControlTask.on_toolhead_raw_push,
     CMD_THRR: IControlTask.on_toolhead_raw_response,
     CMD_SYNC: IControlTask.on_require_sync,
+    CMD_TLMY: IControlTask.on_set_telemetry,
     CMD_REQH: IControlTask.on_require_head,
     CMD_BSTH: IControlTask.on_bootstrap_toolhead,
     CMD_CLHE: IControlTask.on_clean_toolhead_error,
@@ -2,23 +2,31 @@
 from subprocess import Popen, PIPE
 from tempfile import mktemp
 from signal import SIGKILL
-from select import select
+from errno import EAGAIN
 import logging
 import socket
+import struct
+import json
 import os
 
+import pyev
+
+from fluxmonitor.interfaces.player import HEARTBEAT_INTERVAL
 from fluxmonitor.player.connection import create_mainboard_socket
+from fluxmonitor.player.status import is_status_message, unpack_status
 from fluxmonitor.player.base import (ST_COMPLETED, ST_ABORTED,
                                      ST_PAUSED, ST_RUNNING)
 from fluxmonitor.misc.fcode_file import FCodeFile, FCodeError
 from fluxmonitor.misc.pidfile import load_pid
 from fluxmonitor.misc.systime import systime as time
 from fluxmonitor.err_codes import FILE_BROKEN, NOT_SUPPORT, RESOURCE_BUSY, \
-    SUBSYSTEM_ERROR, UNKNOWN_ERROR
+    SUBSYSTEM_ERROR, UNKNOWN_ERROR, NO_RESPONSE
 from fluxmonitor.config import PLAY_ENDPOINT
 from fluxmonitor.storage import Storage, metadata
 
 logger = logging.getLogger("Player")
+REQUEST_TIMEOUT = 3.0
+NO_RESPONSE_REPLY = "error %s %s" % (SUBSYSTEM_ERROR, NO_RESPONSE)
 
 
 def poweroff_led():
@@ -34,8 +42,21 @@ def clean_led():
 class PlayerManager(object):
     alive = True
     _sock = None
+    _sock_watcher = None
+    _req_id = 0
+
+    # Status pushed from player
+    status = None
+    status_seq = None
+    status_at = 0
+    _status_json = None
+    _subscribe_at = 0
 
     def __init__(self, loop, taskfile, terminated_callback=None):
+        self.loop = loop
+        # req_id => (callback, timestamp)
+        self._requests = {}
+        self._timeout_watcher = loop.timer(0.5, 0.5, self.on_request_timer)
         storage = Storage("run")
 
         oldpid = load_pid(storage.get_path("fluxplayerd.pid"))
@@ -60,7 +81,8 @@ class PlayerManager(object):
                    "--log", storage.get_path("fluxplayerd.log"), "--pid",
                    storage.get_path("fluxplayerd.pid")]
             if logger.getEffectiveLevel() <= 10:
-                cmd += ["--debug"]
+                cmd += ["--debug", "--perf-log",
+                        storage.get_path("fluxplayerd.perf.log")]
 
             f = open(storage.get_path("fluxplayerd.err.log"), "a")
             proc = Popen(cmd, stdin=PIPE, stderr=f.fileno())
@@ -85,8 +107,8 @@ class PlayerManager(object):
         if self.child_watcher:
             self.child_watcher.stop()
             self.child_watcher.data = None
+        self._close_sock()
         self.proc = None
-        self._sock = None
         self.alive = False
 
     @property
@@ -100,8 +122,12 @@ class PlayerManager(object):
                 s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
                 s.bind(mktemp())
                 s.connect(PLAY_ENDPOINT)
-                s.settimeout(1.0)
+                s.setblocking(False)
                 self._sock = s
+                self._sock_watcher = self.loop.io(s, pyev.EV_READ,
+                                                  self.on_sock_recv)
+                self._sock_watcher.start()
+                self.subscribe()
             except socket.error as e:
                 logger.debug("Player manager connection error: %r", e)
                 st = metadata.format_device_status
@@ -109,17 +135,115 @@ class PlayerManager(object):
                     raise RuntimeError(RESOURCE_BUSY)
                 raise SystemError(SUBSYSTEM_ERROR)
 
-        # Ensure no data in buffer!!
-        while select((self._sock, ), (), (), 0)[0]:
-            self._sock.recv(4096)
-
         return self._sock
 
-    def __enter__(self):
-        return self.sock
+    def _close_sock(self):
+        if self._timeout_watcher:
+            self._timeout_watcher.stop()
+        if self._sock_watcher:
+            self._sock_watcher.stop()
+            self._sock_watcher = None
+        if self._sock:
+            try:
+                os.unlink(self._sock.getsockname())
+            except (OSError, socket.error):
+                pass
+            self._sock.close()
+            self._sock = None
+
+        requests, self._requests = self._requests, {}
+        for callback, _ in requests.values():
+            self._invoke(callback, NO_RESPONSE_REPLY)
+
+    def subscribe(self, interval=1.0):
+        self._subscribe_at = time()
+        try:
+            self._sock.send("SUBSCRIBE %.2f" % interval)
+        except socket.error as e:
+            logger.error("Subscribe player status error: %s", e)
+
+    def request(self, cmd, callback=None):
+        """Send command to player without waiting. `callback` will be invoked
+        with the player response, or NO_RESPONSE_REPLY if timeout."""
+        sock = self.sock
+        self._req_id = req_id = (self._req_id + 1) % 65536
+        try:
+            sock.send("#%i %s" % (req_id, cmd))
+        except socket.error as e:
+            if e.args[0] == EAGAIN:
+                raise RuntimeError(RESOURCE_BUSY)
+            logger.error("Player socket error: %s", e)
+            raise RuntimeError(SUBSYSTEM_ERROR)
+
+        self._requests[req_id] = (callback, time())
+        if not self._timeout_watcher.active:
+            self._timeout_watcher.start()
+
+    def on_sock_recv(self, watcher, revent):
+        while self._sock:
+            try:
+                buf = self._sock.recv(4096)
+            except socket.error as e:
+                if e.args[0] != EAGAIN:
+                    logger.debug("Player socket error: %s", e)
+                    self._close_sock()
+                return
+            self._handle_message(buf)
+
+    def on_request_timer(self, watcher, revent):
+        now = time()
+        for req_id, (callback, ts) in list(self._requests.items()):
+            if now - ts > REQUEST_TIMEOUT:
+                logger.error("Player request %i timeout", req_id)
+                self._requests.pop(req_id)
+                self._invoke(callback, NO_RESPONSE_REPLY)
+        if not self._requests:
+            watcher.stop()
+
+    def _update_status(self, buf):
+        try:
+            seq, st = unpack_status(buf)
+            if st is not None:
+                self.status = st
+                self._status_json = None
+            self.status_seq = seq
+            self.status_at = time()
+            return True
+        except (ValueError, struct.error) as e:
+            logger.error("Bad status message from player: %s", e)
+            return False
+
+    @property
+    def status_json(self):
+        if self._status_json is None:
+            self._status_json = json.dumps(self.status)
+        return self._status_json
+
+    def _handle_message(self, buf):
+        if is_status_message(buf):
+            self._update_status(buf)
+        elif buf.startswith("#"):
+            try:
+                s_req_id, payload = buf[1:].split(" ", 1)
+                callback, _ = self._requests.pop(int(s_req_id))
+            except (ValueError, KeyError):
+                logger.debug("Drop player response: %r", buf[:64])
+                return
+            self._invoke(callback, payload)
+        else:
+            logger.debug("Drop player message: %r", buf[:64])
 
-    def __exit__(self, type, value, traceback):
-        pass
+    def _invoke(self, callback, payload):
+        if callback:
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception("Error in player response callback")
+
+    @property
+    def status_fresh(self):
+        return self.status is not None and \
+            time() - self.status_at < HEARTBEAT_INTERVAL * 2
 
     def on_process_dead(self, watcher, revent):
         logger.info("Player %i quit: %i", self.proc.pid, watcher.rstatus)
@@ -133,6 +257,7 @@ class PlayerManager(object):
             pass
 
         metadata.update_device_status(0, 0, "N/A", err_label="")
+        self._close_sock()
         watcher.stop()
         if watcher.data:
             watcher.data(self)
@@ -154,82 +279,85 @@ class PlayerManager(object):
     def is_terminated(self):
         return metadata.device_status_id in (ST_COMPLETED, ST_ABORTED)
 
-    def pause(self):
-        with self as sock:
-            sock.send("PAUSE")
-            return sock.recv(4096)
-
-    def resume(self):
-        with self as sock:
-            sock.send("RESUME")
-            return sock.recv(4096)
-
-    def abort(self):
-        with self as sock:
-            sock.send("ABORT")
-            return sock.recv(4096)
-
-    def set_toolhead_operating(self):
-        with self as sock:
-            sock.send("SET_TH_OPERATING")
-            return sock.recv(4096)
-
-    def set_toolhead_standby(self):
-        with self as sock:
-            sock.send("SET_TH_STANDBY")
-            return sock.recv(4096)
-
-    def load_filament(self, index):
-        with self as sock:
-            sock.send("LOAD_FILAMENT %s" % index)
-            return sock.recv(4096)
-
-    def unload_filament(self, index):
-        with self as sock:
-            sock.send("UNLOAD_FILAMENT %s" % index)
-            return sock.recv(4096)
-
-    def set_toolhead_header(self, index, temp):
-        with self as sock:
-            sock.send("SET_TOOLHEAD_HEATER %i %.1f" % (index, temp))
-            return sock.recv(4096)
-
-    def press_button(self):
-        with self as sock:
-            sock.send("INTERRUPT_LOAD_FILAMENT")
-            return sock.recv(4096)
-
-    def report(self):
+    def pause(self, callback=None):
+        self.request("PAUSE", callback)
+
+    def resume(self, callback=None):
+        self.request("RESUME", callback)
+
+    def abort(self, callback=None):
+        self.request("ABORT", callback)
+
+    def set_toolhead_operating(self, callback=None):
+        self.request("SET_TH_OPERATING", callback)
+
+    def set_toolhead_standby(self, callback=None):
+        self.request("SET_TH_STANDBY", callback)
+
+    def load_filament(self, index, callback=None):
+        self.request("LOAD_FILAMENT %s" % index, callback)
+
+    def unload_filament(self, index, callback=None):
+        self.request("UNLOAD_FILAMENT %s" % index, callback)
+
+    def set_toolhead_header(self, index, temp, callback=None):
+        self.request("SET_TOOLHEAD_HEATER %i %.1f" % (index, temp), callback)
+
+    def press_button(self, callback=None):
+        self.request("INTERRUPT_LOAD_FILAMENT", callback)
+
+    def report(self, callback):
+        if self.status_fresh:
+            callback(self.status_json)
+            return
+
+        def on_report(ret):
+            if not is_status_message(ret):
+                callback(ret)
+            elif self._update_status(ret) and self.status is not None:
+                callback(self.status_json)
+            else:
+                callback("error %s" % SUBSYSTEM_ERROR)
+
         try:
-            with self as sock:
-                sock.send("REPORT")
-                return sock.recv(4096)
-        except RuntimeError:
-            st_id = metadata.device_status_id
-            if st_id == 1:
-                return '{"st_label": "INIT", "st_id": 1}'
-            elif st_id in (64, 128):
-                return '{"st_label": "IDLE", "st_id": 0}'
+            if self._sock and self.status_at and \
+                    time() - self._subscribe_at >= HEARTBEAT_INTERVAL:
+                # Status push stopped, subscribe again. At most once a
+                # heartbeat, polling clients must not flood an unresponsive
+                # player.
+                self.subscribe()
+            if self.status_seq is None:
+                self.request("REPORT MSGPACK", on_report)
+            else:
+                self.request("REPORT MSGPACK %i" % self.status_seq, on_report)
+        except RuntimeError as e:
+            st = metadata.format_device_status
+            if e.args[0] == SUBSYSTEM_ERROR:
+                # Socket error
+                if st["st_id"] == 128 and time() - st["timestamp"] < 15:
+                    raise RuntimeError(RESOURCE_BUSY)
+                raise
+            elif st["st_id"] == 1:
+                callback('{"st_label": "INIT", "st_id": 1}')
+            elif st["st_id"] in (64, 128):
+                callback('{"st_label": "IDLE", "st_id": 0}')
+            else:
+                raise
         except SystemError:
             raise RuntimeError(SUBSYSTEM_ERROR)
-        except socket.error as e:
-            st = metadata.format_device_status
-            if st["st_id"] == 128 and time() - st["timestamp"] < 15:
-                raise RuntimeError(RESOURCE_BUSY)
 
-            logger.error("Player socket error: %s", e)
-            raise RuntimeError(SUBSYSTEM_ERROR)
+    def report_perf(self, callback):
+        self.request("REPORT PERF", callback)
 
-    def quit(self):
+    def quit(self, callback=None):
         if self.proc.poll() is None:
+            def on_quit(ret):
+                if ret == NO_RESPONSE_REPLY and self.proc.poll() is None:
+                    self.terminate()
+                self._invoke(callback, ret)
+
             try:
-                with self as sock:
-                    sock.send("QUIT")
-                    return sock.recv(4096)
-            except socket.error as e:
-                logger.error("Player socket error: %s", e)
-                self.terminate()
-                raise RuntimeError(SUBSYSTEM_ERROR)
+                self.request("QUIT", on_quit)
             except Exception:
                 logger.exception("Error while trying quit player")
                 self.terminate()
@@ -237,7 +365,7 @@ class PlayerManager(object):
         else:
             if self.child_watcher and self.child_watcher.data:
                 self.child_watcher.data(self)
-            return "ok"
+            self._invoke(callback, "ok")
 
     def on_fatal_error(self, log=""):
         logger.error("%s (Proc still alive)", log)
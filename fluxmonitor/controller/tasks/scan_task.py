@@ -1,8 +1,8 @@
 
+from collections import deque
 from select import select
 from errno import ECONNREFUSED, ENOENT, EAGAIN
-from time import sleep
-from math import isnan
+from math import isinf, isnan
 from io import BytesIO
 import logging
 import msgpack
@@ -12,7 +12,8 @@ import pyev
 
 from fluxmonitor.player.main_controller import MainController
 from fluxmonitor.err_codes import (
-    SUBSYSTEM_ERROR, NO_RESPONSE, RESOURCE_BUSY, UNKNOWN_COMMAND)
+    SUBSYSTEM_ERROR, NO_RESPONSE, RESOURCE_BUSY, UNKNOWN_COMMAND, BAD_PARAMS,
+    NOT_RUNNING)
 from fluxmonitor.storage import Storage, metadata
 from fluxmonitor.config import CAMERA_ENDPOINT
 from fluxmonitor.player import macro
@@ -21,6 +22,21 @@ from .base import CommandMixIn, DeviceOperationMixIn
 
 logger = logging.getLogger(__name__)
 
+# Seconds to wait after laser changed before taking image
+SETTLE_TIME = 0.04
+# Three scan images packed in one msgpack list [(mimetype, image), ...]
+FRAMED_MIMETYPE = "application/x-flux-scanimages"
+# Laser lines of left and right laser, msgpack [left, right] and each one is
+# float32 array of laser x position in rows
+LINES_MIMETYPE = "application/x-flux-scanlines"
+# One step of scan_batch, msgpack (step index, [(mimetype, image), ...])
+BATCH_MIMETYPE = "application/x-flux-scanstep"
+# Stop capturing if more steps than this are waiting to be sent
+BATCH_MAX_PENDING = 2
+# Upper bounds of scan_batch parameters
+BATCH_MAX_STEPS = 3200
+BATCH_MAX_STEP_LENGTH = 360.0
+
 
 class CameraInterface(object):
     def __init__(self, kernel):
@@ -67,11 +83,25 @@ class CameraInterface(object):
         f.seek(0)
         return f
 
-    def async_oneshot(self, callback):
+    def async_oneshot(self, callback, errback=None):
+        # errback is invoked with error arguments if camera service failed
         def overlay(w, r):
+            w.stop()
             try:
-                w.stop()
-                callback(self.end_oneshot())
+                result = self.end_oneshot()
+            except RuntimeError as e:
+                logger.error("Oneshot error: %s", e.args)
+                if errback:
+                    errback(*e.args)
+                return
+            except Exception:
+                logger.exception("Oneshot error")
+                if errback:
+                    errback(SUBSYSTEM_ERROR, "CAMERA")
+                return
+
+            try:
+                callback(result)
             except Exception:
                 logger.exception("Oneshot error")
 
@@ -130,7 +160,7 @@ class CameraInterface(object):
     def end_get_bias(self):
         return " ".join(("%s" % i for i in self.recv_object()))
 
-    def async_compute_cab(self, step, callback):
+    def async_compute_cab(self, step, callback, reuse=False):
         def overlay(w, r):
             try:
                 w.stop()
@@ -138,13 +168,15 @@ class CameraInterface(object):
             except Exception:
                 logger.exception("Compute cab error")
 
-        self.begin_compute_cab(step)
+        self.begin_compute_cab(step, reuse)
         self.watcher.callback = overlay
         self.watcher.start()
 
-    def begin_compute_cab(self, step):
+    def begin_compute_cab(self, step, reuse=False):
+        # reuse: analyse the last frame taken by camera service instead of
+        # taking a new one
         if step == 'O':
-            self.sock.send(msgpack.packb((3, 0)))
+            self.sock.send(msgpack.packb((3, 0, reuse)))
         elif step == 'L':
             self.sock.send(msgpack.packb((4, 0)))
         elif step == 'R':
@@ -153,10 +185,276 @@ class CameraInterface(object):
     def end_compute_cab(self):
         return " ".join(("%s" % i for i in self.recv_object()))
 
+    def async_store_frame(self, name, callback, errback=None):
+        self.async_request((6, 0, name), callback, errback)
+
+    def async_laser_lines(self, off_name, on_names, callback, errback=None):
+        self.async_request((7, 0, off_name, on_names),
+                           lambda ret: callback(ret[1]), errback)
+
+    def async_request(self, request, callback, errback=None):
+        # errback is invoked with error arguments if camera service failed
+        def overlay(w, r):
+            w.stop()
+            try:
+                result = self.end_request()
+            except RuntimeError as e:
+                logger.error("Camera request %s error: %s", request[0],
+                             e.args)
+                if errback:
+                    errback(*e.args)
+                return
+            except Exception:
+                logger.exception("Camera request %s error", request[0])
+                if errback:
+                    errback(SUBSYSTEM_ERROR, "CAMERA")
+                return
+
+            try:
+                callback(result)
+            except Exception:
+                logger.exception("Camera request %s error", request[0])
+
+        self.sock.send(msgpack.packb(request))
+        self.watcher.callback = overlay
+        self.watcher.start()
+
+    def end_request(self):
+        args = self.recv_object()
+        if args[0] == "er":
+            raise RuntimeError(*args[1:])
+        return args
+
     def close(self):
+        self.watcher.stop()
         self.sock.close()
 
 
+class ScanShots(object):
+    """Take the three scan images. Laser for next image is switched as soon
+    as the previous image is captured, while the caller is still sending it.
+    """
+    LASERS = ((True, False), (False, True), (False, False))
+
+    LASER_NAMES = ("L", "R", "O")
+
+    def __init__(self, task, image_callback, complete_callback,
+                 keep_frames=False, error_callback=None):
+        # keep_frames: frames are kept in camera service for laser line
+        # extraction instead of returned, image_callback gets name of frame
+        # error_callback: invoked with error arguments if camera failed
+        self.task = task
+        self.image_callback = image_callback
+        self.complete_callback = complete_callback
+        self.error_callback = error_callback
+        self.keep_frames = keep_frames
+        self.index = 0
+        self.stopped = False
+        self.capturing = False
+        self._stopped_callback = None
+
+    def start(self):
+        self.index = 0
+        self._next()
+
+    def stop(self, callback):
+        """Stop taking images, no more callbacks are invoked. callback is
+        invoked after camera replied if an image is being taken."""
+        self.stopped = True
+        if self.capturing:
+            self._stopped_callback = callback
+        else:
+            callback()
+
+    def _next(self):
+        left, right = self.LASERS[self.index]
+        self.task.change_laser(left=left, right=right,
+                               callback=self._on_laser)
+
+    def _on_laser(self):
+        if not self.stopped:
+            self.task.settle(self._on_settled)
+
+    def _on_settled(self):
+        if self.stopped:
+            return
+        self.capturing = True
+        if self.keep_frames:
+            name = self.LASER_NAMES[self.index]
+            self.task.camera.async_store_frame(
+                name, lambda ret: self._on_image(name), self._on_error)
+        else:
+            self.task.camera.async_oneshot(self._on_image, self._on_error)
+
+    def _on_captured(self):
+        # Return True if stopped while camera was capturing
+        self.capturing = False
+        if self.stopped:
+            callback, self._stopped_callback = self._stopped_callback, None
+            if callback:
+                callback()
+            return True
+        return False
+
+    def _on_error(self, *args):
+        if not self._on_captured():
+            self.stopped = True
+            if self.error_callback:
+                self.error_callback(*args)
+
+    def _on_image(self, result):
+        if self._on_captured():
+            return
+        index = self.index
+        self.index += 1
+        if self.index < len(self.LASERS):
+            self._next()
+        self.image_callback(index, result)
+        if self.index == len(self.LASERS):
+            self.complete_callback()
+
+
+class BinarySender(object):
+    """Send binaries to handler one by one"""
+    def __init__(self, handler):
+        self.handler = handler
+        self.queue = deque()
+        self.sending = False
+        self._drained_callback = None
+
+    def __len__(self):
+        return len(self.queue) + (1 if self.sending else 0)
+
+    def send(self, mimetype, length, stream):
+        self.queue.append((mimetype, length, stream))
+        if not self.sending:
+            self._send_next()
+
+    def on_drained(self, callback):
+        if self.sending:
+            self._drained_callback = callback
+        else:
+            callback()
+
+    def _send_next(self, h=None):
+        if self.queue:
+            self.sending = True
+            mimetype, length, stream = self.queue.popleft()
+            self.handler.async_send_binary(mimetype, length, stream,
+                                           self._send_next)
+        else:
+            self.sending = False
+            if self._drained_callback:
+                callback = self._drained_callback
+                self._drained_callback = None
+                callback()
+
+
+class ScanBatch(object):
+    """Scan `steps` steps without client requests. Each step is sent as a
+    msgpack binary (step index, [(mimetype, image), ...]) and "ok" is replied
+    after the last one. The turntable rotates to the next step while images
+    of current step are being sent.
+
+    The batch replies "ok aborted" if aborted, or "error ..." if camera or
+    mainboard failed. Steps not sent yet are dropped in both cases."""
+
+    def __init__(self, task, handler, steps, step_length):
+        self.task = task
+        self.handler = handler
+        self.sender = BinarySender(handler)
+        self.steps = steps
+        self.step_length = step_length
+        self.step = 0
+        self.images = None
+        self.shots = None
+        self.moving = False
+        self.finished = False
+        # Final reply, not None once batch is stopping
+        self.reply = None
+
+    def start(self):
+        self._capture()
+
+    def abort(self):
+        """Stop after the image being taken or the turntable move."""
+        if self.reply is None:
+            self.sender.queue.clear()
+            self._stop("ok aborted")
+
+    def fail(self, *args):
+        logger.error("Scan batch error: %s", args)
+        if not self.finished:
+            self.sender.queue.clear()
+            self.reply = None
+            self._stop("error " + " ".join(args))
+            if self.moving:
+                # Move will not complete after a mainboard error
+                self.moving = False
+                self._finish()
+
+    def close(self):
+        # Task is closing, camera and mainboard are gone
+        self.finished = True
+        if self.shots:
+            self.shots.stopped = True
+        self.sender.queue.clear()
+
+    def _stop(self, reply):
+        if self.reply is None:
+            self.reply = reply
+            if self.shots:
+                self.shots.stop(self._finish)
+            elif not self.moving:
+                self._finish()
+
+    def _capture(self):
+        self.moving = False
+        if self.reply is not None:
+            self._finish()
+        elif len(self.sender) > BATCH_MAX_PENDING:
+            # Client is slower than scanning, do not buffer images
+            self.sender.on_drained(self._capture)
+        else:
+            self.images = []
+            self.shots = ScanShots(self.task, self._on_image, self._on_shots,
+                                   error_callback=self.fail)
+            self.shots.start()
+
+    def _on_image(self, index, result):
+        self.images.append((result[0], result[2].getvalue()))
+
+    def _on_shots(self):
+        self.shots = None
+        buf = msgpack.packb((self.step, self.images))
+        self.sender.send(BATCH_MIMETYPE, len(buf), BytesIO(buf))
+        self.step += 1
+        if self.step < self.steps:
+            self.moving = True
+            self.task.make_gcode_cmd("G1 F500 E%.5f" % self.step_length,
+                                     self._capture)
+        else:
+            self._stop("ok")
+
+    def _finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        self.shots = None
+        # Laser command waiting in a macro is dropped, and the macro may
+        # never complete after a mainboard error
+        self.task._macro = None
+        try:
+            self.task.mainboard.send_cmd("X1E0")
+        except Exception:
+            logger.exception("Turn off lasers error")
+        self.sender.on_drained(self._on_sent)
+
+    def _on_sent(self):
+        self.task.on_batch_done(self)
+        self.handler.send_text(self.reply)
+
+
 class ScanTask(DeviceOperationMixIn, CommandMixIn):
     st_id = -2
     mainboard = None
@@ -164,10 +462,13 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
     busying = False
 
     _macro = None
+    _batch = None
 
     def __init__(self, stack, handler, camera_id=None):
         self.camera = CameraInterface(stack)
         super(ScanTask, self).__init__(stack, handler)
+        self._settle_watcher = stack.loop.timer(SETTLE_TIME, 0,
+                                                self._on_settled)
 
         def on_mainboard_ready(ctrl):
             self.busying = False
@@ -204,14 +505,38 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
         self._macro.start(self)
 
     def dispatch_cmd(self, handler, cmd, *args):
-        if self._macro or self.busying:
+        if cmd == "quit":
+            self.quit(handler)
+
+        elif cmd == "scan_abort":
+            if not self._batch:
+                raise RuntimeError(NOT_RUNNING)
+            self._batch.abort()
+
+        elif self._macro or self.busying:
             raise RuntimeError(RESOURCE_BUSY)
 
         elif cmd == "oneshot":
             self.oneshot(handler)
 
         elif cmd == "scanimages":
-            self.take_images(handler)
+            if "lines" in args:
+                self.take_laser_lines(handler)
+            else:
+                self.take_images(handler, framed=("framed" in args))
+
+        elif cmd == "scan_batch":
+            try:
+                steps = int(args[0])
+                step_length = float(args[1]) if len(args) > 1 \
+                    else self.step_length
+            except (IndexError, ValueError):
+                raise RuntimeError(BAD_PARAMS)
+            if steps < 1 or steps > BATCH_MAX_STEPS or \
+                    isnan(step_length) or isinf(step_length) or \
+                    step_length <= 0 or step_length > BATCH_MAX_STEP_LENGTH:
+                raise RuntimeError(BAD_PARAMS)
+            self.scan_batch(handler, steps, step_length)
 
         elif cmd == "scan_check":
             self.scan_check(handler)
@@ -254,14 +579,19 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
             self._macro = macro.CommandMacro(cb, (cmd, ))
             self._macro.start(self)
 
-        elif cmd == "quit":
-            self.stack.exit_task(self)
-            handler.send_text("ok")
-
         else:
             logger.debug("Can not handle: '%s'" % cmd)
             raise RuntimeError(UNKNOWN_COMMAND)
 
+    def quit(self, handler):
+        batch = self._batch
+        self.stack.exit_task(self)
+        if batch:
+            # Do not break the binary being sent
+            batch.sender.on_drained(lambda: handler.send_text("ok"))
+        else:
+            handler.send_text("ok")
+
     def change_laser(self, left, right, callback=None):
         def cb():
             self._macro = None
@@ -334,7 +664,9 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
             step, l, r = compute_cab_ref[len(data["calibrate_param"])]
             logger.debug("calibrate laser step %s", step)
             self.change_laser(left=l, right=r)
-            self.camera.async_compute_cab(step, on_compute_cab)
+            # Frame without laser is the same scene of last get_bias frame
+            self.camera.async_compute_cab(step, on_compute_cab,
+                                          reuse=(step == "O"))
 
         def on_get_bias(m):
             data["flag"] += 1
@@ -355,6 +687,8 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
                         on_loop)
                 data["thres"] += 0.05
 
+        # Lasers must be off in get_bias frames, they are reused for step O
+        self.change_laser(left=False, right=False)
         on_loop()
         self.busying = True
 
@@ -377,39 +711,86 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
         self.camera.async_oneshot(recv_callback)
         self.busying = True
 
-    def take_images(self, handler):
-        def cb_complete(h):
+    def settle(self, callback):
+        # Wait laser to be stable without blocking the loop
+        self._settle_watcher.data = callback
+        self._settle_watcher.set(SETTLE_TIME, 0)
+        self._settle_watcher.start()
+
+    def _on_settled(self, watcher, revent):
+        watcher.stop()
+        watcher.data()
+
+    def take_laser_lines(self, handler):
+        """Reply laser x position of each image row instead of images, as a
+        msgpack binary [left, right]. Each one is float32 array packed in
+        bytes, NaN if laser not found in the row."""
+        sender = BinarySender(handler)
+
+        def on_lines(lines):
+            buf = msgpack.packb(lines)
+            sender.send(LINES_MIMETYPE, len(buf), BytesIO(buf))
+            sender.on_drained(on_sent)
+
+        def on_sent():
             self.busying = False
             handler.send_text("ok")
 
-        def cb_shot3_ready(result):
-            mimetype, length, stream = result
-            handler.async_send_binary(mimetype, length, stream, cb_complete)
+        def on_error(*args):
+            def cb():
+                self.busying = False
+                handler.send_text("error " + " ".join(args))
+            self.change_laser(left=False, right=False, callback=cb)
 
-        def cb_shot3(h):
-            self.camera.async_oneshot(cb_shot3_ready)
+        def on_complete():
+            self.camera.async_laser_lines("O", ("L", "R"), on_lines, on_error)
 
-        def cb_shot2_ready(result):
-            mimetype, length, stream = result
-            self.change_laser(left=False, right=False,
-                              callback=lambda: sleep(0.04))
-            handler.async_send_binary(mimetype, length, stream, cb_shot3)
+        ScanShots(self, lambda index, name: None, on_complete,
+                  keep_frames=True, error_callback=on_error).start()
+        self.busying = True
 
-        def cb_shot2(h):
-            self.camera.async_oneshot(cb_shot2_ready)
+    def take_images(self, handler, framed=False):
+        """Reply three images (left laser, right laser, no laser) then "ok".
+        If framed, the three images are sent as one msgpack binary."""
+        sender = BinarySender(handler)
+        images = []
 
-        def cb_shot1_ready(result):
-            mimetype, length, stream = result
-            self.change_laser(left=False, right=True,
-                              callback=lambda: sleep(0.04))
-            handler.async_send_binary(mimetype, length, stream, cb_shot2)
+        def on_image(index, result):
+            if framed:
+                images.append((result[0], result[2].getvalue()))
+            else:
+                sender.send(*result)
 
-        def cb_shot1():
-            self.camera.async_oneshot(cb_shot1_ready)
+        def on_complete():
+            if framed:
+                buf = msgpack.packb(images)
+                sender.send(FRAMED_MIMETYPE, len(buf), BytesIO(buf))
+            sender.on_drained(on_sent)
 
-        self.change_laser(left=True, right=False, callback=cb_shot1)
+        def on_sent():
+            self.busying = False
+            handler.send_text("ok")
+
+        def on_error(*args):
+            def on_drained():
+                self.busying = False
+                handler.send_text("error " + " ".join(args))
+            sender.on_drained(on_drained)
+
+        ScanShots(self, on_image, on_complete,
+                  error_callback=on_error).start()
+        self.busying = True
+
+    def scan_batch(self, handler, steps, step_length):
+        """Scan `steps` steps without client requests, see ScanBatch."""
+        self._batch = ScanBatch(self, handler, steps, step_length)
+        self._batch.start()
         self.busying = True
 
+    def on_batch_done(self, batch):
+        self._batch = None
+        self.busying = False
+
     def on_mainboard_message(self, watcher, revent):
         try:
             self.mainboard.handle_recv()
@@ -419,8 +800,11 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
             logger.exception("Mainboard connection broken")
             self.handler.send_text("error SUBSYSTEM_ERROR")
             self.stack.exit_task(self)
-        except RuntimeError:
-            pass
+        except (RuntimeError, SystemError) as e:
+            if self._batch:
+                self._batch.fail(*e.args)
+            elif isinstance(e, SystemError):
+                logger.exception("Unhandle Error")
         except Exception:
             logger.exception("Unhandle Error")
 
@@ -429,6 +813,10 @@ class ScanTask(DeviceOperationMixIn, CommandMixIn):
                                       self.handler.address)
 
     def clean(self):
+        self._settle_watcher.stop()
+        if self._batch:
+            self._batch.close()
+            self._batch = None
         try:
             if self.mainboard:
                 if self.mainboard.ready:
@@ -0,0 +1,273 @@
+"""
+Emulated toolhead which speaks the same line protocol as the real toolhead
+firmware ("1 <PAYLOAD> *<checksum>\\n"). It is used with the dev HAL (connect
+to the fake headboard endpoint) or directly with a socketpair in tests.
+"""
+
+from collections import deque
+from math import exp
+from random import random
+from select import select
+from time import time
+import logging
+import socket
+import errno
+
+logger = logging.getLogger(__name__)
+
+# Toolhead ER flags
+ER_RESET = 4
+ER_SHAKE = 16
+ER_TILT = 32
+ER_HARDWARE_FAILURE = 64
+ER_FAN_FAILURE = 128
+
+
+def checksum(payload):
+    # Checksum covers "1 " prefix and payload including the trailing space
+    s = 17  # ord("1") ^ ord(" ")
+    for c in payload:
+        s ^= ord(c)
+    return s
+
+
+def build_message(payload):
+    payload += " "
+    return "1 %s*%i\n" % (payload, checksum(payload))
+
+
+def parse_message(line):
+    # Return payload or None if message is broken
+    if len(line) < 4 or line[:2] != "1 ":
+        return None
+    pos = line.rfind("*")
+    if pos < 2:
+        return None
+    try:
+        recv_sumcheck = int(line[pos + 1:])
+    except ValueError:
+        return None
+    if checksum(line[2:pos]) != recv_sumcheck:
+        return None
+    return line[2:pos].rstrip(" ")
+
+
+class ThermalModel(object):
+    """First order heater model. Temperature approaches the target (or the
+    ambient temperature when the heater is off) with time constant `tau`, fan
+    speed shortens the time constant while cooling."""
+
+    def __init__(self, ambient=28.0, tau=25.0, fan_factor=0.5,
+                 max_temperature=235.0, clock=time):
+        self.clock = clock
+        self.ambient = ambient
+        self.tau = tau
+        self.fan_factor = fan_factor
+        self.max_temperature = max_temperature
+        self.temperature = ambient
+        self.target = float("NAN")
+        self.fanspeed = 0.0
+        self.timestamp = clock()
+
+    @property
+    def heating(self):
+        return self.target == self.target and self.target > 0
+
+    def set_target(self, target):
+        self.update()
+        if target > self.max_temperature:
+            raise ValueError("BAD_TEMPERATURE")
+        self.target = target
+
+    def set_fanspeed(self, fanspeed):
+        self.update()
+        self.fanspeed = max(min(fanspeed, 1.0), 0.0)
+
+    def update(self):
+        now = self.clock()
+        dt = now - self.timestamp
+        self.timestamp = now
+        if dt <= 0:
+            return self.temperature
+
+        if self.heating:
+            dest, tau = self.target, self.tau
+        else:
+            dest = self.ambient
+            tau = self.tau / (1 + self.fan_factor * self.fanspeed)
+
+        # Exact solution of dT/dt = (dest - T) / tau for step dt
+        k = min(dt / tau, 50.0)
+        self.temperature = dest + (self.temperature - dest) * exp(-k)
+        return self.temperature
+
+    def is_reached(self, tolerance=3.0):
+        return abs(self.update() - self.target) <= tolerance
+
+
+class ToolheadEmulator(object):
+    """Answer HELLO, PING, heater and fan commands on `sock`.
+
+    latency: response delay in seconds
+    drop_rate: probability to ignore a command (host will retry or timeout)
+    corrupt_rate: probability to reply a message with broken checksum
+    """
+    module_id = "EMULATOR"
+
+    def __init__(self, sock, module="EXTRUDER", latency=0.004, drop_rate=0.0,
+                 corrupt_rate=0.0, thermal=None, clock=time):
+        self.sock = sock
+        self.module = module
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.clock = clock
+        self.thermal = thermal or ThermalModel(clock=clock)
+        self.error_flag = 0
+        self.booted = False
+
+        self._buf = ""
+        self._outgoing = deque()
+
+        self.counter = {"recv": 0, "sent": 0, "broken": 0, "dropped": 0,
+                        "corrupted": 0}
+        self.heatup_begin = None
+        self.heatup_times = []
+
+    def inject_error(self, flag):
+        """Report ER `flag` in following PONG. ER_RESET also clears heater
+        status and requires a new HELLO like a real toolhead reset does."""
+        self.error_flag |= flag
+        if flag & ER_RESET:
+            self.booted = False
+            self.thermal.set_target(float("NAN"))
+            self.thermal.set_fanspeed(0)
+
+    def clear_error(self):
+        self.error_flag = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def handle_recv(self):
+        try:
+            buf = self.sock.recv(4096)
+        except socket.error as e:
+            if e.args[0] == errno.EAGAIN:
+                return True
+            raise
+        if not buf:
+            return False
+        self.feed(buf.decode("ascii", "replace"))
+        return True
+
+    def feed(self, buf):
+        self._buf += buf
+        while "\n" in self._buf:
+            line, self._buf = self._buf.split("\n", 1)
+            self.counter["recv"] += 1
+            payload = parse_message(line)
+            if payload is None:
+                self.counter["broken"] += 1
+                logger.debug("Broken message: %r", line)
+                self.reply("ER CHECKSUM")
+            elif self.drop_rate and random() < self.drop_rate:
+                self.counter["dropped"] += 1
+            else:
+                self.handle_command(payload)
+
+    def reply(self, payload):
+        msg = build_message(payload)
+        if self.corrupt_rate and random() < self.corrupt_rate:
+            self.counter["corrupted"] += 1
+            msg = msg.replace(" *", " X*", 1)
+        self._outgoing.append((self.clock() + self.latency, msg))
+
+    def handle_command(self, payload):
+        if payload == "HELLO":
+            self.booted = True
+            self.error_flag &= ~ER_RESET
+            self.reply(self.hello_payload())
+        elif payload == "PING":
+            self.reply(self.pong_payload())
+        elif payload.startswith("H:") and self.module == "EXTRUDER":
+            self.handle_heater(payload)
+        elif payload.startswith("F:") and self.module == "EXTRUDER":
+            self.handle_fan(payload)
+        else:
+            self.reply("ER UNKNOWN_COMMAND")
+
+    def handle_heater(self, payload):
+        try:
+            params = dict(i.split(":", 1) for i in payload.split(" "))
+            target = float(params["T"])
+            self.thermal.set_target(target)
+        except (ValueError, KeyError):
+            return self.reply("ER BAD_PARAMS")
+
+        if self.thermal.heating:
+            self.heatup_begin = self.clock()
+        else:
+            self.heatup_begin = None
+        self.reply("OK HEATER")
+
+    def handle_fan(self, payload):
+        try:
+            params = dict(i.split(":", 1) for i in payload.split(" "))
+            self.thermal.set_fanspeed(float(params["S"]) / 255)
+        except (ValueError, KeyError):
+            return self.reply("ER BAD_PARAMS")
+        self.reply("OK FAN")
+
+    def hello_payload(self):
+        if self.module == "EXTRUDER":
+            return ("OK HELLO TYPE:EXTRUDER ID:%s VENDOR:FLUX\\ .inc "
+                    "FIRMWARE:EMULATOR VERSION:1.0 EXTRUDER:1 "
+                    "MAX_TEMPERATURE:%.1f" % (self.module_id,
+                                              self.thermal.max_temperature))
+        else:
+            return ("OK HELLO TYPE:%s ID:%s VENDOR:FLUX\\ .inc "
+                    "FIRMWARE:EMULATOR VERSION:1.0" % (self.module,
+                                                       self.module_id))
+
+    def pong_payload(self):
+        if self.module == "EXTRUDER":
+            t = self.thermal
+            rt = t.update()
+            if self.heatup_begin is not None and t.is_reached():
+                self.heatup_times.append(self.clock() - self.heatup_begin)
+                self.heatup_begin = None
+            tt = ("%.1f" % t.target) if t.heating else \
+                ("NAN" if t.target != t.target else "0")
+            return "OK PONG ER:%i RT:%.1f TT:%s FA:%i" % (
+                self.error_flag, rt, tt, int(t.fanspeed * 255))
+        else:
+            return "OK PONG ER:%i" % self.error_flag
+
+    def next_timeout(self):
+        if self._outgoing:
+            return max(self._outgoing[0][0] - self.clock(), 0)
+        else:
+            return None
+
+    def process(self):
+        now = self.clock()
+        while self._outgoing and self._outgoing[0][0] <= now:
+            msg = self._outgoing.popleft()[1]
+            self.sock.send(msg.encode("ascii"))
+            self.counter["sent"] += 1
+
+    def serve_forever(self, interval=0.5):
+        while True:
+            timeout = self.next_timeout()
+            rl = select((self.sock, ), (), (),
+                        interval if timeout is None else timeout)[0]
+            if rl and not self.handle_recv():
+                return
+            self.process()
+
+    def get_report(self):
+        report = dict(self.counter)
+        report["temperature"] = self.thermal.update()
+        report["heatup_times"] = list(self.heatup_times)
+        return report
@@ -22,8 +22,8 @@ class Cameras(object):
             global delta_camera_option
 
             if delta_camera_option is None:
-                from fluxmonitor.storage import Storage
-                storage = Storage("general", "meta")
+                from fluxmonitor.storage import meta_storage
+                storage = meta_storage()
                 delta_camera_option = 1 if storage["camera_version"] == "1" \
                     else 0
 
@@ -1,5 +1,5 @@
 
-from io import BytesIO
+from cStringIO import StringIO
 
 try:
     import cv2
@@ -47,13 +47,19 @@ class CV2Camera(object):
         return self.img_buf
 
     @property
-    def imagefile(self):
+    def imagebytes(self):
+        # Last frame as jpeg str, encoded once a capture
         if self._img_file is None:
             ret, buf = cv2.imencode(".jpg", self.img_buf,
                                     [int(cv2.IMWRITE_JPEG_QUALITY),
                                      IMAGE_QUALITY])
-            self._img_file = buf
-        return ("image/jpeg", len(self._img_file), BytesIO(self._img_file))
+            self._img_file = buf.tostring()
+        return self._img_file
+
+    @property
+    def imagefile(self):
+        buf = self.imagebytes
+        return ("image/jpeg", len(buf), StringIO(buf))
 
     def attach(self):
         if self.obj:
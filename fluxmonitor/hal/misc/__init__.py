@@ -14,10 +14,12 @@ SERIAL = get_serial()
 
 def get_deviceinfo(metadata=None):
     if metadata:
+        snapshot = metadata.snapshot()
         info = {
             "version": version, "model": halprofile.get_model_id(),
-            "uuid": UUID_HEX, "serial": SERIAL, "nickname": metadata.nickname,
-            "cloud": metadata.cloud_status
+            "uuid": UUID_HEX, "serial": SERIAL,
+            "nickname": snapshot["nickname"] or metadata.nickname,
+            "cloud": snapshot["cloud_status"]
         }
     else:
         info = {
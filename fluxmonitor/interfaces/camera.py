@@ -29,30 +29,48 @@ class CameraTcpInterface(SSLInterface):
 
 class CameraProtocol(TextBinaryProtocol):
     streaming = False
+    spf = None
+    scale = 1.0
 
     def on_ready(self):
         super(CameraProtocol, self).on_ready()
         self.ts = 0
+        self.spf = self.kernel.SPF
 
     def on_text(self, text):
         if text == "f":
-            if systime() - self.ts <= self.kernel.SPF:
+            if systime() - self.ts <= self.spf:
                 logger.debug("Require frame (put into queue)")
                 self.kernel.add_to_live_queue(self)
             else:
                 logger.debug("Require frame")
                 self.next_frame()
-        elif text == "s+":
+        elif text.startswith("s+"):
+            # "s+ [fps] [scale]"
+            self.setup_stream(*text.split()[1:])
             self.streaming = True
-            logger.debug("Enable streaming")
+            logger.debug("Enable streaming (fps=%.1f, scale=%.2f)",
+                         1.0 / self.spf, self.scale)
             self.on_frame_sent()
         elif text == "s-":
             self.streaming = False
             logger.debug("Disable streaming")
 
+    def setup_stream(self, fps=None, scale=None):
+        try:
+            if fps is not None:
+                fps = min(max(float(fps), 0.1), self.kernel.MAX_FPS)
+                self.spf = 1.0 / fps
+            if scale is not None:
+                self.scale = min(max(float(scale), 0.1), 1.0)
+        except ValueError:
+            logger.debug("Bad stream params: fps=%s, scale=%s", fps, scale)
+
     def on_frame_sent(self, _=None):
+        # Next frame is taken after previous one is sent, a slow subscriber
+        # skips frames instead of queuing them.
         if self.streaming:
-            if systime() - self.ts <= self.kernel.SPF:
+            if systime() - self.ts <= self.spf:
                 self.kernel.add_to_live_queue(self)
             else:
                 self.next_frame()
@@ -60,13 +78,17 @@ class CameraProtocol(TextBinaryProtocol):
     def next_frame(self):
         try:
             logger.debug("Next frame")
-            self.ts, imageobj = self.kernel.live(0)
+            self.ts, imageobj = self.kernel.live(0, self.scale)
             mimetype, length, stream = imageobj
             self.send(UINT_PACKER.pack(length))
             self.begin_send(stream, length, self.on_frame_sent)
         except IOError as e:
             logger.debug("%s", e)
             self.close()
+        except RuntimeError as e:
+            # Camera error
+            logger.error("Take live frame error: %s", e)
+            self.close()
 
     def on_close(self, handler):
         pass
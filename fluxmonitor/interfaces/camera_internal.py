@@ -12,6 +12,8 @@ CMD_REQUEST_FRAME = 0x00
 CMD_SCAN_CHECKING = 0x01
 CMD_GET_BIAS = 0x02
 CMD_COMPUTE_CAB = (0x03, 0x04, 0x05)
+CMD_STORE_FRAME = 0x06
+CMD_LASER_LINES = 0x07
 CMD_TRANSFER_TO_PUBLIC = 0x79
 CMD_CLOUD_CONNECTION = 0x80
 
@@ -29,6 +31,18 @@ class CameraUnixStreamHandler(MsgpackProtocol, UnixHandler):
         super(CameraUnixStreamHandler, self).on_connected()
         self.on_ready()
 
+    def run_analysis(self, job):
+        # Analysis runs in worker thread, reply when it is done
+        def callback(ret, error):
+            if error is None:
+                self.send_payload(("ok", ret))
+            elif isinstance(error, RuntimeError):
+                self.send_payload(("er", ) + error.args)
+            else:
+                self.send_payload(("er", "UNKNOWN_ERROR"))
+
+        self.kernel.analysis.submit(job, callback)
+
     def on_payload(self, request):
         if isinstance(request, tuple):
             try:
@@ -40,14 +54,23 @@ class CameraUnixStreamHandler(MsgpackProtocol, UnixHandler):
                     self.send_payload(("binary", mimetype, length))
                     self.begin_send(stream, length, lambda _: None)
                 elif cmd == CMD_SCAN_CHECKING:
-                    ret = self.kernel.scan_checking(camera_id)
-                    self.send_payload(("ok", ret))
+                    # Optional request[2]: analyse last frame if True
+                    self.run_analysis(
+                        self.kernel.scan_checking(camera_id, *request[2:3]))
                 elif cmd == CMD_GET_BIAS:
-                    ret = self.kernel.get_bias(camera_id)
-                    self.send_payload(("ok", ret))
+                    self.run_analysis(
+                        self.kernel.get_bias(camera_id, *request[2:3]))
                 elif cmd in CMD_COMPUTE_CAB:
-                    ret = self.kernel.compute_cab(camera_id, cmd)
-                    self.send_payload(("ok", ret))
+                    self.run_analysis(
+                        self.kernel.compute_cab(camera_id, cmd,
+                                                *request[2:3]))
+                elif cmd == CMD_STORE_FRAME:
+                    self.run_analysis(
+                        self.kernel.store_frame(camera_id, request[2]))
+                elif cmd == CMD_LASER_LINES:
+                    self.run_analysis(
+                        self.kernel.laser_lines(camera_id, request[2],
+                                                request[3]))
                 elif cmd == CMD_TRANSFER_TO_PUBLIC:
                     newsock = socket.fromfd(self.sock.fileno(), self.sock.family,
                                             self.sock.type)
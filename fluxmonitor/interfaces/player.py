@@ -1,10 +1,81 @@
-
+from errno import EAGAIN
 from shlex import split as shlex_split
+import logging
+import socket
 
+from fluxmonitor.misc.systime import systime as time
 from .listener import UnixDgrmInterface
 
+logger = logging.getLogger(__name__)
+
+# Subscriber will receive status at least once during this period even if
+# nothing changed, it is used to ensure the player is still alive.
+HEARTBEAT_INTERVAL = 5.0
+MIN_SUBSCRIBE_INTERVAL = 0.1
+
 
 class PlayerUdpInterface(UnixDgrmInterface):
+    def __init__(self, kernel, endpoint):
+        super(PlayerUdpInterface, self).__init__(kernel, endpoint)
+        # endpoint => [interval, last_sent_at]
+        self.subscribers = {}
+
     def on_message(self, buf, endpoint):
         commands = shlex_split(buf)
-        self.kernel.on_request(self, endpoint, *commands)
+        if commands and commands[0].startswith("#"):
+            # Request with id: "#<id> CMD ARGS...", reply "#<id> RESPONSE"
+            handler = RequestReplier(self, commands[0])
+            self.kernel.on_request(handler, endpoint, *commands[1:])
+        else:
+            self.kernel.on_request(self, endpoint, *commands)
+
+    def subscribe(self, endpoint, interval):
+        interval = max(interval, MIN_SUBSCRIBE_INTERVAL)
+        self.subscribers[endpoint] = [interval, 0]
+        logger.debug("%s subscribe status (interval=%.2f)", endpoint, interval)
+
+    def unsubscribe(self, endpoint):
+        self.subscribers.pop(endpoint, None)
+
+    @property
+    def subscribe_interval(self):
+        if self.subscribers:
+            return min(s[0] for s in self.subscribers.values())
+
+    def publish(self, buf, changed=True, force=False):
+        # Send status snapshot to subscribers. A snapshot is sent when it is
+        # changed and subscriber interval reached, or heartbeat is required.
+        # Subscriber which is not able to receive more data will skip this
+        # snapshot instead of blocking the player.
+        now = time()
+        sock = self.getsocket()
+        for endpoint, s in list(self.subscribers.items()):
+            interval, last_sent_at = s
+            if force or (changed and now - last_sent_at >= interval) or \
+                    now - last_sent_at >= HEARTBEAT_INTERVAL:
+                try:
+                    sock.sendto(buf, socket.MSG_DONTWAIT, endpoint)
+                    s[1] = now
+                except socket.error as e:
+                    if e.args[0] != EAGAIN:
+                        logger.debug("Remove status subscriber %s (%s)",
+                                     endpoint, e)
+                        self.subscribers.pop(endpoint, None)
+
+    def close(self):
+        self.subscribers.clear()
+        super(PlayerUdpInterface, self).close()
+
+
+class RequestReplier(object):
+    """Prefix replies with request id, everything else goes to interface."""
+
+    def __init__(self, interface, req_id):
+        self.interface = interface
+        self.req_id = req_id
+
+    def sendto(self, buf, endpoint):
+        self.interface.sendto("%s %s" % (self.req_id, buf), endpoint)
+
+    def __getattr__(self, name):
+        return getattr(self.interface, name)
@@ -0,0 +1,40 @@
+"""
+Latency histogram shared by perf counters of the player and background
+workers.
+"""
+
+# Upper bounds of histogram buckets in milliseconds, last bucket is "more"
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class Histogram(object):
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        for i, bound in enumerate(self.buckets):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "avg": (self.total / self.count) if self.count else 0.0,
+            "max": self.max,
+            "buckets": self.counts
+        }
@@ -42,11 +42,11 @@ class HTTPSConnection(_HTTPSConnection, RestAPIMixIn):
     pass
 
 
-def get_connection(url):
+def get_connection(url, **kw):
     if url.scheme == 'http':
-        return HTTPConnection(url.hostname, url.port or 80)
+        return HTTPConnection(url.hostname, url.port or 80, **kw)
     elif url.scheme == 'https':
-        return HTTPSConnection(url.hostname, url.port or 443)
+        return HTTPSConnection(url.hostname, url.port or 443, **kw)
     else:
         raise RuntimeWarning("BAD_PARAMS",
                              "Can not handle url scheme: '%s'", url.scheme)
@@ -0,0 +1,190 @@
+"""
+Key-value store kept in a single file. Every write replaces the whole file
+(write to a temp file, one fsync, rename), so a power cut leaves either the
+old or the new content and never a half written value. Values are cached in
+process and revalidated with a single stat call, or with a generation counter
+shared between processes when given.
+
+File format: "FKV" | version (uint8) | msgpack map {key: value}
+"""
+
+from contextlib import contextmanager
+import logging
+import msgpack
+import fcntl
+import os
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FKV"
+VERSION = 1
+# Files larger then this in a legacy directory are not settings, skip them
+LEGACY_MAX_SIZE = 65536
+
+
+class KVStore(object):
+    # filename => (signature, data). Shared by all instances in the process.
+    _caches = {}
+
+    def __init__(self, filename, legacy_dir=None, generation=None):
+        # generation: object with get() and bump(), every writer bumps it
+        # after the file is replaced.
+        self.filename = filename
+        self.legacy_dir = legacy_dir
+        self.generation = generation
+
+    def _signature(self):
+        if self.generation:
+            return self.generation.get()
+        try:
+            st = os.stat(self.filename)
+            # Rename assigns a new inode on every write
+            return (st.st_ino, st.st_mtime, st.st_size)
+        except OSError:
+            return None
+
+    @contextmanager
+    def _lock(self):
+        fd = os.open(self.filename + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _read(self):
+        try:
+            with open(self.filename, "rb") as f:
+                buf = f.read()
+        except IOError:
+            return {}
+
+        if buf[:3] != MAGIC or len(buf) < 4 or ord(buf[3]) != VERSION:
+            logger.error("Bad kvstore file: %s", self.filename)
+            return {}
+        try:
+            return msgpack.unpackb(buf[4:])
+        except Exception:
+            logger.exception("Broken kvstore file: %s", self.filename)
+            return {}
+
+    def _write(self, data):
+        tmpfile = self.filename + ".tmp"
+        with open(tmpfile, "wb") as f:
+            f.write(MAGIC + chr(VERSION) + msgpack.packb(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmpfile, self.filename)
+        if self.generation:
+            self.generation.bump()
+        self._caches[self.filename] = (self._signature(), data)
+
+    def _read_legacy(self):
+        data = {}
+        for name in os.listdir(self.legacy_dir):
+            path = os.path.join(self.legacy_dir, name)
+            if os.path.isfile(path) and \
+                    os.path.getsize(path) <= LEGACY_MAX_SIZE:
+                with open(path, "rb") as f:
+                    data[name] = f.read()
+        return data
+
+    def _read_or_migrate(self):
+        # Call with lock acquired
+        if os.path.exists(self.filename):
+            return self._read()
+        elif self.legacy_dir and os.path.isdir(self.legacy_dir):
+            data = self._read_legacy()
+            logger.info("Migrate %i keys from %s", len(data), self.legacy_dir)
+            return data
+        else:
+            return {}
+
+    def migrate(self):
+        """Import one-file-per-key settings from legacy_dir. Legacy files are
+        kept for firmware downgrade."""
+        with self._lock():
+            if os.path.exists(self.filename):
+                return False
+            self._write(self._read_or_migrate())
+            return True
+
+    def load(self):
+        # Signature must be taken before reading the file, a write between
+        # them only causes one more read.
+        sig = self._signature()
+        cache = self._caches.get(self.filename)
+        if cache and sig is not None and cache[0] == sig:
+            return cache[1]
+
+        if not os.path.exists(self.filename):
+            if self.legacy_dir and os.path.isdir(self.legacy_dir):
+                self.migrate()
+                sig = self._signature()
+            else:
+                return {}
+
+        data = self._read()
+        self._caches[self.filename] = (sig, data)
+        return data
+
+    def update(self, items=None, deletes=()):
+        """Set `items` and remove `deletes` in one atomic write."""
+        with self._lock():
+            data = dict(self._read_or_migrate())
+            if items:
+                data.update(items)
+            for key in deletes:
+                data.pop(key, None)
+            self._write(data)
+
+    @contextmanager
+    def batch(self):
+        """Collect changes and write them together when the block ends:
+
+            with store.batch() as b:
+                b["a"] = "1"
+                del b["b"]
+        """
+        b = KVBatch()
+        yield b
+        if b.items or b.deletes:
+            self.update(b.items, b.deletes)
+
+    def get(self, key, default=None):
+        return self.load().get(key, default)
+
+    def keys(self):
+        return self.load().keys()
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __getitem__(self, key):
+        return self.load().get(key)
+
+    def __setitem__(self, key, val):
+        self.update({key: val})
+
+    def __delitem__(self, key):
+        self.update(deletes=(key, ))
+
+    def exists(self, key):
+        return key in self
+
+    def remove(self, key):
+        del self[key]
+
+
+class KVBatch(object):
+    def __init__(self):
+        self.items = {}
+        self.deletes = set()
+
+    def __setitem__(self, key, val):
+        self.deletes.discard(key)
+        self.items[key] = val
+
+    def __delitem__(self, key):
+        self.items.pop(key, None)
+        self.deletes.add(key)
@@ -0,0 +1,142 @@
+"""
+Deliver HTTP postback notifications from a background thread. Requests are
+queued and sent in order, the caller (usually an event loop) never waits for
+the remote server.
+"""
+
+from Queue import Queue, Empty, Full
+from httplib import HTTPException
+from urlparse import urlparse
+from threading import Thread, Lock
+# systime is single precision float, not enough for millisecond latency
+from time import time, sleep
+import logging
+import socket
+
+from .httpclient import get_connection
+from .histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class PostbackWorker(object):
+    _thread = None
+
+    def __init__(self, maxsize=16, timeout=5.0, retries=3, backoff=1.0,
+                 autostart=True):
+        # retries: extra attempts after the first one failed, wait
+        # backoff * 2 ** n seconds before the nth retry
+        # autostart: start the thread at the first submit, otherwise start()
+        # must be called
+        self.autostart = autostart
+        self.queue = Queue(maxsize)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._lock = Lock()
+
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+        self.latency = Histogram()
+
+    def submit(self, url):
+        """Queue a GET request to url. If the queue is full the oldest request
+        is dropped, recent state is more important."""
+        if self.autostart:
+            self.start()
+
+        item = (url, time())
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except Full:
+                try:
+                    dropped = self.queue.get_nowait()
+                    logger.warning("Postback queue full, drop %s", dropped[0])
+                    with self._lock:
+                        self.dropped += 1
+                except Empty:
+                    pass
+
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="postback")
+            self._thread.setDaemon(True)
+            self._thread.start()
+
+    def close(self, timeout=1.0):
+        if self._thread:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+
+    def request(self, url):
+        # Return True if delivered, False if failed and should not retry.
+        # Raise socket.error if it can be retried.
+        u = urlparse(url)
+        conn = get_connection(u, timeout=self.timeout)
+        try:
+            path = u.path or "/"
+            if u.query:
+                path += "?" + u.query
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                raise socket.error("Server return %i" % resp.status)
+            elif resp.status >= 400:
+                logger.warning("Postback %s return %i", url, resp.status)
+                return False
+            return True
+        finally:
+            conn.close()
+
+    def deliver(self, url, created_at):
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retried += 1
+                sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                if self.request(url):
+                    with self._lock:
+                        self.delivered += 1
+                        self.latency.add(time() - created_at)
+                    return True
+                else:
+                    break
+            except (socket.error, HTTPException) as e:
+                logger.debug("Postback %s error (attempt %i): %s",
+                             url, attempt + 1, e)
+            except Exception:
+                logger.exception("Postback %s error", url)
+                break
+
+        logger.error("Postback %s failed", url)
+        with self._lock:
+            self.failed += 1
+        return False
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            self.deliver(*item)
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                "queue": self.queue.qsize(),
+                "delivered": self.delivered,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "retried": self.retried,
+                "latency": self.latency.to_dict()
+            }
@@ -135,6 +135,35 @@ class ScanChecking(object):
         else:
             return 0
 
+    @classmethod
+    def find_laser_line(cls, img1, img2, mode='red', thres=30):
+        '''
+        return subpixel x of maximum of each row in diff(img1, img2) as
+        float32 array, NaN if maximum of the row is less then thres.
+        position is refined by fitting a parabola to the maximum and its
+        neighbors
+        '''
+        d = cv2.absdiff(img1, img2)
+
+        if mode == 'red':
+            d = d[:, :, 2].astype(np.float32)
+        elif mode == 'lumin':
+            d = d[:, :, 0] * 0.7152 + d[:, :, 1] * 0.0722 + d[:, :, 2] * 0.2126
+
+        rows = np.arange(d.shape[0])
+        indices = np.argmax(d, axis=1)
+        peak = d[rows, indices]
+        left = d[rows, np.maximum(indices - 1, 0)]
+        right = d[rows, np.minimum(indices + 1, d.shape[1] - 1)]
+
+        curve = left - 2 * peak + right
+        curve_safe = np.where(curve < 0, curve, -1)
+        offset = np.where(curve < 0, 0.5 * (left - right) / curve_safe, 0)
+
+        result = (indices + offset).astype(np.float32)
+        result[peak < thres] = np.nan
+        return result
+
 
 def get_matrix():
     # print(cv2.CALIB_CB_FAST_CHECK, cv2.cv.CV_CALIB_CB_ADAPTIVE_THRESH, cv2.cv.CV_CALIB_CB_NORMALIZE_IMAGE)
@@ -0,0 +1,148 @@
+"""
+Report device status to a cloud shadow with field level deltas. The shadow
+merges partial documents, so only fields different from the last reported
+state are published. Changes are coalesced for a time window unless a field
+is urgent, and a single message never exceeds the payload budget.
+"""
+
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+# Changes of these fields are published without waiting coalesce window
+URGENT_FIELDS = ("st_id", "err_label")
+# Changed every time. Published together with other changes only.
+VOLATILE_FIELDS = ("timestamp", )
+# Fields are put into a message in this order, others follow by name
+FIELD_PRIORITY = ("st_id", "err_label", "progress", "head_type", "ip_addr",
+                  "timestamp")
+
+
+def diff_state(old, new):
+    """Return fields in `new` different from `old`. Nested dict is compared
+    by key, removed keys are set to None (deleted from shadow)."""
+    delta = {}
+    for key, val in new.items():
+        oldval = old.get(key)
+        if isinstance(val, dict) and isinstance(oldval, dict):
+            subdelta = diff_state(oldval, val)
+            if subdelta:
+                delta[key] = subdelta
+        elif oldval != val or key not in old:
+            delta[key] = val
+    for key in old:
+        if key not in new and old[key] is not None:
+            delta[key] = None
+    return delta
+
+
+def merge_state(base, delta):
+    for key, val in delta.items():
+        if isinstance(val, dict) and isinstance(base.get(key), dict):
+            merge_state(base[key], val)
+        elif val is None:
+            base.pop(key, None)
+        else:
+            base[key] = val.copy() if isinstance(val, dict) else val
+    return base
+
+
+def _priority(key):
+    try:
+        return (FIELD_PRIORITY.index(key), key)
+    except ValueError:
+        return (len(FIELD_PRIORITY), key)
+
+
+class ShadowReporter(object):
+    """
+    update() records the latest state, flush() publishes when required:
+    an urgent field changed, coalesce window passed or heartbeat reached.
+    """
+    # Shadow state confirmed by a successful publish
+    reported = None
+    pending_since = None
+    last_publish = 0
+    _force = True
+
+    def __init__(self, window=10.0, budget=1024, heartbeat=1200.0):
+        self.window = window
+        self.budget = budget
+        self.heartbeat = heartbeat
+        self.state = {}
+        self.reset()
+
+        self.messages = 0
+        self.bytes = 0
+
+    def reset(self):
+        # Forget shadow state, next flush publishes everything
+        self.reported = {}
+        self.pending_since = None
+        self._force = True
+
+    def get_delta(self):
+        delta = diff_state(self.reported, self.state)
+        if delta and not [k for k in delta if k not in VOLATILE_FIELDS]:
+            return {}
+        return delta
+
+    def update(self, state, now):
+        self.state = state
+        if self.pending_since is None and self.get_delta():
+            self.pending_since = now
+
+    def is_urgent(self, delta):
+        for key in URGENT_FIELDS:
+            if key in delta:
+                return True
+        return False
+
+    def build_payload(self, delta):
+        # Return (payload, published fields). Fields not fit in the budget
+        # are left for next message.
+        fields = {}
+        payload = None
+        for key in sorted(delta, key=_priority):
+            fields[key] = delta[key]
+            buf = json.dumps({"state": {"reported": fields}})
+            if len(buf) > self.budget and payload:
+                fields.pop(key)
+            else:
+                payload = buf
+        return payload, fields
+
+    def flush(self, publish, now, force=False):
+        """Call publish(payload) if required. Return True if published."""
+        if now - self.last_publish >= self.heartbeat:
+            self.reset()
+
+        delta = self.get_delta()
+        if not delta:
+            self.pending_since = None
+            return False
+        if self.pending_since is None:
+            self.pending_since = now
+
+        if not (force or self._force or self.is_urgent(delta)) and \
+                now - self.pending_since < self.window:
+            return False
+
+        payload, fields = self.build_payload(delta)
+        if len(payload) > self.budget:
+            logger.warning("Shadow field %s exceeds budget (%i bytes)",
+                           fields.keys(), len(payload))
+        publish(payload)
+
+        merge_state(self.reported, fields)
+        self.last_publish = now
+        self.messages += 1
+        self.bytes += len(payload)
+        if self.get_delta():
+            # Fields left by the budget are sent in next flush
+            self.pending_since = now - self.window
+        else:
+            self.pending_since = None
+            self._force = False
+        return True
@@ -1,6 +1,7 @@
 
 from collections import deque
 from errno import EAGAIN
+from time import time as hrtime
 import logging
 
 from fluxmonitor.diagnosis.god_mode import allow_god_mode
@@ -21,6 +22,7 @@ from .macro import (WaitHeadMacro, SoftAbort,
                     LoadFilamentMacro, UnloadFilamentMacro)
 
 from .main_controller import MainController
+from .perf import PlayerPerf
 from .head_controller import (HeadController, check_toolhead_errno,
                               exec_command as exec_toolhead_cmd)
 
@@ -124,6 +126,7 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
                                 min_z=-1.0, max_z=self.options.max_z)
         self.timecost = timecost
         self.traveldist = traveldist
+        self.perf = PlayerPerf(options.play_bufsize)
 
     def __repr__(self):
         return ("<FcodeExecutor status_id=%i, macro=%s, pause_flags=%i, "
@@ -150,8 +153,19 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
         st["pos"] = self._fsm.get_position()
         return st
 
+    def get_perf(self):
+        return self.perf.to_dict()
+
+    def get_telemetry(self):
+        st = dict(self.get_status())
+        st["time_left"] = self.timecost * (1 - st["prog"])
+        st["queue"] = len(self._cmd_queue) if self._cmd_queue else 0
+        st["mb_window"] = self.mainboard.buffered_cmd_size
+        return st
+
     def _on_mainboard_ready(self, mainboard):
         # status_id should be (4, 6, 18)
+        self.perf.on_mainboard_ready(mainboard)
         toolhead_power_on()
         self.toolhead.bootstrap(self._on_toolhead_ready)
 
@@ -432,8 +446,11 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
 
         elif self.status_id == ST_RUNNING:
             while (not self._eof) and len(self._cmd_queue) < 24:
+                qsize, t = len(self._cmd_queue), hrtime()
                 ret = self._fsm.feed(self._task_loader.fileno(),
                                      self._cb_feed_command)
+                self.perf.on_fsm_feed(len(self._cmd_queue) - qsize,
+                                      hrtime() - t)
                 if ret == 0:
                     self._eof = True
                     fsm = self._fsm
@@ -455,11 +472,13 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
                 else:
                     cmd = self._cmd_queue.popleft()[0]
                     self.mainboard.send_cmd(cmd)
+                    self.perf.on_mainboard_sent(self.mainboard)
             elif target == 2:
                 if self.mainboard.buffered_cmd_size == 0:
                     if self.toolhead.sendable():
                         cmd = self._cmd_queue.popleft()[0]
                         exec_toolhead_cmd(self.toolhead, cmd)
+                        self.perf.on_toolhead_sent()
                     else:
                         return
                 else:
@@ -495,6 +514,8 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
         elif self.macro:
             self.macro.on_command_empty(self)
         else:
+            if self.status_id == ST_RUNNING and not self._eof:
+                self.perf.underruns += 1
             self.fire()
 
     def _on_mb_sendable(self, sender):
@@ -544,7 +565,9 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
 
     def on_mainboard_recv(self):
         try:
+            self.perf.sync_mainboard(self.mainboard)
             self.mainboard.handle_recv()
+            self.perf.sync_mainboard(self.mainboard)
         except IOError as e:
             if e.errno != EAGAIN:
                 self.abort(SystemError(SUBSYSTEM_ERROR, "MAINBOARD_ERROR"))
@@ -566,9 +589,13 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
     def on_toolhead_recv(self):
         try:
             self.toolhead.handle_recv()
+            if self.toolhead.sendable():
+                self.perf.on_toolhead_sendable()
             if self.status_id == ST_RUNNING:
                 check_toolhead_errno(self.toolhead, self.th_error_flag)
                 self.fire()
+                self.perf.set_head_waiting(isinstance(self.macro,
+                                                      WaitHeadMacro))
             elif self.status_id in (ST_RUNNING_RESUMING, ST_STARTING_RESUMING):
                 check_toolhead_errno(self.toolhead, self.th_error_flag)
             elif self.status_id == ST_RUNNING_PAUSED and \
@@ -616,6 +643,7 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
         try:
             self.mainboard.patrol()
             self.toolhead.patrol()
+            self.update_perf()
 
             if self.status_id in (48, 64, 128):
                 if self._fucking_toolhead_power_management_control_flag:
@@ -648,6 +676,14 @@ class FcodeExecutor(AutoResume, ToolheadPowerManagement, BaseExecutor):
                 self.abort(RuntimeError(UNKNOWN_ERROR, "LOOP_ERROR"))
             raise
 
+    def update_perf(self):
+        perf = self.perf
+        perf.sync_mainboard(self.mainboard)
+        if self._cmd_queue is not None:
+            perf.cmd_queue.sample(len(self._cmd_queue))
+        perf.set_head_waiting(self.status_id == ST_RUNNING and
+                              isinstance(self.macro, WaitHeadMacro))
+
     def terminate(self):
         logger.debug("Terminated")
 
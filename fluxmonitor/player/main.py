@@ -15,9 +15,12 @@ from .fcode_executor import FcodeExecutor
 from .connection import create_mainboard_socket, create_toolhead_socket
 from .options import Options
 from .misc import TaskLoader, place_recent_file
+from .status import StatusTracker
+from .perf import PerfLogger
 
 
 logger = logging.getLogger("")
+PERF_LOG_INTERVAL = 10.0
 
 
 def parse_float(str_val):
@@ -42,6 +45,12 @@ class FatalExecutor(object):
     def start(self):
         return True
 
+    def get_perf(self):
+        return {}
+
+    def get_telemetry(self):
+        return self.get_status()
+
     def get_status(self):
         return {
             "st_id": 128,
@@ -65,9 +74,13 @@ class FatalExecutor(object):
 
 
 class Player(ServiceBase):
+    _last_status_id = None
+    perf_logger = None
+
     def __init__(self, options):
         super(Player, self).__init__(logger, options, pyev.Loop(pyev.EVFLAG_NOSIGMASK))
         self.control_interface = PlayerUdpInterface(self, options.control_endpoint)
+        self.status_tracker = StatusTracker()
         metadata.update_device_status(1, 0, "N/A", err_label="")
 
         try:
@@ -76,8 +89,14 @@ class Player(ServiceBase):
             logger.error("Can not renice process to -5")
 
         self.timer_watcher = self.loop.timer(0.8, 0.8, self.on_timer)
+        self.status_watcher = self.loop.timer(0, 1, self.on_status_timer)
         self.task_filename = options.taskfile
 
+        if getattr(options, "perf_log", None):
+            self.perf_logger = PerfLogger(options.perf_log)
+            self.perf_log_watcher = self.loop.timer(
+                PERF_LOG_INTERVAL, PERF_LOG_INTERVAL, self.on_perf_log_timer)
+
         try:
             place_recent_file(options.taskfile)
         except Exception:
@@ -87,10 +106,23 @@ class Player(ServiceBase):
         self.setup_job()
         self.timer_watcher.start()
         self.executor.start()
+        if self.perf_logger:
+            self.perf_log_watcher.start()
 
     def on_shutdown(self):
         self.executor.close()
+        try:
+            metadata.update_telemetry({})
+        except Exception:
+            logger.exception("Clear telemetry error")
+        self.status_watcher.stop()
         self.control_interface.close()
+        if self.perf_logger:
+            self.perf_log_watcher.stop()
+            perf = self.executor.get_perf()
+            if perf:
+                self.perf_logger.write(perf)
+            self.perf_logger.close()
 
     def setup_job(self, restart=False):
         try:
@@ -156,6 +188,7 @@ class Player(ServiceBase):
                 logger.exception("Unhandle mainboard recv error")
         except Exception:
             logger.exception("Unhandle mainboard recv error")
+        self.check_status_changed()
 
     def on_toolhead_recv(self, watcher, revent):
         try:
@@ -167,6 +200,63 @@ class Player(ServiceBase):
                 logger.exception("Unhandle toolhead recv error")
         except Exception:
             logger.exception("Unhandle toolhead recv error")
+        self.check_status_changed()
+
+    def check_status_changed(self):
+        # Push status to subscribers immediately when status id changed
+        if self._last_status_id != self.executor.status_id and \
+                self.control_interface.subscribers:
+            self.publish_status(force=True)
+
+    def publish_status(self, force=False):
+        self._last_status_id = self.executor.status_id
+        changed = self.status_tracker.update(self.executor.get_status())
+        self.control_interface.publish(self.status_tracker.pack(), changed,
+                                       force)
+
+    def refresh_status(self):
+        # Update status tracker, subscribers must not miss the change
+        if self.control_interface.subscribers:
+            self.publish_status()
+        else:
+            self.status_tracker.update(self.executor.get_status())
+
+    def subscribe_status(self, endpoint, interval):
+        self.refresh_status()
+        self.control_interface.subscribe(endpoint, interval)
+        self.control_interface.sendto(self.status_tracker.pack(), endpoint)
+        self._update_status_watcher()
+
+    def unsubscribe_status(self, endpoint):
+        self.control_interface.unsubscribe(endpoint)
+        self._update_status_watcher()
+
+    def _update_status_watcher(self):
+        interval = self.control_interface.subscribe_interval
+        if interval:
+            if self.status_watcher.repeat != interval:
+                self.status_watcher.stop()
+                self.status_watcher.set(interval, interval)
+            if not self.status_watcher.active:
+                self.status_watcher.start()
+        elif self.status_watcher.active:
+            self.status_watcher.stop()
+
+    def on_status_timer(self, watcher, revent):
+        try:
+            self.publish_status()
+            if not self.control_interface.subscribers:
+                watcher.stop()
+        except Exception:
+            logger.exception("Unhandle error while publish status")
+
+    def on_perf_log_timer(self, watcher, revent):
+        try:
+            perf = self.executor.get_perf()
+            if perf:
+                self.perf_logger.write(perf)
+        except Exception:
+            logger.exception("Unhandle error while write perf log")
 
     def on_request(self, handler, endpoint, cmd, *args):
         try:
@@ -176,9 +266,29 @@ class Player(ServiceBase):
                 else:
                     handler.sendto("error RESOURCE_BUSY", endpoint)
             elif cmd == "REPORT":  # Report
-                st = self.executor.get_status()
-                pl = json.dumps(st)
+                # REPORT [JSON|MSGPACK [seq]|PERF]
+                fmt = args[0] if args else "JSON"
+                if fmt == "MSGPACK":
+                    try:
+                        since = int(args[1]) if len(args) > 1 else None
+                        self.refresh_status()
+                        pl = self.status_tracker.pack(since)
+                    except ValueError:
+                        pl = "error BAD_PARAMS"
+                elif fmt == "PERF":
+                    pl = json.dumps(self.executor.get_perf())
+                else:
+                    pl = json.dumps(self.executor.get_status())
                 handler.sendto(pl, endpoint)
+            elif cmd == "SUBSCRIBE":
+                try:
+                    interval = float(args[0]) if args else 1.0
+                    self.subscribe_status(endpoint, interval)
+                except ValueError:
+                    handler.sendto("error BAD_PARAMS", endpoint)
+            elif cmd == "UNSUBSCRIBE":
+                self.unsubscribe_status(endpoint)
+                handler.sendto("ok", endpoint)
             elif cmd == "RESUME":  # Continue
                 if self.executor.resume():
                     handler.sendto("ok", endpoint)
@@ -250,6 +360,7 @@ class Player(ServiceBase):
                     handler.sendto("error RESOURCE_BUSY", endpoint)
         except Exception:
             logger.exception("Unhandle error")
+        self.check_status_changed()
 
     def on_timer(self, watcher, revent):
         try:
@@ -262,6 +373,8 @@ class Player(ServiceBase):
             metadata.update_device_status(
                 self.executor.status_id, self.executor.progress,
                 self.executor.toolhead_name or "N/A", self.executor.error_str)
+            self.check_status_changed()
+            metadata.update_telemetry(self.executor.get_telemetry())
 
         except Exception:
             logger.exception("Unhandler Error")
@@ -1,7 +1,7 @@
 
 from sys import maxint
 
-from fluxmonitor.storage import Storage
+from fluxmonitor.storage import meta_storage
 from fluxmonitor.config import (DEFAULT_MOVEMENT_TEST, DEFAULT_H, LIMIT_MAX_R)
 from fluxmonitor.player import macro as macros
 
@@ -56,7 +56,7 @@ class PlayerOptions(object):
     additional_macros = None  # [ (klass1, kwargs), (klass2, kwargs...), ... ]
 
     def __init__(self, taskloader=None, head=None):
-        storage = Storage("general", "meta")
+        storage = meta_storage()
         metadata = taskloader.metadata if taskloader else {}
         self.additional_macros = []
 
@@ -0,0 +1,171 @@
+"""
+Performance counters of the player pipeline. They answer "who was the
+bottleneck" when a print stuttered: the fcode decoder (host), the command
+window (serial link) or the mainboard/toolhead.
+
+MainController is a compiled extension and does not report acks itself, so
+mainboard numbers are derived from its public attributes: `_ln` grows when a
+command is sent and `buffered_cmd_size` drops when the mainboard acknowledges
+commands left its queue (in order).
+
+Commands of the print stream are timestamped when sent. Commands sent by
+macros outside the mainboard recv path are timestamped at next sync, at most
+one loop interval late, so `ack_latency` of those is approximate.
+"""
+
+from collections import deque
+from logging.handlers import RotatingFileHandler
+# systime is single precision float, not enough for millisecond latency
+from time import time
+import logging
+import json
+
+from fluxmonitor.misc.histogram import Histogram, LATENCY_BUCKETS
+
+
+class Gauge(object):
+    """Sampled value, keep current, max and average."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.cur = self.max = self.total = 0
+        self.samples = 0
+
+    def sample(self, value):
+        self.cur = value
+        self.total += value
+        self.samples += 1
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        return {
+            "cur": self.cur,
+            "max": self.max,
+            "avg": (float(self.total) / self.samples) if self.samples else 0.0
+        }
+
+
+class PlayerPerf(object):
+    def __init__(self, bufsize):
+        self.bufsize = bufsize
+        self.begin_at = time()
+
+        self.cmd_queue = Gauge()
+        self.mb_window = Gauge()
+        self.ack_latency = Histogram()
+        self.toolhead_latency = Histogram()
+
+        self.resends = 0
+        self.timeouts = 0
+        # Mainboard queue became empty while printing, the host was too slow
+        self.underruns = 0
+
+        self.fsm_commands = 0
+        self.fsm_time = 0.0
+        self.head_wait_time = 0.0
+        self.head_wait_count = 0
+
+        self._mb_ln = 0
+        self._mb_sent = deque()
+        self._mb_retry = 0
+        self._mb_resend_inhibit = 0
+        self._th_sent_at = None
+        self._head_wait_at = None
+
+    def on_mainboard_ready(self, mainboard):
+        # Line number restarts from 0 after bootstrap
+        self._mb_ln = mainboard._ln
+        self._mb_sent.clear()
+
+    def _stamp_sent(self, mainboard, now):
+        ln = mainboard._ln
+        if ln < self._mb_ln:
+            self._mb_ln = 0
+            self._mb_sent.clear()
+        if ln > self._mb_ln:
+            self._mb_sent.extend(now for _ in range(ln - self._mb_ln))
+            self._mb_ln = ln
+
+    def on_mainboard_sent(self, mainboard):
+        self._stamp_sent(mainboard, time())
+
+    def sync_mainboard(self, mainboard):
+        now = time()
+        self._stamp_sent(mainboard, now)
+
+        buffered = mainboard.buffered_cmd_size
+        while len(self._mb_sent) > buffered:
+            self.ack_latency.add(now - self._mb_sent.popleft())
+        self.mb_window.sample(buffered)
+
+        if mainboard.send_retry > self._mb_retry:
+            self.timeouts += mainboard.send_retry - self._mb_retry
+            self._mb_retry = mainboard.send_retry
+
+        resend_inhibit = mainboard._resend_inhibit
+        if resend_inhibit and resend_inhibit != self._mb_resend_inhibit:
+            self.resends += 1
+        self._mb_resend_inhibit = resend_inhibit
+
+    def on_fsm_feed(self, commands, elapsed):
+        self.fsm_commands += commands
+        self.fsm_time += elapsed
+
+    def on_toolhead_sent(self):
+        self._th_sent_at = time()
+
+    def on_toolhead_sendable(self):
+        if self._th_sent_at is not None:
+            self.toolhead_latency.add(time() - self._th_sent_at)
+            self._th_sent_at = None
+
+    def set_head_waiting(self, waiting):
+        # Waiting toolhead (heaters) to reach its target
+        if waiting:
+            if self._head_wait_at is None:
+                self._head_wait_at = time()
+        elif self._head_wait_at is not None:
+            self.head_wait_time += time() - self._head_wait_at
+            self.head_wait_count += 1
+            self._head_wait_at = None
+
+    def to_dict(self):
+        head_wait = self.head_wait_time
+        if self._head_wait_at is not None:
+            head_wait += time() - self._head_wait_at
+
+        return {
+            "uptime": time() - self.begin_at,
+            "cmd_queue": self.cmd_queue.to_dict(),
+            "mb_window": self.mb_window.to_dict(),
+            "mb_bufsize": self.bufsize,
+            "ack_latency": self.ack_latency.to_dict(),
+            "ack_buckets": LATENCY_BUCKETS,
+            "resends": self.resends,
+            "timeouts": self.timeouts,
+            "underruns": self.underruns,
+            "fsm_commands": self.fsm_commands,
+            "fsm_rate": (self.fsm_commands / self.fsm_time)
+            if self.fsm_time else 0.0,
+            "toolhead_latency": self.toolhead_latency.to_dict(),
+            "head_wait": head_wait,
+            "head_wait_count": self.head_wait_count,
+        }
+
+
+class PerfLogger(object):
+    """Append perf snapshots as json lines to a rotating log file."""
+    def __init__(self, filename, max_bytes=256 * 1024, backup_count=2):
+        self.handler = RotatingFileHandler(filename, maxBytes=max_bytes,
+                                           backupCount=backup_count)
+        self.handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def write(self, doc):
+        doc["ts"] = time()
+        record = logging.makeLogRecord({"msg": json.dumps(doc)})
+        self.handler.handle(record)
+
+    def close(self):
+        self.handler.close()
@@ -0,0 +1,76 @@
+import struct
+
+import msgpack
+
+# Status snapshot datagram:
+#   "\x00ST" (3) | schema version (uint8) | sequence (uint32) | msgpack body
+# An empty body means "unchanged since the given sequence". It is used both
+# for pushed snapshots and for "REPORT MSGPACK [seq]" replies.
+STATUS_MAGIC = b"\x00ST"
+STATUS_SCHEMA_VERSION = 1
+STATUS_HEADER = struct.Struct("<3sBI")
+
+# Fields changed every time. They are not considered as a status change.
+VOLATILE_FIELDS = ("time_total", "time_running")
+
+
+def is_status_message(buf):
+    return buf[:3] == STATUS_MAGIC
+
+
+def pack_status(seq, status):
+    return STATUS_HEADER.pack(STATUS_MAGIC, STATUS_SCHEMA_VERSION,
+                              seq) + msgpack.packb(status)
+
+
+def pack_unchanged(seq):
+    return STATUS_HEADER.pack(STATUS_MAGIC, STATUS_SCHEMA_VERSION, seq)
+
+
+def unpack_status(buf):
+    # Return (seq, status), status is None if the message is an unchanged
+    # reply
+    magic, version, seq = STATUS_HEADER.unpack_from(buf)
+    if magic != STATUS_MAGIC:
+        raise ValueError("BAD_MAGIC")
+    if version != STATUS_SCHEMA_VERSION:
+        raise ValueError("SCHEMA_VERSION", version)
+
+    body = buf[STATUS_HEADER.size:]
+    if body:
+        return seq, msgpack.unpackb(body, use_list=False)
+    else:
+        return seq, None
+
+
+class StatusTracker(object):
+    """Keep last status and assign a new sequence number when it changes."""
+    seq = 0
+    status = None
+
+    def update(self, status):
+        # Return True if status changed
+        last = self.status
+        # Caller may update the same dict in place (ex: toolhead status),
+        # keep a copy or it will always equal to the last one.
+        self.status = dict(status)
+        if last is not None and len(last) == len(status):
+            for key, val in status.items():
+                if key in VOLATILE_FIELDS:
+                    continue
+                lastval = last.get(key)
+                # NaN never equals to itself
+                if lastval != val and (lastval == lastval or val == val):
+                    break
+            else:
+                return False
+
+        self.seq = (self.seq + 1) & 0xffffffff
+        return True
+
+    def pack(self, since=None):
+        # Return a short reply if the caller already has sequence `since`
+        if since == self.seq:
+            return pack_unchanged(self.seq)
+        else:
+            return pack_status(self.seq, self.status)
@@ -24,19 +24,55 @@ class AccessControl(object):
     def __init__(self, storage=None):
         from fluxmonitor.storage import Storage
         self.storage = storage if storage else Storage("security", "pub")
+        # Trusted key index, filename => (file signature, parsed value).
+        # Other processes may add or remove keys, entries are validated
+        # with a stat call instead of reading and parsing the key again.
+        self._index = {}
+
+    def _signature(self, filename):
+        try:
+            st = os.stat(self.storage.get_path(filename))
+            return (st.st_ino, st.st_mtime, st.st_size)
+        except OSError:
+            return None
+
+    def _get_cached(self, filename):
+        cache = self._index.get(filename)
+        if cache:
+            if cache[0] == self._signature(filename):
+                return cache[1]
+            else:
+                del self._index[filename]
+
+    def _set_cached(self, filename, value):
+        sig = self._signature(filename)
+        if sig:
+            self._index[filename] = (sig, value)
+
+    def _invalidate(self, access_id):
+        self._index.pop(access_id, None)
+        self._index.pop(access_id + ".meta", None)
 
     def get_keyobj(self, pem=None, der=None, access_id=None):
         if access_id:
-            if _safe_value(access_id) and self.storage.exists(access_id):
+            if not _safe_value(access_id):
+                return None
+            keyobj = self._get_cached(access_id)
+            if keyobj:
+                return keyobj
+
+            if self.storage.exists(access_id):
                 buf = self.storage.readall(access_id)
                 try:
                     if buf.startswith("-----BEGIN "):
-                        return RSAObject(pem=buf)
+                        keyobj = RSAObject(pem=buf)
                     else:
-                        return RSAObject(der=buf)
+                        keyobj = RSAObject(der=buf)
                 except (RuntimeError, TypeError):
                     self.storage.unlink(access_id)
                     return None
+                self._set_cached(access_id, keyobj)
+                return keyobj
             else:
                 return None
 
@@ -54,6 +90,7 @@ class AccessControl(object):
 
     def add(self, keyobj, **kw):
         access_id = self.get_access_id(keyobj=keyobj)
+        self._invalidate(access_id)
 
         with self.storage.open(access_id, "w") as f:
             f.write(keyobj.export_pubkey_pem())
@@ -71,11 +108,16 @@ class AccessControl(object):
         return access_id
 
     def get_metadata(self, access_id):
-        try:
-            with self.storage.open(access_id + ".meta") as f:
-                return json.load(f)
-        except (IOError, ValueError):
-            return {}
+        filename = access_id + ".meta"
+        meta = self._get_cached(filename)
+        if meta is None:
+            try:
+                with self.storage.open(filename) as f:
+                    meta = json.load(f)
+            except (IOError, ValueError):
+                return {}
+            self._set_cached(filename, meta)
+        return dict(meta)
 
     def list(self):
         for name in self.storage.list():
@@ -94,6 +136,7 @@ class AccessControl(object):
             return False
 
     def remove(self, access_id):
+        self._invalidate(access_id)
         if self.storage.exists(access_id):
             self.storage.remove(access_id)
 
@@ -107,6 +150,7 @@ class AccessControl(object):
     def remove_all(self):
         for meta in tuple(self.list()):
             self.remove(meta["access_id"])
+        self._index.clear()
 
     def is_rsakey(self, pem=None, der=None):
         return is_rsakey(pem, der)
@@ -1,6 +1,11 @@
 
+from Queue import Queue, Empty, Full
 from collections import deque
+from threading import Thread
+# cStringIO reads a str in place, it does not copy the frame
+from cStringIO import StringIO
 import logging
+import os
 
 try:
     import cv2
@@ -15,15 +20,24 @@ from fluxmonitor.interfaces.camera import (CameraTcpInterface,
                                            CameraCloudHandler)
 
 
+from fluxmonitor.misc.systime import systime
 from fluxmonitor.hal.camera import Cameras
 from .base import ServiceBase
 
 logger = logging.getLogger(__name__)
+IMAGE_QUALITY = 80
 
 
 class CameraService(ServiceBase):
+    # Default frame rate of a live subscriber
     FPS = 4.0
     SPF = 1.0 / FPS
+    MAX_FPS = 10.0
+    # Timer interval if nobody is waiting for a frame, it only checks if the
+    # camera can be released.
+    IDLE_INTERVAL = 5.0
+    # Subscriber due within this period is served in current tick
+    LIVE_TOLERANCE = 0.01
     cameras = None
     cloud_conn = None
 
@@ -35,18 +49,30 @@ class CameraService(ServiceBase):
         self.internal_ifce = CameraUnixStreamInterface(self)
 
         self.live_queue = deque()
-        self.live_timer = self.loop.timer(self.SPF, self.SPF, self.on_live)
+        # name => decoded frame, kept for laser line extraction
+        self.frames = {}
+        # Increased when camera takes a new frame
+        self.capture_seq = 0
+        self._live_ts = None
+        # (capture_seq, decoded frame) of the last decoded frame
+        self._frame_cache = (-1, None)
+        self.dump_dir = options.dump_dir
+        self.live_timer = self.loop.timer(self.IDLE_INTERVAL,
+                                          self.IDLE_INTERVAL, self.on_live)
+        # (camera ts, scale) => downscaled jpeg of current live frame
+        self._scaled_frames = {}
+        self.analysis = AnalysisWorker(self.loop)
 
     def on_start(self):
         logger.info("Camera service started")
 
     def on_shutdown(self):
+        self.analysis.close()
         self.public_ifce.close()
         self.internal_ifce.close()
 
     def on_connected(self, handler):
-        if not self.live_timer.active:
-            self.live_timer.start()
+        self.update_live_timer()
 
     def on_connect2cloud(self, camera_id, endpoint, token):
         if self.cloud_conn:
@@ -58,114 +84,266 @@ class CameraService(ServiceBase):
 
         self.cloud_conn = CameraCloudHandler(self, endpoint, token, on_close)
 
+    def update_live_timer(self):
+        # Wake up when the first waiting subscriber is due (last frame ts +
+        # its spf). An earlier wake up is kept, on_live schedules again.
+        if self.live_queue:
+            due = min(h.ts + h.spf for h in self.live_queue)
+            delay = max(due - systime(), 0)
+        else:
+            delay = self.IDLE_INTERVAL
+
+        if self.live_timer.active:
+            if self.live_timer.remaining <= delay:
+                return
+            self.live_timer.stop()
+        self.live_timer.set(delay, 0)
+        self.live_timer.start()
+
     def on_live(self, watcher=None, revent=None):
+        now = systime()
+        waiting = deque()
         while self.live_queue:
             h = self.live_queue.popleft()
+            if h.ts + h.spf - now > self.LIVE_TOLERANCE:
+                # Not due yet
+                waiting.append(h)
+                continue
             try:
                 h.next_frame()
             except Exception:
                 h.on_error()
                 logger.exception("Error at next frame in timer")
+        self.live_queue.extend(waiting)
 
         if not self.internal_ifce.clients and not self.public_ifce.clients:
             self.cameras.release()
+            self._scaled_frames.clear()
             if self.live_timer.active:
                 self.live_timer.stop()
+        else:
+            self.update_live_timer()
 
     def add_to_live_queue(self, handler):
         if handler not in self.live_queue:
             self.live_queue.append(handler)
+            self.update_live_timer()
 
-    def live(self, camera_id):
+    def live(self, camera_id, scale=1.0):
         # API for client
         camera = self.cameras[camera_id]
         ts = camera.live()
-        return ts, camera.imagefile
+        if ts != self._live_ts:
+            self._live_ts = ts
+            self._scaled_frames.clear()
+            self.capture_seq += 1
+
+        if scale >= 1.0 or cv2 is None:
+            return ts, camera.imagefile
+        else:
+            return ts, self.get_scaled_frame(camera_id, ts, scale)
+
+    def get_scaled_frame(self, camera_id, ts, scale):
+        # Encode downscaled variant only if a subscriber asks, once a frame
+        # and scale. It costs a full decode, resize and encode in the loop,
+        # at most MAX_FPS times a second for each scale in use. Subscribers
+        # of the same scale share the result.
+        buf = self._scaled_frames.get((ts, scale))
+        if buf is None:
+            camera = self.cameras[camera_id]
+            img = cv2.imdecode(np.fromstring(camera.imagebytes, np.uint8),
+                               cv2.CV_LOAD_IMAGE_COLOR)
+            if img is None:
+                logger.warning("Can not decode live frame, send unscaled")
+                return camera.imagefile
+            img = cv2.resize(img, (0, 0), fx=scale, fy=scale,
+                             interpolation=cv2.INTER_AREA)
+            buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY),
+                                            IMAGE_QUALITY])[1].tostring()
+            self._scaled_frames[(ts, scale)] = buf
+        return ("image/jpeg", len(buf), StringIO(buf))
 
     def makeshot(self, camera_id):
         # API for client
-        camera = self.cameras[camera_id]
-        camera.fetch()
-        return camera.imagefile
+        return self.capture(camera_id).imagefile
 
-    def scan_checking(self, camera_id):
-        # API for client
+    def capture(self, camera_id):
         camera = self.cameras[camera_id]
-        sc = ScanChecking()
         camera.fetch()
-        img = cv2.imdecode(np.fromstring(camera.imagefile[2].getvalue(),
-                                         np.uint8),
+        self.capture_seq += 1
+        # Frame is served by live() too, it must not be counted again
+        self._live_ts = camera.ts
+        self._scaled_frames.clear()
+        return camera
+
+    def prepare_frame(self, camera_id, reuse=False):
+        """Return (capture seq, jpeg) for analysis. A new frame is captured
+        unless reuse is True, then the last captured frame is used."""
+        if not reuse or self.capture_seq == 0:
+            self.capture(camera_id)
+        return self.capture_seq, self.cameras[camera_id].imagebytes
+
+    # Methods below run in the analysis worker thread. Decoded frames are
+    # only accessed from the worker.
+    def decode_frame(self, buf):
+        img = cv2.imdecode(np.fromstring(buf, np.uint8),
                            cv2.CV_LOAD_IMAGE_COLOR)
-        if self.cameras.rotate:
-            img = np.rot90(img, self.cameras.rotate)
         if img is None:
             raise RuntimeError("HARDWARE_ERROR")
-        else:
-            return sc.check(img)
-
-    def get_bias(self, camera_id):
-        # API for client
-        camera = self.cameras[camera_id]
-        camera.fetch()
-        img = cv2.imdecode(np.fromstring(camera.imagefile[2].getvalue(),
-                                         np.uint8),
-                           cv2.CV_LOAD_IMAGE_COLOR)
         if self.cameras.rotate:
             img = np.rot90(img, self.cameras.rotate)
-        flag, points = ScanChecking.find_board(img)
-        cv2.imwrite('/home/pi/tmp1.jpg', img)
+        return img
 
-        if flag:
-            return float(ScanChecking.get_bias(points))
-        else:
-            return 'nan'
+    def load_frame(self, frame):
+        # Return decoded and rotated frame, each capture is decoded once
+        seq, buf = frame
+        cached_seq, img = self._frame_cache
+        if cached_seq != seq:
+            img = self.decode_frame(buf)
+            self._frame_cache = (seq, img)
+        return img
 
-    def compute_cab(self, camera_id, cmd):
-        # API for client
-        camera = self.cameras[camera_id]
+    def dump_frame(self, name, img):
+        # Save analysed frame for debugging, enabled by --dump-dir
+        if self.dump_dir:
+            cv2.imwrite(os.path.join(self.dump_dir, name + ".jpg"), img)
+
+    # Analysis APIs for client. They capture the frame in the loop and return
+    # a job to run in the analysis worker.
+    def store_frame(self, camera_id, name):
+        frame = self.prepare_frame(camera_id)
+
+        def job():
+            self.frames[name] = self.load_frame(frame)
+        return job
+
+    def laser_lines(self, camera_id, off_name, on_names):
+        # Job returns float32 laser x position of each row for every frame
+        # in on_names. Stored frames are released.
+        def job():
+            try:
+                img_off = self.frames[off_name]
+                return [ScanChecking.find_laser_line(
+                    img_off, self.frames[name]).tostring()
+                    for name in on_names]
+            except KeyError:
+                raise RuntimeError("BAD_PARAMS", "NO_FRAME")
+            finally:
+                self.frames.clear()
+        return job
 
+    def scan_checking(self, camera_id, reuse=False):
+        frame = self.prepare_frame(camera_id, reuse)
+        return lambda: ScanChecking.check(self.load_frame(frame))
+
+    def get_bias(self, camera_id, reuse=False):
+        frame = self.prepare_frame(camera_id, reuse)
+
+        def job():
+            img = self.load_frame(frame)
+            flag, points = ScanChecking.find_board(img)
+            self.dump_frame("bias", img)
+
+            if flag:
+                return float(ScanChecking.get_bias(points))
+            else:
+                return 'nan'
+        return job
+
+    def compute_cab(self, camera_id, cmd, reuse=False):
         if cmd == 3:
-            # no need to take photo again, just retrieve the img buffer
-            camera.fetch()
-            self.img_o = cv2.imdecode(
-                np.fromstring(camera.imagefile[2].getvalue(), np.uint8),
-                cv2.CV_LOAD_IMAGE_COLOR)
-            if self.cameras.rotate:
-                img_o = np.rot90(self.img_o, self.cameras.rotate)
-
-            _, points = ScanChecking.find_board(img_o)
-            self.s = 0
-            for i in xrange(16):
-                self.s += points[i][0][0]
-            self.s /= 16
-
-            logger.info('find calibrat board center ' + str(self.s))
-            # cv2.imwrite('/home/pi/tmp_O.jpg', self.img_o)
-            return self.s
+            # Frame without laser, it may be the same frame of get_bias
+            frame = self.prepare_frame(camera_id, reuse)
+            return lambda: self._compute_cab_board(frame)
         else:
-            camera.fetch()
-            img_r = cv2.imdecode(np.fromstring(camera.imagefile[2].getvalue(),
-                                               np.uint8),
-                                 cv2.CV_LOAD_IMAGE_COLOR)
-            if self.cameras.rotate:
-                img_r = np.rot90(img_r, self.cameras.rotate)
-                img_o = np.rot90(self.img_o, self.cameras.rotate)
-
-            result = ScanChecking.find_red(img_o, img_r)
-            logger.info('{}:red at {}'.format(cmd, result))
-            ################################
-            # for h in xrange(img_r.shape[0]):
-            #     img_r[h][result][0] = 255
-            #     img_r[h][result][1] = 255
-            #     img_r[h][result][2] = 255
-            # cv2.imwrite('/var/db/fluxmonitord/run/{}.jpg'.format(cmd), img_r)
-            # ################################
-            # w = img_r.shape[1] / 2  # 640 / 2 = 320
-            if cmd == 5:
-                del self.img_o
-                del self.s
-
-            if result:
-                return result
-            else:
-                return 'fail'
+            frame = self.prepare_frame(camera_id)
+            return lambda: self._compute_cab_laser(frame, cmd)
+
+    def _compute_cab_board(self, frame):
+        self.img_o = self.load_frame(frame)
+
+        _, points = ScanChecking.find_board(self.img_o)
+        self.s = 0
+        for i in xrange(16):
+            self.s += points[i][0][0]
+        self.s /= 16
+
+        logger.info('find calibrat board center ' + str(self.s))
+        self.dump_frame("cab_O", self.img_o)
+        return self.s
+
+    def _compute_cab_laser(self, frame, cmd):
+        img_r = self.load_frame(frame)
+
+        result = ScanChecking.find_red(self.img_o, img_r)
+        logger.info('{}:red at {}'.format(cmd, result))
+        self.dump_frame("cab_%i" % cmd, img_r)
+        if cmd == 5:
+            del self.img_o
+            del self.s
+
+        if result:
+            return result
+        else:
+            return 'fail'
+
+
+class AnalysisWorker(object):
+    """Run OpenCV analysis jobs in a thread so the loop keeps serving live
+    streams. Callbacks are invoked in the loop with (result, error)."""
+
+    def __init__(self, loop, maxsize=4):
+        self.queue = Queue(maxsize)
+        self.results = deque()
+        self.notifier = loop.async(self.on_results)
+        self.notifier.start()
+
+        self.thread = Thread(target=self.run, name="analysis")
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def submit(self, job, callback):
+        try:
+            self.queue.put_nowait((job, callback))
+        except Full:
+            raise RuntimeError("RESOURCE_BUSY")
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            job, callback = item
+            try:
+                result = (job(), None)
+            except RuntimeError as e:
+                result = (None, e)
+            except Exception as e:
+                logger.exception("Error while running analysis")
+                result = (None, e)
+            self.results.append((callback, result))
+            self.notifier.send()
+
+    def on_results(self, watcher, revent):
+        while self.results:
+            callback, (ret, error) = self.results.popleft()
+            try:
+                callback(ret, error)
+            except Exception:
+                logger.exception("Error in analysis callback")
+
+    def close(self):
+        # Drop waiting jobs, only the running one is left to finish. put()
+        # would block shutdown while the queue is full.
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                break
+        try:
+            self.queue.put_nowait(None)
+        except Full:
+            logger.warning("Analysis queue refilled during close")
+        self.thread.join(1.0)
+        self.notifier.stop()
@@ -2,8 +2,10 @@
 from AWSIoTPythonSDK.core.protocol.mqttCore import (
     publishQueueDisabledException)
 from binascii import a2b_base64, b2a_base64
+from threading import Thread
 from urlparse import urlparse
-# from OpenSSL import crypto
+from hashlib import sha1
+from OpenSSL import crypto
 from select import select
 from ssl import SSLError
 import msgpack
@@ -13,18 +15,41 @@ import json
 import os
 
 from fluxmonitor.misc.httpclient import get_connection
+from fluxmonitor.misc.postback import PostbackWorker
+from fluxmonitor.misc.shadow import ShadowReporter
 from fluxmonitor.misc.systime import systime as time
 from fluxmonitor.halprofile import get_model_id
-from fluxmonitor.storage import Storage, metadata
+from fluxmonitor.storage import Storage, meta_storage, metadata
 from fluxmonitor.config import CAMERA_ENDPOINT, ROBOT_ENDPOINT
 from fluxmonitor import security, __version__
 
 from .base import ServiceBase
 
 ERROR_COUNTER_MATCH = [int(2 ** i ** 0.70) - 1 for i in range(32)]
+# Player telemetry fields reported to cloud shadow
+TELEMETRY_FIELDS = ("prog", "time_left", "rt", "tt", "pos")
 logger = logging.getLogger(__name__)
 
 
+def _json_safe(val):
+    # NaN is not allowed in json
+    if isinstance(val, float):
+        return val if val == val else None
+    elif isinstance(val, (tuple, list)):
+        return [_json_safe(v) for v in val]
+    else:
+        return val
+
+
+def get_reported_status():
+    st = metadata.format_device_status
+    tm = metadata.telemetry
+    if tm and tm.get("st_id") == st["st_id"]:
+        st["telemetry"] = dict((k, _json_safe(tm[k]))
+                               for k in TELEMETRY_FIELDS if k in tm)
+    return st
+
+
 class CloudService(ServiceBase):
     config_ts = -1
     error_counter = 0
@@ -33,12 +58,14 @@ class CloudService(ServiceBase):
     storage = None
 
     _notify_up_required = False
-    _notify_last_st = {"st_id": None}
-    _notify_last_ts = 0
+    _postback_st_id = None
     _notify_aggressive = 0
     _notify_retry_counter = 0
     aws_client = None
     postback_url = None
+    _refetch_required = False
+    _identify_thread = None
+    _identify_error = None
 
     def __init__(self, options):
         super(CloudService, self).__init__(logger, options)
@@ -51,6 +78,10 @@ class CloudService(ServiceBase):
             mqttlogger.setLevel(logging.WARNING)
 
         self.storage = Storage("cloud")
+        self.postback = PostbackWorker()
+        self.shadow_window = options.shadow_window
+        self.shadow = ShadowReporter(window=options.shadow_window,
+                                     budget=options.shadow_budget)
         self.uuidhex = security.get_uuid()
 
         if options.cloud.endswith("/"):
@@ -141,48 +172,38 @@ class CloudService(ServiceBase):
             raise RuntimeError("GET_IDENTIFY", "UNKNOWN_ERROR", e)
 
     def generate_certificate_request(self, subject_list):
-        from subprocess import Popen, PIPE
-
+        # Signed request is kept with its subject and the fingerprint of
+        # device key, the same request is valid for next enrollment until
+        # either of them changes.
         fxkey = security.get_private_key()
-        self.storage["key.pem"] = fxkey.export_pem()
-        subject_str = "/" + "/".join(("=".join(i) for i in subject_list))
-
-        proc = Popen(["openssl", "req", "-new", "-key",
-                      self.storage.get_path("key.pem"), "-subj",
-                      subject_str, "-keyform", "pem", "-nodes", "-sha256"],
-                     stdin=PIPE, stderr=PIPE, stdout=PIPE)
-        stdoutdata, stderrdata = proc.communicate(input="")
-
-        while proc.poll() is None:
-            pass
-        if proc.returncode > 0:
-            error = stdoutdata if stdoutdata else stderrdata
-            if error:
-                error = error.decode("utf8")
-            else:
-                error = "Process return %i" % proc.returncode
-            raise SystemError(error)
-        else:
-            return stdoutdata
-        # csr = crypto.X509Req()
-        # subj = csr.get_subject()
-        # for name, value in subject_list:
-        #     if name == "CN":
-        #         add_result = crypto._lib.X509_NAME_add_entry_by_NID(
-        #             subj._name, 13, crypto._lib.MBSTRING_UTF8,
-        #             value.encode('utf-8'), -1, -1, 0)
-        #         if not add_result:
-        #             crypto._raise_current_error()
-        #     else:
-        #         setattr(subj, name, value)
-
-        # fxkey = security.get_private_key()
-        # opensslkey = crypto.load_privatekey(crypto.FILETYPE_ASN1,
-        #                                     fxkey.export_der())
-        # self.storage["key.pem"] = fxkey.export_pem()
-        # csr.set_pubkey(opensslkey)
-        # csr.sign(opensslkey, "sha256")
-        # return crypto.dump_certificate_request(crypto.FILETYPE_PEM, csr)
+        fingerprint = sha1(fxkey.export_pubkey_der()).hexdigest()
+        subject_key = json.dumps([fingerprint, subject_list])
+        if self.storage["certificate_request.subj"] == subject_key and \
+                self.storage["certificate_request.pem"]:
+            logger.debug("Use cached certificate request")
+            return self.storage["certificate_request.pem"]
+
+        pem = fxkey.export_pem()
+        if self.storage["key.pem"] != pem:
+            self.storage["key.pem"] = pem
+
+        try:
+            opensslkey = crypto.load_privatekey(crypto.FILETYPE_PEM, pem)
+            csr = crypto.X509Req()
+            subj = csr.get_subject()
+            for name, value in subject_list:
+                # pyOpenSSL adds entries as utf8 string
+                setattr(subj, name, value)
+            csr.set_pubkey(opensslkey)
+            csr.sign(opensslkey, "sha256")
+            request_pem = crypto.dump_certificate_request(crypto.FILETYPE_PEM,
+                                                          csr)
+        except (crypto.Error, AttributeError, TypeError) as e:
+            raise SystemError("Create certificate request failed: %s" % e)
+
+        self.storage["certificate_request.pem"] = request_pem
+        self.storage["certificate_request.subj"] = subject_key
+        return request_pem
 
     def fetch_identify(self):
         logger.info("Fetch identify")
@@ -201,6 +222,36 @@ class CloudService(ServiceBase):
         self.storage["certificate_reqs.pem"] = doc["certificate_reqs"]
         self.storage["certificate.pem"] = doc["certificate"]
 
+    def _fetch_identify_worker(self):
+        try:
+            self.fetch_identify()
+        except RuntimeError as e:
+            self._identify_error = e
+        except Exception as e:
+            logger.exception("Error in fetch identify")
+            self._identify_error = RuntimeError("IDENTIFY", "UNKNOWN_ERROR",
+                                                "%s" % e)
+
+    def fetch_identify_async(self):
+        """Fetch identify in a thread, enrollment takes seconds. Return True
+        if identify is ready, raise the error if fetch failed."""
+        t = self._identify_thread
+        if t is None:
+            self._identify_error = None
+            self._identify_thread = t = Thread(
+                target=self._fetch_identify_worker, name="identify")
+            t.setDaemon(True)
+            t.start()
+            return False
+        elif t.isAlive():
+            return False
+
+        self._identify_thread = None
+        if self._identify_error:
+            raise self._identify_error
+        self._refetch_required = False
+        return True
+
     def notify_up(self, c):
         payload = json.dumps({"state": {"reported": {
             "version": __version__, "token": self.storage["token"],
@@ -208,14 +259,12 @@ class CloudService(ServiceBase):
         c.publish(self._notify_topic, payload, 1)
 
     def postback_status(self, st_id):
-        url = Storage("general", "meta")["player_postback_url"]
+        url = meta_storage()["player_postback_url"]
         if url:
             try:
-                if '"' in url or '\\' in url:
-                    logger.error("Bad url: %r", url)
-                else:
-                    url = url % {"st_id": st_id}
-                    os.system("curl -s -o /dev/null \"%s\"" % url)
+                self.postback.submit(url % {"st_id": st_id})
+                logger.debug("Postback metrics: %s",
+                             self.postback.get_metrics())
             except Exception:
                 logger.exception("Error while post back status, url: %s", url)
 
@@ -224,32 +273,26 @@ class CloudService(ServiceBase):
             self._notify_up_required = True
 
         new_st_id = new_st["st_id"]
-
-        if self._notify_last_st["st_id"] == new_st_id:
-            if self._notify_last_ts > self._notify_aggressive:
-                # notify aggressive is invalid
-                if now - self._notify_last_ts < 1200:
-                    # update every 1200 seconds
-                    return
-            else:
-                # notify aggressive is valid
-                if new_st_id <= 0 and now - self._notify_last_ts < 1200:
-                    # update every 1200 seconds if device is idle or occupy
-                    return
-        elif new_st_id in (48, 64, 128):  # paused, completed, aborted
-            self.postback_status(new_st_id)
+        if self._postback_st_id != new_st_id:
+            self._postback_st_id = new_st_id
+            if new_st_id in (48, 64, 128):  # paused, completed, aborted
+                self.postback_status(new_st_id)
 
         c = self.aws_client.getMQTTConnection()
 
-        payload = json.dumps(
-            {"state": {"reported": new_st}})
-
         if self._notify_up_required:
             self.notify_up(c)
             self._notify_up_required = False
-        c.publish(self._notify_topic, payload, 0)
-        self._notify_last_st = new_st
-        self._notify_last_ts = now
+
+        shadow = self.shadow
+        if now < self._notify_aggressive:
+            shadow.window = self.shadow_window
+        else:
+            # Nobody is watching, report urgent changes and heartbeat only
+            shadow.window = shadow.heartbeat
+        shadow.update(new_st, now)
+        shadow.flush(lambda payload: c.publish(self._notify_topic, payload, 0),
+                     now)
 
     def aws_on_request_callback(self, client, userdata, message):
         # incommint topic format: "device/{token}/request/{action}"
@@ -289,7 +332,7 @@ class CloudService(ServiceBase):
                     metadata.cloud_hash = os.urandom(32)
             elif action == "monitor":
                 self._notify_aggressive = time() + 180
-                self._notify_last_st["st_id"] = None
+                self.shadow.reset()
                 client.publish(response_topic, json.dumps({
                     "status": "ok", "cmd_index": cmd_index}))
             elif action == "camera":
@@ -310,10 +353,12 @@ class CloudService(ServiceBase):
                 "status": "error", "cmd_index": cmd_index}))
 
     def begin_session(self):
-        logger.info("Begin Session")
-        if not self.storage["certificate.pem"]:
+        if self._refetch_required or not self.storage["certificate.pem"]:
             metadata.cloud_status = (False, ("INIT", ))
-            self.fetch_identify()
+            if not self.fetch_identify_async():
+                return
+
+        logger.info("Begin Session")
 
         self.setup_session()
         metadata.cloud_status = (True, ())
@@ -362,6 +407,7 @@ class CloudService(ServiceBase):
         self._notify_topic = "$aws/things/%s/shadow/update" % (
             self.storage["client_id"])
         self.notify_up(conn)
+        self.shadow.reset()
         metadata.cloud_hash = os.urandom(32)
         logger.info("Session ready")
 
@@ -399,7 +445,9 @@ class CloudService(ServiceBase):
                         self.teardown_session()
                     metadata.enable_cloud = "A"
                     metadata.cloud_status = (False, ("INIT", ))
-                    self.fetch_identify()
+                    # Fetched in begin_session, current identify is kept
+                    # until the new one is ready
+                    self._refetch_required = True
 
                 self.config_ts = metadata.mversion
                 self.config_enable = (metadata.enable_cloud == "A")
@@ -408,8 +456,7 @@ class CloudService(ServiceBase):
 
             if self.config_enable:
                 if self.aws_client:
-                    self.notify_update(metadata.format_device_status,
-                                       time())
+                    self.notify_update(get_reported_status(), time())
                     self.error_counter = max(self.error_counter - 1, 0)
                 else:
                     if self.error_counter in ERROR_COUNTER_MATCH:
@@ -445,7 +492,7 @@ class CloudService(ServiceBase):
             self.error_counter += 1
 
     def on_shutdown(self):
-        pass
+        self.postback.close()
 
     def require_camera(self, camera_id, endpoint, token):
         payload = msgpack.packb((0x80, camera_id, endpoint, token))
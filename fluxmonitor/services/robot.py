@@ -14,7 +14,7 @@ from fluxmonitor.interfaces.robot import RobotTcpInterface
 from fluxmonitor.services.base import ServiceBase
 from fluxmonitor.misc.systime import systime as time
 from fluxmonitor.err_codes import RESOURCE_BUSY, EXEC_OPERATION_ERROR
-from fluxmonitor.storage import UserSpace, Storage, metadata
+from fluxmonitor.storage import UserSpace, meta_storage, metadata
 from fluxmonitor.config import NETWORK_MANAGE_ENDPOINT
 
 logger = logging.getLogger(__name__)
@@ -37,7 +37,7 @@ class Robot(ServiceBase):
 
         self.internl_interface = RobotUnixStreamInterface(self)
 
-        if Storage("general", "meta")["bare"] == "Y":
+        if meta_storage()["bare"] == "Y":
             self.tcp_interface = RobotSSLInterface(self)
         else:
             self.tcp_interface = RobotTcpInterface(self)
@@ -162,7 +162,7 @@ class Robot(ServiceBase):
             logger.exception("Flush network service status failed")
 
     def autoplay(self):
-        storage = Storage("general", "meta")
+        storage = meta_storage()
 
         if storage["replay"] != "N":
             pathlist = (("USB", "autoplay.fc"), ("SD", "autoplay.fc",),
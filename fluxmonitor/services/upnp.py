@@ -13,7 +13,7 @@ from fluxmonitor.hal.net.monitor import Monitor as NetworkMonitor
 from fluxmonitor.interfaces.upnp_tcp import UpnpTcpInterface
 from fluxmonitor.misc.systime import systime as time
 from fluxmonitor.halprofile import get_model_id
-from fluxmonitor.storage import Storage, Metadata
+from fluxmonitor.storage import meta_storage, Metadata
 
 from fluxmonitor import __version__ as VERSION  # noqa
 from fluxmonitor import security
@@ -30,17 +30,28 @@ MODEL_ID = get_model_id()
 
 GLOBAL_SERIAL = UUID(int=0)
 
+# Signed touch response is reused during this period if its content is not
+# changed, signing with RSA on every request is expensive.
+TOUCH_CACHE_TTL = 3.0
+# Touch requests from the same source in this period are answered only once
+TOUCH_MIN_INTERVAL = 0.5
+TOUCH_SOURCE_LIMIT = 256
+
 
 class InterfaceBaseV1(object):
     PROTO_VER = 1
     _notify_payload_buf = None
     _touch_payload_buf = None
+    # (content key, created at, payload)
+    _touch_cache = None
 
     def __init__(self, server):
         self.server = server
         self.meta = server.meta
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM,
                                   socket.IPPROTO_UDP)
+        # source ip => last touch response timestamp
+        self._touch_sources = {}
 
     def fileno(self):
         return self.sock.fileno()
@@ -89,17 +100,49 @@ class InterfaceBaseV1(object):
         self.sock.sendto(self._notify_payload, endpoint)
 
     def on_touch(self, endpoint):
+        if self.is_touch_limited(endpoint[0]):
+            return
+        self.sock.sendto(self.get_touch_response(), endpoint)
+
+    def is_touch_limited(self, source):
+        now = time()
+        sources = self._touch_sources
+        if now - sources.get(source, -TOUCH_MIN_INTERVAL) < TOUCH_MIN_INTERVAL:
+            return True
+
+        if len(sources) >= TOUCH_SOURCE_LIMIT:
+            for key, ts in sources.items():
+                if now - ts >= TOUCH_MIN_INTERVAL:
+                    del sources[key]
+            if len(sources) >= TOUCH_SOURCE_LIMIT:
+                # Burst from too many sources (may be spoofed), refuse new
+                # sources until known ones expire.
+                return True
+        sources[source] = now
+        return False
+
+    def get_touch_response(self):
+        # Nickname, password state and slave key are everything can change
+        # the response content.
+        key = (self.meta.nickname, security.has_password(),
+               self.server.slave_pkey_ts, id(self.server.slave_pkey))
+        now = time()
+        cache = self._touch_cache
+        if cache and cache[0] == key and now - cache[1] < TOUCH_CACHE_TTL:
+            return cache[2]
+
+        payload = self.build_touch_response(key[0], key[1])
+        self._touch_cache = (key, now, payload)
+        return payload
+
+    def build_touch_response(self, nickname, has_password):
         info = "ver=%s\x00model=%s\x00name=%s\x00pwd=%s\x00time=%i" % (
-            VERSION, MODEL_ID, self.meta.nickname,
-            "T" if security.has_password() else "F",
-            time()
+            VERSION, MODEL_ID, nickname, "T" if has_password else "F", time()
         )
 
-        payload = self._touch_payload + struct.pack("<H", len(info)) + info + \
+        return self._touch_payload + struct.pack("<H", len(info)) + info + \
             self.server.slave_pkey.sign(info)
 
-        self.sock.sendto(payload, endpoint)
-
     def on_message(self, watcher, revent):
         """Payload struct:
         +----+-+-+--------+
@@ -151,6 +194,12 @@ class InterfaceBaseV1(object):
         signature = self.server.slave_pkey.sign(message)
         self.sock.sendto(payload + message + signature, endpoint)
 
+    def refresh(self):
+        # Drop payloads built from server keys and timestamps
+        self._notify_payload_buf = None
+        self._touch_payload_buf = None
+        self._touch_cache = None
+
     def close(self):
         self.sock.close()
 
@@ -249,17 +298,24 @@ def create_interface_v2(cls):
                 ) + pubkey_der + identify
             return self._touch_payload_buf
 
-        def on_touch(self, endpoint):
+        def build_touch_response(self, nickname, has_password):
             info = "serial=%s\x00ver=%s\x00model=%s\x00name=%s\x00pwd=%s" % (
-                SERIAL_NUMBER, VERSION, MODEL_ID, self.meta.nickname,
-                "T" if security.has_password() else "F",
+                SERIAL_NUMBER, VERSION, MODEL_ID, nickname,
+                "T" if has_password else "F",
             )
 
-            payload = self._touch_payload + struct.pack("<H", len(info)) + info
-            self.sock.sendto(payload, endpoint)
+            return self._touch_payload + struct.pack("<H", len(info)) + info
     return InterfaceBaseV2Overlay
 
 
+INTERFACE_CLASSES = {
+    "mcst": MulticaseNotifyInterface,
+    "ucst": UnicasetInterface,
+    "bcst": BroadcaseNotifyInterface,
+}
+INTERFACE_SLOTS = ("mcst", "ucst", "bcst")
+
+
 class UpnpService(ServiceBase):
     bcst = None
     mcst = None
@@ -270,6 +326,8 @@ class UpnpService(ServiceBase):
     mversion = None
 
     def __init__(self, options):
+        # slot => spec of the live interface, see get_interface_specs
+        self.interface_specs = {}
         # Create RSA key if not exist. This will prevent upnp create key during
         # upnp is running (Its takes times and will cause timeout)
         self.master_key = security.get_private_key()
@@ -305,75 +363,88 @@ class UpnpService(ServiceBase):
                 logger.info("IP changed (%s -> %s)",
                             self.ipaddress, ipaddress)
                 self.ipaddress = ipaddress
-                self.teardown_upnp_sock()
-                self.setup_upnp_sock()
-
-    def setup_upnp_sock(self):
-        try:
-            logger.info("Upnp going UP")
-
-            storage = Storage("general", "meta")
-            bare = storage["bare"] == "Y"
-            bcst_config = storage["broadcast"]
-
-            mcst_if =  create_interface_v2(MulticaseNotifyInterface)(self) if bare else MulticaseNotifyInterface(self)  # noqa
-            mcst_watcher = self.loop.io(mcst_if, pyev.EV_READ,
-                                        mcst_if.on_message)
-            mcst_watcher.start()
-            self.mcst = (mcst_if, mcst_watcher)
-
-            ucst_if = create_interface_v2(UnicasetInterface)(self) if bare else UnicasetInterface(self)  # noqa
-            ucst_watcher = self.loop.io(ucst_if, pyev.EV_READ,
-                                        ucst_if.on_message)
-            ucst_watcher.start()
-            self.ucst = (ucst_if, ucst_watcher)
-
-            if bcst_config != "N":
-                bcst_if = create_interface_v2(BroadcaseNotifyInterface)(self, bcst_config) if bare else BroadcaseNotifyInterface(self, bcst_config)  # noqa
-                bcst_watcher = self.loop.io(bcst_if, pyev.EV_READ,
-                                            bcst_if.on_message)
-                self.bcst = (bcst_if, bcst_watcher)
-
-            self.mversion = self.meta.mversion
-        except socket.error:
-            logger.exception("Error while upnp going UP")
-            self.teardown_upnp_sock()
+                # Sockets are bound to any address and survive the change,
+                # only retry interfaces failed to open before.
+                self.reconcile_upnp_sock()
+
+    def get_interface_specs(self):
+        # slot => (interface type, bare, extra args...)
+        storage = meta_storage()
+        bare = storage["bare"] == "Y"
+        bcst_config = storage["broadcast"]
+
+        specs = {"mcst": ("mcst", bare), "ucst": ("ucst", bare)}
+        if bcst_config != "N":
+            specs["bcst"] = ("bcst", bare, bcst_config)
+        return specs
+
+    def open_interface(self, slot, spec):
+        klass = INTERFACE_CLASSES[spec[0]]
+        if spec[1]:
+            klass = create_interface_v2(klass)
+        ifce = klass(self, *spec[2:])
+        watcher = self.loop.io(ifce, pyev.EV_READ, ifce.on_message)
+        if slot != "bcst":
+            watcher.start()
+        setattr(self, slot, (ifce, watcher))
+        self.interface_specs[slot] = spec
+
+    def close_interface(self, slot):
+        ifce, watcher = getattr(self, slot)
+        watcher.stop()
+        ifce.close()
+        setattr(self, slot, None)
+        self.interface_specs.pop(slot, None)
+
+    def reconcile_upnp_sock(self):
+        """Open or close interfaces to match settings, interfaces which are
+        not changed are kept and continue to answer requests."""
+        desired = self.get_interface_specs()
+        for slot in INTERFACE_SLOTS:
+            spec = desired.get(slot)
+            if getattr(self, slot):
+                if self.interface_specs.get(slot) == spec:
+                    continue
+                logger.info("Upnp %s DOWN", slot)
+                self.close_interface(slot)
+
+            if spec:
+                try:
+                    self.open_interface(slot, spec)
+                    logger.info("Upnp %s UP", slot)
+                except socket.error:
+                    logger.exception("Error while upnp %s going UP", slot)
+
+    def refresh_upnp_sock(self):
+        for slot in INTERFACE_SLOTS:
+            if getattr(self, slot):
+                getattr(self, slot)[0].refresh()
 
     def teardown_upnp_sock(self):
         logger.info("Upnp going DOWN")
-        if self.ucst:
-            ifce, watcher = self.ucst
-            watcher.stop()
-            ifce.close()
-            self.ucst = None
-
-        if self.mcst:
-            ifce, watcher = self.mcst
-            watcher.stop()
-            ifce.close()
-            self.mcst = None
+        for slot in INTERFACE_SLOTS:
+            if getattr(self, slot):
+                self.close_interface(slot)
 
-        if self.bcst:
-            ifce, watcher = self.bcst
-            watcher.stop()
-            ifce.close()
-            self.bcst = None
+    def check_metadata(self):
+        if self.mversion != self.meta.mversion:
+            logger.info("Metadata changed.")
+            self.mversion = self.meta.mversion
+            self.slave_pkey_ts = time()  # TODO: for version 1 only
+            self.reconcile_upnp_sock()
+            self.refresh_upnp_sock()
 
     def on_start(self):
         self.slave_pkey_ts = time()  # TODO: for version 1 only
         self.ipaddress = self.get_last_ipaddr()
         self.mversion = self.meta.mversion
-        self.setup_upnp_sock()
+        self.reconcile_upnp_sock()
 
     def on_shutdown(self):
         self.teardown_upnp_sock()
 
     def on_cron(self, watcher, revent):
-        if self.mversion != self.meta.mversion:
-            logger.info("Metadata changed.")
-            self.slave_pkey_ts = time()  # TODO: for version 1 only
-            self.teardown_upnp_sock()
-            self.setup_upnp_sock()
+        self.check_metadata()
 
         if self.mcst:
             self.mcst[0].send_notify()
@@ -8,6 +8,7 @@ import os
 import sysv_ipc
 
 from fluxmonitor.misc.systime import systime as time
+from fluxmonitor.misc.kvstore import KVStore
 from fluxmonitor.err_codes import NOT_EXIST, BAD_PARAMS
 from fluxmonitor.config import DEFAULT_R, DEFAULT_H
 
@@ -77,6 +78,50 @@ class Storage(object):
             return None
 
 
+class ShmGeneration(object):
+    """Generation counter (uint32) in the metadata shared memory. Writers bump
+    it so caches in other processes know they are stale."""
+
+    def __init__(self, offset):
+        self.shm = sysv_ipc.SharedMemory(13001, sysv_ipc.IPC_CREAT,
+                                         size=4096, init_character='\x00')
+        self.offset = offset
+
+    def get(self):
+        return struct.unpack("<I", self.shm.read(4, self.offset))[0]
+
+    def bump(self):
+        self.shm.write(struct.pack("<I", (self.get() + 1) & 0xffffffff),
+                       self.offset)
+
+
+class KVStorage(KVStore):
+    """Small settings in a single file `<db>/<args...>.db`. Keys stored in the
+    legacy directory `<db>/<args...>/` (one file per key) are migrated at the
+    first access."""
+
+    def __init__(self, *args, **kw):
+        from fluxmonitor.config import general_config
+        path = os.path.join(general_config["db"], *args)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        super(KVStorage, self).__init__(path + ".db", legacy_dir=path,
+                                        generation=kw.get("generation"))
+
+
+def meta_storage():
+    """Settings shared by all daemons, cached in memory and invalidated by a
+    generation counter in shared memory."""
+    global _meta_generation
+    if _meta_generation is None:
+        _meta_generation = ShmGeneration(4)
+    return KVStorage("general", "meta", generation=_meta_generation)
+
+
+_meta_generation = None
+
+
 NICKNAMES = ["Apple", "Apricot", "Avocado", "Banana", "Bilberry", "Blackberry",
              "Blackcurrant", "Blueberry", "Boysenberry", "Cantaloupe",
              "Currant", "Cherry", "Cherimoya", "Cloudberry", "Coconut",
@@ -105,18 +150,15 @@ class Preference(object):
         return cls._i
 
     def __init__(self):
-        self._storage = Storage("general", "meta")
+        self._storage = meta_storage()
 
     @property
     def nickname(self):
-        if self._storage.exists("nickname"):
-            with self._storage.open("nickname", "rb") as f:
-                return f.read()
-        else:
+        nickname = self._storage["nickname"]
+        if nickname is None:
             nickname = ("Flux 3D Printer (%s)" %
                         choice(NICKNAMES)).encode()
-            with self._storage.open("nickname", "wb") as f:
-                f.write(nickname)
+            self._storage["nickname"] = nickname
         return nickname
 
     @nickname.setter
@@ -132,19 +174,18 @@ class Preference(object):
         if len(val) > 128:
             raise RuntimeError(BAD_PARAMS)
 
-        with self._storage.open("nickname", "wb") as f:
-            f.write(val)
+        self._storage["nickname"] = val
 
     @property
     def leveling(self):
-        if self._storage.exists("leveling"):
-            with self._storage.open("leveling", "r") as f:
-                try:
-                    vals = tuple((float(v) for v in f.read().split(" ")))
-                    return dict(zip("XYZABCIJKRDH", vals))
-                except Exception:
-                    # Ignore error and return default
-                    pass
+        buf = self._storage["leveling"]
+        if buf:
+            try:
+                vals = tuple((float(v) for v in buf.split(" ")))
+                return dict(zip("XYZABCIJKRDH", vals))
+            except Exception:
+                # Ignore error and return default
+                pass
 
         return {"X": 0, "Y": 0, "Z": 0, "A": 0, "B": 0, "C": 0,
                 "I": 0, "J": 0, "K": 0, "R": DEFAULT_R, "D": 189.75,
@@ -156,21 +197,20 @@ class Preference(object):
         v.update(val)
 
         vals = tuple((v[k] for k in "XYZABCIJKRDH"))
-        with self._storage.open("leveling", "w") as f:
-            f.write(" ".join("%.4f" % i for i in vals))
+        self._storage["leveling"] = " ".join("%.4f" % i for i in vals)
 
     plate_correction = leveling
 
     @property
     def backlash(self):
-        if self._storage.exists("backlash"):
-            with self._storage.open("backlash", "r") as f:
-                try:
-                    vals = tuple((float(v) for v in f.read().split(" ")))
-                    return dict(zip("ABC", vals))
-                except Exception:
-                    # Ignore error and return default
-                    pass
+        buf = self._storage["backlash"]
+        if buf:
+            try:
+                vals = tuple((float(v) for v in buf.split(" ")))
+                return dict(zip("ABC", vals))
+            except Exception:
+                # Ignore error and return default
+                pass
 
         return {"A": 10, "B": 10, "C": 10}
 
@@ -180,8 +220,7 @@ class Preference(object):
         v.update(val)
 
         vals = tuple((v[k] for k in "ABC"))
-        with self._storage.open("backlash", "w") as f:
-            f.write(" ".join("%.4f" % i for i in vals))
+        self._storage["backlash"] = " ".join("%.4f" % i for i in vals)
 
     @property
     def broadcast(self):
@@ -208,9 +247,33 @@ class Preference(object):
         del self._storage["enable_cloud"]
 
 
+# Seqlock counters (uint32) at offset 8, one for each region. Writer makes the
+# counter odd before writing the region and even again after it. Reader
+# retries if the counter is odd or changed during the read.
+SEQ_NICKNAME = 8
+SEQ_RSAKEY = 12
+SEQ_CLOUD = 16
+SEQ_DEVICE_STATUS = 20
+SEQ_IP_CACHE = 24
+SEQ_STRUCT = struct.Struct("<5I")
+SEQLOCK_RETRY = 16
+
+# Telemetry segment:
+#   magic (4) | schema version (uint16) | header size (uint16) |
+#   seqlock (uint32) | body length (uint32) | timestamp (double) | msgpack body
+# Fields can be added to the body freely, schema version changes only when
+# existing fields change their meaning.
+TELEMETRY_SHM_KEY = 13002
+TELEMETRY_SIZE = 16384
+TELEMETRY_MAGIC = b"FXTM"
+TELEMETRY_SCHEMA_VERSION = 1
+TELEMETRY_HEADER = struct.Struct("<4sHHIId")
+
+
 class Metadata(object):
     shm = None
     _mversion = 0
+    _telemetry_region = None
 
     _instance = None
 
@@ -225,6 +288,8 @@ class Metadata(object):
         # 0: Control flags...
         # 1: Metadata Version
         # 2: Toolhead mode, 0: default, 1: delay 5v switch off
+        # 4 ~ 8: Preference generation (uint32), see meta_storage
+        # 8 ~ 28: Seqlock counters (5 * uint32), see SEQ_*
         #
         # 128 ~ 384: nickname, end with char \x00
         # 1024 ~ 2048: Shared rsakey
@@ -232,7 +297,8 @@ class Metadata(object):
         # 2176 ~ 2208: Cloud Hash (32)
         # 3072: Wifi status code
         # # 3576 ~ 3584: Task time cost (8, float)
-        # 3584 ~ 4096: Device status
+        # 3584 ~ 3648: Device status
+        # 3700 ~ 3764: IP cache
 
         self.shm = sysv_ipc.SharedMemory(13001, sysv_ipc.IPC_CREAT,
                                          size=4096, init_character='\x00')
@@ -243,6 +309,60 @@ class Metadata(object):
             self.shm.detach()
             self.shm = None
 
+    @property
+    def telemetry_region(self):
+        if self._telemetry_region is None:
+            self._telemetry_region = TelemetryRegion()
+        return self._telemetry_region
+
+    @property
+    def telemetry(self):
+        """Live telemetry published by the player, or None if not
+        available."""
+        return self.telemetry_region.read()
+
+    def update_telemetry(self, doc):
+        self.telemetry_region.write(doc)
+
+    def _seq_read(self, seq_offset, size, offset):
+        for i in range(SEQLOCK_RETRY):
+            seq = self.shm.read(4, seq_offset)
+            buf = self.shm.read(size, offset)
+            if ord(seq[0]) & 1 == 0 and self.shm.read(4, seq_offset) == seq:
+                return buf
+        # Writer may be killed during writing, use the last one
+        return buf
+
+    def _seq_write(self, seq_offset, buf, offset):
+        seq = struct.unpack("<I", self.shm.read(4, seq_offset))[0]
+        seq += seq & 1  # Recover from a writer killed during writing
+        self.shm.write(struct.pack("<I", (seq + 1) & 0xffffffff), seq_offset)
+        self.shm.write(buf, offset)
+        self.shm.write(struct.pack("<I", (seq + 2) & 0xffffffff), seq_offset)
+
+    def snapshot(self):
+        """Decode all status fields from a single consistent read."""
+        for i in range(SEQLOCK_RETRY):
+            buf = self.shm.read(4096, 0)
+            seqs = SEQ_STRUCT.unpack_from(buf, 8)
+            if any(s & 1 for s in seqs):
+                continue
+            if SEQ_STRUCT.unpack(self.shm.read(SEQ_STRUCT.size, 8)) == seqs:
+                break
+
+        size = ord(buf[128])
+        l = ord(buf[2048])
+        return {
+            "mversion": ord(buf[1]),
+            "nickname": buf[129:129 + size] if size else None,
+            "cloud_status": msgpack.unpackb(buf[2049:2049 + l],
+                                            use_list=False) if l else None,
+            "cloud_hash": buf[2176:2208],
+            "wifi_status": ord(buf[3072]),
+            "device_status": self._format_device_status(
+                buf[3584:3648], buf[3700:3764].decode()),
+        }
+
     def verify_mversion(self):
         # Return True if mversion is not change.
         if self._mversion != self.mversion:
@@ -260,19 +380,21 @@ class Metadata(object):
 
     @property
     def nickname(self):
-        size = ord(self.shm.read(1, 128))
+        buf = self._seq_read(SEQ_NICKNAME, 256, 128)
+        size = ord(buf[0])
         if size == 0:
             nickname = self.pref.nickname
-            self.shm.write(struct.pack("B255s", len(nickname), nickname), 128)
+            self._seq_write(SEQ_NICKNAME, struct.pack("B255s", len(nickname),
+                                                      nickname), 128)
         else:
-            nickname = self.shm.read(size, 129)
+            nickname = buf[1:size + 1]
         return nickname
 
     @nickname.setter
     def nickname(self, val):
         self.pref.nickname = val
         val = self.pref.nickname
-        self.shm.write(struct.pack("B255s", len(val), val), 128)
+        self._seq_write(SEQ_NICKNAME, struct.pack("B255s", len(val), val), 128)
         self._add_mversion()
 
     @property
@@ -308,7 +430,7 @@ class Metadata(object):
 
     @property
     def cloud_status(self):
-        buf = self.shm.read(128, 2048)
+        buf = self._seq_read(SEQ_CLOUD, 128, 2048)
         l = ord(buf[0])
         if l > 0:
             return msgpack.unpackb(buf[1:ord(buf[0]) + 1], use_list=False)
@@ -320,15 +442,15 @@ class Metadata(object):
         buf = msgpack.packb(val)
         if len(buf) > 127:
             raise SystemError("%s is too large to store", val)
-        self.shm.write(chr(len(buf)) + buf, 2048)
+        self._seq_write(SEQ_CLOUD, chr(len(buf)) + buf, 2048)
 
     @property
     def cloud_hash(self):
-        return self.shm.read(32, 2176)
+        return self._seq_read(SEQ_CLOUD, 32, 2176)
 
     @cloud_hash.setter
     def cloud_hash(self, val):
-        self.shm.write(val[:32], 2176)
+        self._seq_write(SEQ_CLOUD, val[:32], 2176)
 
     @property
     def wifi_status(self):
@@ -340,7 +462,7 @@ class Metadata(object):
 
     @property
     def shared_der_rsakey(self):
-        buf = self.shm.read(1024, 1024)
+        buf = self._seq_read(SEQ_RSAKEY, 1024, 1024)
         bit, ts, l = struct.unpack("<BfH", buf[:7])
         if bit != 128:
             raise RuntimeError("RSA Key not ready")
@@ -349,11 +471,11 @@ class Metadata(object):
     @shared_der_rsakey.setter
     def shared_der_rsakey(self, val):
         h = struct.pack("<BfH", 128, time(), len(val))
-        self.shm.write(h + val, 1024)
+        self._seq_write(SEQ_RSAKEY, h + val, 1024)
 
     @property
     def device_status(self):
-        return self.shm.read(64, 3584)
+        return self._seq_read(SEQ_DEVICE_STATUS, 64, 3584)
 
     @property
     def device_status_id(self):
@@ -361,10 +483,11 @@ class Metadata(object):
 
     @property
     def format_device_status(self):
-        buf = self.device_status
+        return self._format_device_status(self.device_status, self.ip_cache)
+
+    def _format_device_status(self, buf, ip_addr):
         timestamp, st_id, progress, head_type, err_label = \
             struct.unpack("dif16s32s", buf[:64])
-        ip_addr = self.ip_cache
         return {"timestamp": timestamp, "st_id": st_id, "progress": progress,
                 "head_type": head_type.rstrip('\x00'),
                 "err_label": err_label.rstrip('\x00'),
@@ -378,18 +501,61 @@ class Metadata(object):
             err_label = err_label.encode()
         buf = struct.pack("dif16s32s", time(), st_id, progress, head_type,
                           err_label[:32])
-        self.shm.write(buf, 3584)
+        self._seq_write(SEQ_DEVICE_STATUS, buf, 3584)
 
     @property
     def ip_cache(self):
-        return self.shm.read(64, 3700).decode()
+        return self._seq_read(SEQ_IP_CACHE, 64, 3700).decode()
 
     @ip_cache.setter
     def ip_cache(self, val):
-        self.shm.write(val[:63], 3700)
+        self._seq_write(SEQ_IP_CACHE, val[:63], 3700)
     
 
 
+class TelemetryRegion(object):
+    def __init__(self):
+        self.shm = sysv_ipc.SharedMemory(TELEMETRY_SHM_KEY,
+                                         sysv_ipc.IPC_CREAT,
+                                         size=TELEMETRY_SIZE,
+                                         init_character='\x00')
+
+    def __del__(self):
+        if self.shm:
+            self.shm.detach()
+            self.shm = None
+
+    def write(self, doc):
+        body = msgpack.packb(doc)
+        if len(body) > TELEMETRY_SIZE - TELEMETRY_HEADER.size:
+            raise SystemError("TELEMETRY_OVERFLOW", len(body))
+
+        seq = struct.unpack("<I", self.shm.read(4, 8))[0]
+        seq += seq & 1
+        self.shm.write(struct.pack("<I", (seq + 1) & 0xffffffff), 8)
+        self.shm.write(body, TELEMETRY_HEADER.size)
+        self.shm.write(TELEMETRY_HEADER.pack(
+            TELEMETRY_MAGIC, TELEMETRY_SCHEMA_VERSION, TELEMETRY_HEADER.size,
+            (seq + 1) & 0xffffffff, len(body), time()), 0)
+        # Header and body are complete, release seqlock at last
+        self.shm.write(struct.pack("<I", (seq + 2) & 0xffffffff), 8)
+
+    def read(self):
+        for i in range(SEQLOCK_RETRY):
+            magic, version, hsize, seq, length, ts = TELEMETRY_HEADER.unpack(
+                self.shm.read(TELEMETRY_HEADER.size, 0))
+            if magic != TELEMETRY_MAGIC or version != TELEMETRY_SCHEMA_VERSION:
+                return None
+            if seq & 1:
+                continue
+            body = self.shm.read(length, hsize)
+            if struct.unpack("<I", self.shm.read(4, 8))[0] == seq:
+                doc = msgpack.unpackb(body, use_list=False)
+                doc["timestamp"] = ts
+                return doc
+        return None
+
+
 class UserSpace(object):
     def __init__(self):
         from fluxmonitor.hal.usbmount import get_usbmount_hal
@@ -269,8 +269,6 @@ static CYTHON_INLINE float __PYX_NAN() {
 
 #define __PYX_HAVE__fluxmonitor__hal__camera___v4l2_camera
 #define __PYX_HAVE_API__fluxmonitor__hal__camera___v4l2_camera
-#include "string.h"
-#include "stdlib.h"
 #include "v4l2_camera_module.h"
 #ifdef _OPENMP
 #include <omp.h>
@@ -487,25 +485,24 @@ static const char *__pyx_filename;
 
 
 static const char *__pyx_f[] = {
-  "monitor/src/v4l2_camera/v4l2_camera.pyx",
+  "src/v4l2_camera/v4l2_camera.pyx",
 };
 
 /*--- Type declarations ---*/
 struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera;
 
-/* "src/v4l2_camera/v4l2_camera.pyx":15
+/* "src/v4l2_camera/v4l2_camera.pyx":19
  * 
  * 
  * cdef class V4l2Camera:             # <<<<<<<<<<<<<<
- *     cdef object py_buffer
+ *     cdef object _bytes
  * 
  */
 struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera {
   PyObject_HEAD
   struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_vtab;
-  PyObject *py_buffer;
+  PyObject *_bytes;
   unsigned char *_buf;
-  int buf_length;
   int camera_port;
   int fd;
   float ts;
@@ -516,6 +513,7 @@ struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera {
 
 
 struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera {
+  PyObject *(*capture)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int);
   PyObject *(*attach)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int __pyx_skip_dispatch);
   PyObject *(*release)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int __pyx_skip_dispatch);
 };
@@ -585,18 +583,6 @@ static struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Cam
 #define __Pyx_CLEAR(r)    do { PyObject* tmp = ((PyObject*)(r)); r = NULL; __Pyx_DECREF(tmp);} while(0)
 #define __Pyx_XCLEAR(r)   do { if((r) != NULL) {PyObject* tmp = ((PyObject*)(r)); r = NULL; __Pyx_DECREF(tmp);}} while(0)
 
-/* RaiseDoubleKeywords.proto */
-static void __Pyx_RaiseDoubleKeywordsError(const char* func_name, PyObject* kw_name);
-
-/* ParseKeywords.proto */
-static int __Pyx_ParseOptionalKeywords(PyObject *kwds, PyObject **argnames[],\
-    PyObject *kwds2, PyObject *values[], Py_ssize_t num_pos_args,\
-    const char* function_name);
-
-/* RaiseArgTupleInvalid.proto */
-static void __Pyx_RaiseArgtupleInvalid(const char* func_name, int exact,
-    Py_ssize_t num_min, Py_ssize_t num_max, Py_ssize_t num_found);
-
 /* PyObjectGetAttrStr.proto */
 #if CYTHON_COMPILING_IN_CPYTHON
 static CYTHON_INLINE PyObject* __Pyx_PyObject_GetAttrStr(PyObject* obj, PyObject* attr_name) {
@@ -616,6 +602,18 @@ static CYTHON_INLINE PyObject* __Pyx_PyObject_GetAttrStr(PyObject* obj, PyObject
 /* GetBuiltinName.proto */
 static PyObject *__Pyx_GetBuiltinName(PyObject *name);
 
+/* RaiseDoubleKeywords.proto */
+static void __Pyx_RaiseDoubleKeywordsError(const char* func_name, PyObject* kw_name);
+
+/* ParseKeywords.proto */
+static int __Pyx_ParseOptionalKeywords(PyObject *kwds, PyObject **argnames[],\
+    PyObject *kwds2, PyObject *values[], Py_ssize_t num_pos_args,\
+    const char* function_name);
+
+/* RaiseArgTupleInvalid.proto */
+static void __Pyx_RaiseArgtupleInvalid(const char* func_name, int exact,
+    Py_ssize_t num_min, Py_ssize_t num_max, Py_ssize_t num_found);
+
 /* GetModuleGlobalName.proto */
 static CYTHON_INLINE PyObject *__Pyx_GetModuleGlobalName(PyObject *name);
 
@@ -641,6 +639,33 @@ static CYTHON_INLINE PyObject* __Pyx_PyObject_CallNoArg(PyObject *func);
 #define __Pyx_PyObject_CallNoArg(func) __Pyx_PyObject_Call(func, __pyx_empty_tuple, NULL)
 #endif
 
+/* PyThreadStateGet.proto */
+#if CYTHON_COMPILING_IN_CPYTHON
+#define __Pyx_PyThreadState_declare  PyThreadState *__pyx_tstate;
+#define __Pyx_PyThreadState_assign  __pyx_tstate = PyThreadState_GET();
+#else
+#define __Pyx_PyThreadState_declare
+#define __Pyx_PyThreadState_assign
+#endif
+
+/* PyErrFetchRestore.proto */
+#if CYTHON_COMPILING_IN_CPYTHON
+#define __Pyx_ErrRestoreWithState(type, value, tb)  __Pyx_ErrRestoreInState(PyThreadState_GET(), type, value, tb)
+#define __Pyx_ErrFetchWithState(type, value, tb)    __Pyx_ErrFetchInState(PyThreadState_GET(), type, value, tb)
+#define __Pyx_ErrRestore(type, value, tb)  __Pyx_ErrRestoreInState(__pyx_tstate, type, value, tb)
+#define __Pyx_ErrFetch(type, value, tb)    __Pyx_ErrFetchInState(__pyx_tstate, type, value, tb)
+static CYTHON_INLINE void __Pyx_ErrRestoreInState(PyThreadState *tstate, PyObject *type, PyObject *value, PyObject *tb);
+static CYTHON_INLINE void __Pyx_ErrFetchInState(PyThreadState *tstate, PyObject **type, PyObject **value, PyObject **tb);
+#else
+#define __Pyx_ErrRestoreWithState(type, value, tb)  PyErr_Restore(type, value, tb)
+#define __Pyx_ErrFetchWithState(type, value, tb)  PyErr_Fetch(type, value, tb)
+#define __Pyx_ErrRestore(type, value, tb)  PyErr_Restore(type, value, tb)
+#define __Pyx_ErrFetch(type, value, tb)  PyErr_Fetch(type, value, tb)
+#endif
+
+/* RaiseException.proto */
+static void __Pyx_Raise(PyObject *type, PyObject *value, PyObject *tb, PyObject *cause);
+
 /* SetVTable.proto */
 static int __Pyx_SetVtable(PyObject *dict, void *vtable);
 
@@ -687,13 +712,10 @@ static int __Pyx_check_binary_version(void);
 /* InitStrings.proto */
 static int __Pyx_InitStrings(__Pyx_StringTabEntry *t);
 
+static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_capture(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, int __pyx_v_max_age); /* proto*/
 static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_attach(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, int __pyx_skip_dispatch); /* proto*/
 static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_release(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, int __pyx_skip_dispatch); /* proto*/
 
-/* Module declarations from 'libc.string' */
-
-/* Module declarations from 'libc.stdlib' */
-
 /* Module declarations from 'cython' */
 
 /* Module declarations from 'fluxmonitor.hal.camera._v4l2_camera' */
@@ -702,38 +724,43 @@ static PyTypeObject *__pyx_ptype_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2C
 int __pyx_module_is_main_fluxmonitor__hal__camera___v4l2_camera = 0;
 
 /* Implementation of 'fluxmonitor.hal.camera._v4l2_camera' */
-static const char __pyx_k_io[] = "io";
+static PyObject *__pyx_builtin_RuntimeError;
 static const char __pyx_k_main[] = "__main__";
-static const char __pyx_k_seek[] = "seek";
 static const char __pyx_k_test[] = "__test__";
 static const char __pyx_k_time[] = "time";
-static const char __pyx_k_fetch[] = "fetch";
 static const char __pyx_k_width[] = "width";
+static const char __pyx_k_CAMERA[] = "CAMERA";
 static const char __pyx_k_attach[] = "attach";
 static const char __pyx_k_height[] = "height";
 static const char __pyx_k_import[] = "__import__";
-static const char __pyx_k_BytesIO[] = "BytesIO";
 static const char __pyx_k_release[] = "release";
 static const char __pyx_k_systime[] = "systime";
+static const char __pyx_k_StringIO[] = "StringIO";
+static const char __pyx_k_cStringIO[] = "cStringIO";
 static const char __pyx_k_camera_id[] = "camera_id";
 static const char __pyx_k_image_jpeg[] = "image/jpeg";
 static const char __pyx_k_pyx_vtable[] = "__pyx_vtable__";
 static const char __pyx_k_clear_cache[] = "clear_cache";
+static const char __pyx_k_RuntimeError[] = "RuntimeError";
+static const char __pyx_k_HARDWARE_ERROR[] = "HARDWARE_ERROR";
+static const char __pyx_k_fluxmonitor_err_codes[] = "fluxmonitor.err_codes";
 static const char __pyx_k_fluxmonitor_misc_systime[] = "fluxmonitor.misc.systime";
-static PyObject *__pyx_n_s_BytesIO;
+static PyObject *__pyx_n_s_CAMERA;
+static PyObject *__pyx_n_s_HARDWARE_ERROR;
+static PyObject *__pyx_n_s_RuntimeError;
+static PyObject *__pyx_n_s_StringIO;
 static PyObject *__pyx_n_s_attach;
+static PyObject *__pyx_n_s_cStringIO;
 static PyObject *__pyx_n_s_camera_id;
 static PyObject *__pyx_n_s_clear_cache;
-static PyObject *__pyx_n_s_fetch;
+static PyObject *__pyx_n_s_fluxmonitor_err_codes;
 static PyObject *__pyx_n_s_fluxmonitor_misc_systime;
 static PyObject *__pyx_n_s_height;
 static PyObject *__pyx_kp_s_image_jpeg;
 static PyObject *__pyx_n_s_import;
-static PyObject *__pyx_n_s_io;
 static PyObject *__pyx_n_s_main;
 static PyObject *__pyx_n_s_pyx_vtable;
 static PyObject *__pyx_n_s_release;
-static PyObject *__pyx_n_s_seek;
 static PyObject *__pyx_n_s_systime;
 static PyObject *__pyx_n_s_test;
 static PyObject *__pyx_n_s_time;
@@ -741,19 +768,18 @@ static PyObject *__pyx_n_s_width;
 static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___init__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, PyObject *__pyx_v_camera_id, PyObject *__pyx_v_width, PyObject *__pyx_v_height); /* proto */
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2live(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_4fetch(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, CYTHON_UNUSED PyObject *__pyx_v_clear_cache); /* proto */
+static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_9imagefile___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_6attach(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_8release(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
+static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self); /* proto */
 static PyObject *__pyx_tp_new_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera(PyTypeObject *t, PyObject *a, PyObject *k); /*proto*/
 static PyObject *__pyx_float_0_1;
-static PyObject *__pyx_int_0;
 static PyObject *__pyx_int_4;
 static PyObject *__pyx_int_480;
 static PyObject *__pyx_int_640;
-static PyObject *__pyx_tuple_;
-static PyObject *__pyx_tuple__2;
 
-/* "src/v4l2_camera/v4l2_camera.pyx":26
+/* "src/v4l2_camera/v4l2_camera.pyx":29
  *     cdef height
  * 
  *     def __init__(self, camera_id, width=640, height=480):             # <<<<<<<<<<<<<<
@@ -802,7 +828,7 @@ static int __pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_1__in
         }
       }
       if (unlikely(kw_args > 0)) {
-        if (unlikely(__Pyx_ParseOptionalKeywords(__pyx_kwds, __pyx_pyargnames, 0, values, pos_args, "__init__") < 0)) __PYX_ERR(0, 26, __pyx_L3_error)
+        if (unlikely(__Pyx_ParseOptionalKeywords(__pyx_kwds, __pyx_pyargnames, 0, values, pos_args, "__init__") < 0)) __PYX_ERR(0, 29, __pyx_L3_error)
       }
     } else {
       switch (PyTuple_GET_SIZE(__pyx_args)) {
@@ -819,7 +845,7 @@ static int __pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_1__in
   }
   goto __pyx_L4_argument_unpacking_done;
   __pyx_L5_argtuple_error:;
-  __Pyx_RaiseArgtupleInvalid("__init__", 0, 1, 3, PyTuple_GET_SIZE(__pyx_args)); __PYX_ERR(0, 26, __pyx_L3_error)
+  __Pyx_RaiseArgtupleInvalid("__init__", 0, 1, 3, PyTuple_GET_SIZE(__pyx_args)); __PYX_ERR(0, 29, __pyx_L3_error)
   __pyx_L3_error:;
   __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.__init__", __pyx_clineno, __pyx_lineno, __pyx_filename);
   __Pyx_RefNannyFinishContext();
@@ -842,33 +868,33 @@ static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___ini
   float __pyx_t_5;
   __Pyx_RefNannySetupContext("__init__", 0);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":27
+  /* "src/v4l2_camera/v4l2_camera.pyx":30
  * 
  *     def __init__(self, camera_id, width=640, height=480):
  *         self.camera_port = camera_id             # <<<<<<<<<<<<<<
  *         self.fd = -1
  *         self.ts = time()
  */
-  __pyx_t_1 = __Pyx_PyInt_As_int(__pyx_v_camera_id); if (unlikely((__pyx_t_1 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 27, __pyx_L1_error)
+  __pyx_t_1 = __Pyx_PyInt_As_int(__pyx_v_camera_id); if (unlikely((__pyx_t_1 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 30, __pyx_L1_error)
   __pyx_v_self->camera_port = __pyx_t_1;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":28
+  /* "src/v4l2_camera/v4l2_camera.pyx":31
  *     def __init__(self, camera_id, width=640, height=480):
  *         self.camera_port = camera_id
  *         self.fd = -1             # <<<<<<<<<<<<<<
  *         self.ts = time()
- *         self.py_buffer = None
+ *         self._bytes = None
  */
   __pyx_v_self->fd = -1;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":29
+  /* "src/v4l2_camera/v4l2_camera.pyx":32
  *         self.camera_port = camera_id
  *         self.fd = -1
  *         self.ts = time()             # <<<<<<<<<<<<<<
- *         self.py_buffer = None
+ *         self._bytes = None
  *         self.width = width
  */
-  __pyx_t_3 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 29, __pyx_L1_error)
+  __pyx_t_3 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 32, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_3);
   __pyx_t_4 = NULL;
   if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_3))) {
@@ -881,33 +907,33 @@ static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___ini
     }
   }
   if (__pyx_t_4) {
-    __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 29, __pyx_L1_error)
+    __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 32, __pyx_L1_error)
     __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
   } else {
-    __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 29, __pyx_L1_error)
+    __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 32, __pyx_L1_error)
   }
   __Pyx_GOTREF(__pyx_t_2);
   __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
-  __pyx_t_5 = __pyx_PyFloat_AsFloat(__pyx_t_2); if (unlikely((__pyx_t_5 == (float)-1) && PyErr_Occurred())) __PYX_ERR(0, 29, __pyx_L1_error)
+  __pyx_t_5 = __pyx_PyFloat_AsFloat(__pyx_t_2); if (unlikely((__pyx_t_5 == (float)-1) && PyErr_Occurred())) __PYX_ERR(0, 32, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
   __pyx_v_self->ts = __pyx_t_5;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":30
+  /* "src/v4l2_camera/v4l2_camera.pyx":33
  *         self.fd = -1
  *         self.ts = time()
- *         self.py_buffer = None             # <<<<<<<<<<<<<<
+ *         self._bytes = None             # <<<<<<<<<<<<<<
  *         self.width = width
  *         self.height = height
  */
   __Pyx_INCREF(Py_None);
   __Pyx_GIVEREF(Py_None);
-  __Pyx_GOTREF(__pyx_v_self->py_buffer);
-  __Pyx_DECREF(__pyx_v_self->py_buffer);
-  __pyx_v_self->py_buffer = Py_None;
+  __Pyx_GOTREF(__pyx_v_self->_bytes);
+  __Pyx_DECREF(__pyx_v_self->_bytes);
+  __pyx_v_self->_bytes = Py_None;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":31
+  /* "src/v4l2_camera/v4l2_camera.pyx":34
  *         self.ts = time()
- *         self.py_buffer = None
+ *         self._bytes = None
  *         self.width = width             # <<<<<<<<<<<<<<
  *         self.height = height
  * 
@@ -918,8 +944,8 @@ static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___ini
   __Pyx_DECREF(__pyx_v_self->width);
   __pyx_v_self->width = __pyx_v_width;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":32
- *         self.py_buffer = None
+  /* "src/v4l2_camera/v4l2_camera.pyx":35
+ *         self._bytes = None
  *         self.width = width
  *         self.height = height             # <<<<<<<<<<<<<<
  * 
@@ -931,7 +957,7 @@ static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___ini
   __Pyx_DECREF(__pyx_v_self->height);
   __pyx_v_self->height = __pyx_v_height;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":26
+  /* "src/v4l2_camera/v4l2_camera.pyx":29
  *     cdef height
  * 
  *     def __init__(self, camera_id, width=640, height=480):             # <<<<<<<<<<<<<<
@@ -953,12 +979,12 @@ static int __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera___ini
   return __pyx_r;
 }
 
-/* "src/v4l2_camera/v4l2_camera.pyx":34
+/* "src/v4l2_camera/v4l2_camera.pyx":37
  *         self.height = height
  * 
  *     def live(self):             # <<<<<<<<<<<<<<
  *         if time() - self.ts > 0.1:
- *             self.fetch(0)
+ *             self.capture(LIVE_MAX_AGE)
  */
 
 /* Python wrapper */
@@ -983,14 +1009,14 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   int __pyx_t_4;
   __Pyx_RefNannySetupContext("live", 0);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":35
+  /* "src/v4l2_camera/v4l2_camera.pyx":38
  * 
  *     def live(self):
  *         if time() - self.ts > 0.1:             # <<<<<<<<<<<<<<
- *             self.fetch(0)
+ *             self.capture(LIVE_MAX_AGE)
  *         return self.ts
  */
-  __pyx_t_2 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 35, __pyx_L1_error)
+  __pyx_t_2 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 38, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_2);
   __pyx_t_3 = NULL;
   if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_2))) {
@@ -1003,68 +1029,65 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
     }
   }
   if (__pyx_t_3) {
-    __pyx_t_1 = __Pyx_PyObject_CallOneArg(__pyx_t_2, __pyx_t_3); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 35, __pyx_L1_error)
+    __pyx_t_1 = __Pyx_PyObject_CallOneArg(__pyx_t_2, __pyx_t_3); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 38, __pyx_L1_error)
     __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
   } else {
-    __pyx_t_1 = __Pyx_PyObject_CallNoArg(__pyx_t_2); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 35, __pyx_L1_error)
+    __pyx_t_1 = __Pyx_PyObject_CallNoArg(__pyx_t_2); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 38, __pyx_L1_error)
   }
   __Pyx_GOTREF(__pyx_t_1);
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
-  __pyx_t_2 = PyFloat_FromDouble(__pyx_v_self->ts); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 35, __pyx_L1_error)
+  __pyx_t_2 = PyFloat_FromDouble(__pyx_v_self->ts); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 38, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_2);
-  __pyx_t_3 = PyNumber_Subtract(__pyx_t_1, __pyx_t_2); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 35, __pyx_L1_error)
+  __pyx_t_3 = PyNumber_Subtract(__pyx_t_1, __pyx_t_2); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 38, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_3);
   __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
-  __pyx_t_2 = PyObject_RichCompare(__pyx_t_3, __pyx_float_0_1, Py_GT); __Pyx_XGOTREF(__pyx_t_2); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 35, __pyx_L1_error)
+  __pyx_t_2 = PyObject_RichCompare(__pyx_t_3, __pyx_float_0_1, Py_GT); __Pyx_XGOTREF(__pyx_t_2); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 38, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
-  __pyx_t_4 = __Pyx_PyObject_IsTrue(__pyx_t_2); if (unlikely(__pyx_t_4 < 0)) __PYX_ERR(0, 35, __pyx_L1_error)
+  __pyx_t_4 = __Pyx_PyObject_IsTrue(__pyx_t_2); if (unlikely(__pyx_t_4 < 0)) __PYX_ERR(0, 38, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
   if (__pyx_t_4) {
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":36
+    /* "src/v4l2_camera/v4l2_camera.pyx":39
  *     def live(self):
  *         if time() - self.ts > 0.1:
- *             self.fetch(0)             # <<<<<<<<<<<<<<
+ *             self.capture(LIVE_MAX_AGE)             # <<<<<<<<<<<<<<
  *         return self.ts
  * 
  */
-    __pyx_t_2 = __Pyx_PyObject_GetAttrStr(((PyObject *)__pyx_v_self), __pyx_n_s_fetch); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 36, __pyx_L1_error)
+    __pyx_t_2 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->capture(__pyx_v_self, 0x186A0); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 39, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_2);
-    __pyx_t_3 = __Pyx_PyObject_Call(__pyx_t_2, __pyx_tuple_, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 36, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_3);
     __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
-    __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":35
+    /* "src/v4l2_camera/v4l2_camera.pyx":38
  * 
  *     def live(self):
  *         if time() - self.ts > 0.1:             # <<<<<<<<<<<<<<
- *             self.fetch(0)
+ *             self.capture(LIVE_MAX_AGE)
  *         return self.ts
  */
   }
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":37
+  /* "src/v4l2_camera/v4l2_camera.pyx":40
  *         if time() - self.ts > 0.1:
- *             self.fetch(0)
+ *             self.capture(LIVE_MAX_AGE)
  *         return self.ts             # <<<<<<<<<<<<<<
  * 
  *     def fetch(self, clear_cache=4):
  */
   __Pyx_XDECREF(__pyx_r);
-  __pyx_t_3 = PyFloat_FromDouble(__pyx_v_self->ts); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 37, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_t_3);
-  __pyx_r = __pyx_t_3;
-  __pyx_t_3 = 0;
+  __pyx_t_2 = PyFloat_FromDouble(__pyx_v_self->ts); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 40, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_2);
+  __pyx_r = __pyx_t_2;
+  __pyx_t_2 = 0;
   goto __pyx_L0;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":34
+  /* "src/v4l2_camera/v4l2_camera.pyx":37
  *         self.height = height
  * 
  *     def live(self):             # <<<<<<<<<<<<<<
  *         if time() - self.ts > 0.1:
- *             self.fetch(0)
+ *             self.capture(LIVE_MAX_AGE)
  */
 
   /* function exit code */
@@ -1080,12 +1103,12 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   return __pyx_r;
 }
 
-/* "src/v4l2_camera/v4l2_camera.pyx":39
+/* "src/v4l2_camera/v4l2_camera.pyx":42
  *         return self.ts
  * 
  *     def fetch(self, clear_cache=4):             # <<<<<<<<<<<<<<
- *         # Take a new photo immediately
- *         if self.fd < 0:
+ *         # Take a new photo, exposed after this call
+ *         self.capture(0)
  */
 
 /* Python wrapper */
@@ -1116,7 +1139,7 @@ static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
         }
       }
       if (unlikely(kw_args > 0)) {
-        if (unlikely(__Pyx_ParseOptionalKeywords(__pyx_kwds, __pyx_pyargnames, 0, values, pos_args, "fetch") < 0)) __PYX_ERR(0, 39, __pyx_L3_error)
+        if (unlikely(__Pyx_ParseOptionalKeywords(__pyx_kwds, __pyx_pyargnames, 0, values, pos_args, "fetch") < 0)) __PYX_ERR(0, 42, __pyx_L3_error)
       }
     } else {
       switch (PyTuple_GET_SIZE(__pyx_args)) {
@@ -1129,7 +1152,7 @@ static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   }
   goto __pyx_L4_argument_unpacking_done;
   __pyx_L5_argtuple_error:;
-  __Pyx_RaiseArgtupleInvalid("fetch", 0, 0, 1, PyTuple_GET_SIZE(__pyx_args)); __PYX_ERR(0, 39, __pyx_L3_error)
+  __Pyx_RaiseArgtupleInvalid("fetch", 0, 0, 1, PyTuple_GET_SIZE(__pyx_args)); __PYX_ERR(0, 42, __pyx_L3_error)
   __pyx_L3_error:;
   __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.fetch", __pyx_clineno, __pyx_lineno, __pyx_filename);
   __Pyx_RefNannyFinishContext();
@@ -1143,6 +1166,53 @@ static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
 }
 
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_4fetch(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, CYTHON_UNUSED PyObject *__pyx_v_clear_cache) {
+  PyObject *__pyx_r = NULL;
+  __Pyx_RefNannyDeclarations
+  PyObject *__pyx_t_1 = NULL;
+  __Pyx_RefNannySetupContext("fetch", 0);
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":44
+ *     def fetch(self, clear_cache=4):
+ *         # Take a new photo, exposed after this call
+ *         self.capture(0)             # <<<<<<<<<<<<<<
+ * 
+ *     cdef capture(self, int max_age):
+ */
+  __pyx_t_1 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->capture(__pyx_v_self, 0); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 44, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_1);
+  __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":42
+ *         return self.ts
+ * 
+ *     def fetch(self, clear_cache=4):             # <<<<<<<<<<<<<<
+ *         # Take a new photo, exposed after this call
+ *         self.capture(0)
+ */
+
+  /* function exit code */
+  __pyx_r = Py_None; __Pyx_INCREF(Py_None);
+  goto __pyx_L0;
+  __pyx_L1_error:;
+  __Pyx_XDECREF(__pyx_t_1);
+  __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.fetch", __pyx_clineno, __pyx_lineno, __pyx_filename);
+  __pyx_r = NULL;
+  __pyx_L0:;
+  __Pyx_XGIVEREF(__pyx_r);
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+
+/* "src/v4l2_camera/v4l2_camera.pyx":46
+ *         self.capture(0)
+ * 
+ *     cdef capture(self, int max_age):             # <<<<<<<<<<<<<<
+ *         cdef int length
+ * 
+ */
+
+static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_capture(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self, int __pyx_v_max_age) {
+  int __pyx_v_length;
   PyObject *__pyx_r = NULL;
   __Pyx_RefNannyDeclarations
   int __pyx_t_1;
@@ -1150,97 +1220,256 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   PyObject *__pyx_t_3 = NULL;
   PyObject *__pyx_t_4 = NULL;
   float __pyx_t_5;
-  __Pyx_RefNannySetupContext("fetch", 0);
+  __Pyx_RefNannySetupContext("capture", 0);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":41
- *     def fetch(self, clear_cache=4):
- *         # Take a new photo immediately
+  /* "src/v4l2_camera/v4l2_camera.pyx":49
+ *         cdef int length
+ * 
  *         if self.fd < 0:             # <<<<<<<<<<<<<<
  *             self.attach()
- * 
+ *             if self.fd < 0:
  */
   __pyx_t_1 = ((__pyx_v_self->fd < 0) != 0);
   if (__pyx_t_1) {
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":42
- *         # Take a new photo immediately
+    /* "src/v4l2_camera/v4l2_camera.pyx":50
+ * 
  *         if self.fd < 0:
  *             self.attach()             # <<<<<<<<<<<<<<
- * 
- *         self.buf_length = capture_image(self.fd, self._buf)
+ *             if self.fd < 0:
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",
  */
-    __pyx_t_2 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->attach(__pyx_v_self, 0); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 42, __pyx_L1_error)
+    __pyx_t_2 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->attach(__pyx_v_self, 0); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 50, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_2);
     __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":41
- *     def fetch(self, clear_cache=4):
- *         # Take a new photo immediately
- *         if self.fd < 0:             # <<<<<<<<<<<<<<
+    /* "src/v4l2_camera/v4l2_camera.pyx":51
+ *         if self.fd < 0:
  *             self.attach()
+ *             if self.fd < 0:             # <<<<<<<<<<<<<<
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                    str(self.camera_port))
+ */
+    __pyx_t_1 = ((__pyx_v_self->fd < 0) != 0);
+    if (__pyx_t_1) {
+
+      /* "src/v4l2_camera/v4l2_camera.pyx":52
+ *             self.attach()
+ *             if self.fd < 0:
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",             # <<<<<<<<<<<<<<
+ *                                    str(self.camera_port))
  * 
  */
-  }
+      __pyx_t_2 = __Pyx_GetModuleGlobalName(__pyx_n_s_HARDWARE_ERROR); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 52, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_2);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":44
+      /* "src/v4l2_camera/v4l2_camera.pyx":53
+ *             if self.fd < 0:
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                    str(self.camera_port))             # <<<<<<<<<<<<<<
+ * 
+ *         self._bytes = None
+ */
+      __pyx_t_3 = __Pyx_PyInt_From_int(__pyx_v_self->camera_port); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 53, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_3);
+      __pyx_t_4 = PyTuple_New(1); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 53, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_4);
+      __Pyx_GIVEREF(__pyx_t_3);
+      PyTuple_SET_ITEM(__pyx_t_4, 0, __pyx_t_3);
+      __pyx_t_3 = 0;
+      __pyx_t_3 = __Pyx_PyObject_Call(((PyObject *)(&PyString_Type)), __pyx_t_4, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 53, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_3);
+      __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
+
+      /* "src/v4l2_camera/v4l2_camera.pyx":52
+ *             self.attach()
+ *             if self.fd < 0:
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",             # <<<<<<<<<<<<<<
+ *                                    str(self.camera_port))
+ * 
+ */
+      __pyx_t_4 = PyTuple_New(3); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 52, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_4);
+      __Pyx_GIVEREF(__pyx_t_2);
+      PyTuple_SET_ITEM(__pyx_t_4, 0, __pyx_t_2);
+      __Pyx_INCREF(__pyx_n_s_CAMERA);
+      __Pyx_GIVEREF(__pyx_n_s_CAMERA);
+      PyTuple_SET_ITEM(__pyx_t_4, 1, __pyx_n_s_CAMERA);
+      __Pyx_GIVEREF(__pyx_t_3);
+      PyTuple_SET_ITEM(__pyx_t_4, 2, __pyx_t_3);
+      __pyx_t_2 = 0;
+      __pyx_t_3 = 0;
+      __pyx_t_3 = __Pyx_PyObject_Call(__pyx_builtin_RuntimeError, __pyx_t_4, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 52, __pyx_L1_error)
+      __Pyx_GOTREF(__pyx_t_3);
+      __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
+      __Pyx_Raise(__pyx_t_3, 0, 0, 0);
+      __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
+      __PYX_ERR(0, 52, __pyx_L1_error)
+
+      /* "src/v4l2_camera/v4l2_camera.pyx":51
+ *         if self.fd < 0:
  *             self.attach()
+ *             if self.fd < 0:             # <<<<<<<<<<<<<<
+ *                 raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                    str(self.camera_port))
+ */
+    }
+
+    /* "src/v4l2_camera/v4l2_camera.pyx":49
+ *         cdef int length
+ * 
+ *         if self.fd < 0:             # <<<<<<<<<<<<<<
+ *             self.attach()
+ *             if self.fd < 0:
+ */
+  }
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":55
+ *                                    str(self.camera_port))
+ * 
+ *         self._bytes = None             # <<<<<<<<<<<<<<
+ *         length = capture_image(self.fd, self._buf, max_age)
+ *         if length < 0:
+ */
+  __Pyx_INCREF(Py_None);
+  __Pyx_GIVEREF(Py_None);
+  __Pyx_GOTREF(__pyx_v_self->_bytes);
+  __Pyx_DECREF(__pyx_v_self->_bytes);
+  __pyx_v_self->_bytes = Py_None;
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":56
+ * 
+ *         self._bytes = None
+ *         length = capture_image(self.fd, self._buf, max_age)             # <<<<<<<<<<<<<<
+ *         if length < 0:
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ */
+  __pyx_v_length = capture_image(__pyx_v_self->fd, __pyx_v_self->_buf, __pyx_v_max_age);
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":57
+ *         self._bytes = None
+ *         length = capture_image(self.fd, self._buf, max_age)
+ *         if length < 0:             # <<<<<<<<<<<<<<
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                str(self.camera_port))
+ */
+  __pyx_t_1 = ((__pyx_v_length < 0) != 0);
+  if (__pyx_t_1) {
+
+    /* "src/v4l2_camera/v4l2_camera.pyx":58
+ *         length = capture_image(self.fd, self._buf, max_age)
+ *         if length < 0:
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",             # <<<<<<<<<<<<<<
+ *                                str(self.camera_port))
+ * 
+ */
+    __pyx_t_3 = __Pyx_GetModuleGlobalName(__pyx_n_s_HARDWARE_ERROR); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 58, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_3);
+
+    /* "src/v4l2_camera/v4l2_camera.pyx":59
+ *         if length < 0:
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                str(self.camera_port))             # <<<<<<<<<<<<<<
  * 
- *         self.buf_length = capture_image(self.fd, self._buf)             # <<<<<<<<<<<<<<
- *         # print('lengh: ', self.buf_length)
- *         # success_count = 0
+ *         # Copy the frame once, the driver buffer is given back at next
  */
-  __pyx_v_self->buf_length = capture_image(__pyx_v_self->fd, __pyx_v_self->_buf);
+    __pyx_t_4 = __Pyx_PyInt_From_int(__pyx_v_self->camera_port); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 59, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_4);
+    __pyx_t_2 = PyTuple_New(1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 59, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_2);
+    __Pyx_GIVEREF(__pyx_t_4);
+    PyTuple_SET_ITEM(__pyx_t_2, 0, __pyx_t_4);
+    __pyx_t_4 = 0;
+    __pyx_t_4 = __Pyx_PyObject_Call(((PyObject *)(&PyString_Type)), __pyx_t_2, NULL); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 59, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_4);
+    __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":53
- *         #         success_count += 1
+    /* "src/v4l2_camera/v4l2_camera.pyx":58
+ *         length = capture_image(self.fd, self._buf, max_age)
+ *         if length < 0:
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",             # <<<<<<<<<<<<<<
+ *                                str(self.camera_port))
+ * 
+ */
+    __pyx_t_2 = PyTuple_New(3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 58, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_2);
+    __Pyx_GIVEREF(__pyx_t_3);
+    PyTuple_SET_ITEM(__pyx_t_2, 0, __pyx_t_3);
+    __Pyx_INCREF(__pyx_n_s_CAMERA);
+    __Pyx_GIVEREF(__pyx_n_s_CAMERA);
+    PyTuple_SET_ITEM(__pyx_t_2, 1, __pyx_n_s_CAMERA);
+    __Pyx_GIVEREF(__pyx_t_4);
+    PyTuple_SET_ITEM(__pyx_t_2, 2, __pyx_t_4);
+    __pyx_t_3 = 0;
+    __pyx_t_4 = 0;
+    __pyx_t_4 = __Pyx_PyObject_Call(__pyx_builtin_RuntimeError, __pyx_t_2, NULL); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 58, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_4);
+    __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
+    __Pyx_Raise(__pyx_t_4, 0, 0, 0);
+    __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
+    __PYX_ERR(0, 58, __pyx_L1_error)
+
+    /* "src/v4l2_camera/v4l2_camera.pyx":57
+ *         self._bytes = None
+ *         length = capture_image(self.fd, self._buf, max_age)
+ *         if length < 0:             # <<<<<<<<<<<<<<
+ *             raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+ *                                str(self.camera_port))
+ */
+  }
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":63
+ *         # Copy the frame once, the driver buffer is given back at next
+ *         # capture and the driver fills other queued buffers meanwhile.
+ *         self._bytes = self._buf[:length]             # <<<<<<<<<<<<<<
+ *         self.ts = time()
  * 
+ */
+  __pyx_t_4 = __Pyx_PyBytes_FromStringAndSize(((const char*)__pyx_v_self->_buf) + 0, __pyx_v_length - 0); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 63, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_4);
+  __Pyx_GIVEREF(__pyx_t_4);
+  __Pyx_GOTREF(__pyx_v_self->_bytes);
+  __Pyx_DECREF(__pyx_v_self->_bytes);
+  __pyx_v_self->_bytes = __pyx_t_4;
+  __pyx_t_4 = 0;
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":64
+ *         # capture and the driver fills other queued buffers meanwhile.
+ *         self._bytes = self._buf[:length]
  *         self.ts = time()             # <<<<<<<<<<<<<<
- *         self.py_buffer = None
  * 
+ *     property imagebytes:
  */
-  __pyx_t_3 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 53, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_t_3);
-  __pyx_t_4 = NULL;
-  if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_3))) {
-    __pyx_t_4 = PyMethod_GET_SELF(__pyx_t_3);
-    if (likely(__pyx_t_4)) {
-      PyObject* function = PyMethod_GET_FUNCTION(__pyx_t_3);
-      __Pyx_INCREF(__pyx_t_4);
+  __pyx_t_2 = __Pyx_GetModuleGlobalName(__pyx_n_s_time); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 64, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_2);
+  __pyx_t_3 = NULL;
+  if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_2))) {
+    __pyx_t_3 = PyMethod_GET_SELF(__pyx_t_2);
+    if (likely(__pyx_t_3)) {
+      PyObject* function = PyMethod_GET_FUNCTION(__pyx_t_2);
+      __Pyx_INCREF(__pyx_t_3);
       __Pyx_INCREF(function);
-      __Pyx_DECREF_SET(__pyx_t_3, function);
+      __Pyx_DECREF_SET(__pyx_t_2, function);
     }
   }
-  if (__pyx_t_4) {
-    __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 53, __pyx_L1_error)
-    __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
+  if (__pyx_t_3) {
+    __pyx_t_4 = __Pyx_PyObject_CallOneArg(__pyx_t_2, __pyx_t_3); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 64, __pyx_L1_error)
+    __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
   } else {
-    __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 53, __pyx_L1_error)
+    __pyx_t_4 = __Pyx_PyObject_CallNoArg(__pyx_t_2); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 64, __pyx_L1_error)
   }
-  __Pyx_GOTREF(__pyx_t_2);
-  __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
-  __pyx_t_5 = __pyx_PyFloat_AsFloat(__pyx_t_2); if (unlikely((__pyx_t_5 == (float)-1) && PyErr_Occurred())) __PYX_ERR(0, 53, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_4);
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
+  __pyx_t_5 = __pyx_PyFloat_AsFloat(__pyx_t_4); if (unlikely((__pyx_t_5 == (float)-1) && PyErr_Occurred())) __PYX_ERR(0, 64, __pyx_L1_error)
+  __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
   __pyx_v_self->ts = __pyx_t_5;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":54
+  /* "src/v4l2_camera/v4l2_camera.pyx":46
+ *         self.capture(0)
  * 
- *         self.ts = time()
- *         self.py_buffer = None             # <<<<<<<<<<<<<<
+ *     cdef capture(self, int max_age):             # <<<<<<<<<<<<<<
+ *         cdef int length
  * 
- *     @property
- */
-  __Pyx_INCREF(Py_None);
-  __Pyx_GIVEREF(Py_None);
-  __Pyx_GOTREF(__pyx_v_self->py_buffer);
-  __Pyx_DECREF(__pyx_v_self->py_buffer);
-  __pyx_v_self->py_buffer = Py_None;
-
-  /* "src/v4l2_camera/v4l2_camera.pyx":39
- *         return self.ts
- * 
- *     def fetch(self, clear_cache=4):             # <<<<<<<<<<<<<<
- *         # Take a new photo immediately
- *         if self.fd < 0:
  */
 
   /* function exit code */
@@ -1250,20 +1479,73 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   __Pyx_XDECREF(__pyx_t_2);
   __Pyx_XDECREF(__pyx_t_3);
   __Pyx_XDECREF(__pyx_t_4);
-  __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.fetch", __pyx_clineno, __pyx_lineno, __pyx_filename);
-  __pyx_r = NULL;
+  __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.capture", __pyx_clineno, __pyx_lineno, __pyx_filename);
+  __pyx_r = 0;
+  __pyx_L0:;
+  __Pyx_XGIVEREF(__pyx_r);
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+
+/* "src/v4l2_camera/v4l2_camera.pyx":68
+ *     property imagebytes:
+ *         """Last frame as str"""
+ *         def __get__(self):             # <<<<<<<<<<<<<<
+ *             return self._bytes
+ * 
+ */
+
+/* Python wrapper */
+static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes_1__get__(PyObject *__pyx_v_self); /*proto*/
+static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes_1__get__(PyObject *__pyx_v_self) {
+  PyObject *__pyx_r = 0;
+  __Pyx_RefNannyDeclarations
+  __Pyx_RefNannySetupContext("__get__ (wrapper)", 0);
+  __pyx_r = __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes___get__(((struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self));
+
+  /* function exit code */
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+
+static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self) {
+  PyObject *__pyx_r = NULL;
+  __Pyx_RefNannyDeclarations
+  __Pyx_RefNannySetupContext("__get__", 0);
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":69
+ *         """Last frame as str"""
+ *         def __get__(self):
+ *             return self._bytes             # <<<<<<<<<<<<<<
+ * 
+ *     @property
+ */
+  __Pyx_XDECREF(__pyx_r);
+  __Pyx_INCREF(__pyx_v_self->_bytes);
+  __pyx_r = __pyx_v_self->_bytes;
+  goto __pyx_L0;
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":68
+ *     property imagebytes:
+ *         """Last frame as str"""
+ *         def __get__(self):             # <<<<<<<<<<<<<<
+ *             return self._bytes
+ * 
+ */
+
+  /* function exit code */
   __pyx_L0:;
   __Pyx_XGIVEREF(__pyx_r);
   __Pyx_RefNannyFinishContext();
   return __pyx_r;
 }
 
-/* "src/v4l2_camera/v4l2_camera.pyx":57
+/* "src/v4l2_camera/v4l2_camera.pyx":72
  * 
  *     @property
  *     def imagefile(self):             # <<<<<<<<<<<<<<
- *         if self.py_buffer is None:
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
+ *         # cStringIO reads the str in place
+ *         return ("image/jpeg", len(self._bytes), StringIO(self._bytes))
  */
 
 /* Python wrapper */
@@ -1282,168 +1564,85 @@ static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
 static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_9imagefile___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self) {
   PyObject *__pyx_r = NULL;
   __Pyx_RefNannyDeclarations
-  int __pyx_t_1;
-  int __pyx_t_2;
+  PyObject *__pyx_t_1 = NULL;
+  Py_ssize_t __pyx_t_2;
   PyObject *__pyx_t_3 = NULL;
   PyObject *__pyx_t_4 = NULL;
   PyObject *__pyx_t_5 = NULL;
   PyObject *__pyx_t_6 = NULL;
-  PyObject *__pyx_t_7 = NULL;
-  PyObject *__pyx_t_8 = NULL;
   __Pyx_RefNannySetupContext("__get__", 0);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":58
- *     @property
- *     def imagefile(self):
- *         if self.py_buffer is None:             # <<<<<<<<<<<<<<
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
- *         else:
- */
-  __pyx_t_1 = (__pyx_v_self->py_buffer == Py_None);
-  __pyx_t_2 = (__pyx_t_1 != 0);
-  if (__pyx_t_2) {
-
-    /* "src/v4l2_camera/v4l2_camera.pyx":59
+  /* "src/v4l2_camera/v4l2_camera.pyx":74
  *     def imagefile(self):
- *         if self.py_buffer is None:
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])             # <<<<<<<<<<<<<<
- *         else:
- *             self.py_buffer.seek(0)
- */
-    __pyx_t_4 = __Pyx_GetModuleGlobalName(__pyx_n_s_BytesIO); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 59, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_4);
-    __pyx_t_5 = __Pyx_PyBytes_FromStringAndSize(((const char*)__pyx_v_self->_buf) + 0, __pyx_v_self->buf_length - 0); if (unlikely(!__pyx_t_5)) __PYX_ERR(0, 59, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_5);
-    __pyx_t_6 = NULL;
-    if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_4))) {
-      __pyx_t_6 = PyMethod_GET_SELF(__pyx_t_4);
-      if (likely(__pyx_t_6)) {
-        PyObject* function = PyMethod_GET_FUNCTION(__pyx_t_4);
-        __Pyx_INCREF(__pyx_t_6);
-        __Pyx_INCREF(function);
-        __Pyx_DECREF_SET(__pyx_t_4, function);
-      }
-    }
-    if (!__pyx_t_6) {
-      __pyx_t_3 = __Pyx_PyObject_CallOneArg(__pyx_t_4, __pyx_t_5); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 59, __pyx_L1_error)
-      __Pyx_DECREF(__pyx_t_5); __pyx_t_5 = 0;
-      __Pyx_GOTREF(__pyx_t_3);
-    } else {
-      __pyx_t_7 = PyTuple_New(1+1); if (unlikely(!__pyx_t_7)) __PYX_ERR(0, 59, __pyx_L1_error)
-      __Pyx_GOTREF(__pyx_t_7);
-      __Pyx_GIVEREF(__pyx_t_6); PyTuple_SET_ITEM(__pyx_t_7, 0, __pyx_t_6); __pyx_t_6 = NULL;
-      __Pyx_GIVEREF(__pyx_t_5);
-      PyTuple_SET_ITEM(__pyx_t_7, 0+1, __pyx_t_5);
-      __pyx_t_5 = 0;
-      __pyx_t_3 = __Pyx_PyObject_Call(__pyx_t_4, __pyx_t_7, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 59, __pyx_L1_error)
-      __Pyx_GOTREF(__pyx_t_3);
-      __Pyx_DECREF(__pyx_t_7); __pyx_t_7 = 0;
-    }
-    __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
-    __Pyx_GIVEREF(__pyx_t_3);
-    __Pyx_GOTREF(__pyx_v_self->py_buffer);
-    __Pyx_DECREF(__pyx_v_self->py_buffer);
-    __pyx_v_self->py_buffer = __pyx_t_3;
-    __pyx_t_3 = 0;
-
-    /* "src/v4l2_camera/v4l2_camera.pyx":58
- *     @property
- *     def imagefile(self):
- *         if self.py_buffer is None:             # <<<<<<<<<<<<<<
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
- *         else:
- */
-    goto __pyx_L3;
-  }
-
-  /* "src/v4l2_camera/v4l2_camera.pyx":61
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
- *         else:
- *             self.py_buffer.seek(0)             # <<<<<<<<<<<<<<
- * 
- *         return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))
- */
-  /*else*/ {
-    __pyx_t_3 = __Pyx_PyObject_GetAttrStr(__pyx_v_self->py_buffer, __pyx_n_s_seek); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 61, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_3);
-    __pyx_t_4 = __Pyx_PyObject_Call(__pyx_t_3, __pyx_tuple__2, NULL); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 61, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_4);
-    __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
-    __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
-  }
-  __pyx_L3:;
-
-  /* "src/v4l2_camera/v4l2_camera.pyx":63
- *             self.py_buffer.seek(0)
- * 
- *         return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))             # <<<<<<<<<<<<<<
+ *         # cStringIO reads the str in place
+ *         return ("image/jpeg", len(self._bytes), StringIO(self._bytes))             # <<<<<<<<<<<<<<
  * 
  *     cpdef attach(self):
  */
   __Pyx_XDECREF(__pyx_r);
-  __pyx_t_4 = __Pyx_PyInt_From_int(__pyx_v_self->buf_length); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 63, __pyx_L1_error)
+  __pyx_t_1 = __pyx_v_self->_bytes;
+  __Pyx_INCREF(__pyx_t_1);
+  __pyx_t_2 = PyObject_Length(__pyx_t_1); if (unlikely(__pyx_t_2 == -1)) __PYX_ERR(0, 74, __pyx_L1_error)
+  __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+  __pyx_t_1 = PyInt_FromSsize_t(__pyx_t_2); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 74, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_1);
+  __pyx_t_4 = __Pyx_GetModuleGlobalName(__pyx_n_s_StringIO); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 74, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_4);
-  __pyx_t_7 = __Pyx_GetModuleGlobalName(__pyx_n_s_BytesIO); if (unlikely(!__pyx_t_7)) __PYX_ERR(0, 63, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_t_7);
-  __pyx_t_5 = __Pyx_PyBytes_FromStringAndSize(((const char*)__pyx_v_self->_buf) + 0, __pyx_v_self->buf_length - 0); if (unlikely(!__pyx_t_5)) __PYX_ERR(0, 63, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_t_5);
-  __pyx_t_6 = NULL;
-  if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_7))) {
-    __pyx_t_6 = PyMethod_GET_SELF(__pyx_t_7);
-    if (likely(__pyx_t_6)) {
-      PyObject* function = PyMethod_GET_FUNCTION(__pyx_t_7);
-      __Pyx_INCREF(__pyx_t_6);
+  __pyx_t_5 = NULL;
+  if (CYTHON_COMPILING_IN_CPYTHON && unlikely(PyMethod_Check(__pyx_t_4))) {
+    __pyx_t_5 = PyMethod_GET_SELF(__pyx_t_4);
+    if (likely(__pyx_t_5)) {
+      PyObject* function = PyMethod_GET_FUNCTION(__pyx_t_4);
+      __Pyx_INCREF(__pyx_t_5);
       __Pyx_INCREF(function);
-      __Pyx_DECREF_SET(__pyx_t_7, function);
+      __Pyx_DECREF_SET(__pyx_t_4, function);
     }
   }
-  if (!__pyx_t_6) {
-    __pyx_t_3 = __Pyx_PyObject_CallOneArg(__pyx_t_7, __pyx_t_5); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 63, __pyx_L1_error)
-    __Pyx_DECREF(__pyx_t_5); __pyx_t_5 = 0;
+  if (!__pyx_t_5) {
+    __pyx_t_3 = __Pyx_PyObject_CallOneArg(__pyx_t_4, __pyx_v_self->_bytes); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 74, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_3);
   } else {
-    __pyx_t_8 = PyTuple_New(1+1); if (unlikely(!__pyx_t_8)) __PYX_ERR(0, 63, __pyx_L1_error)
-    __Pyx_GOTREF(__pyx_t_8);
-    __Pyx_GIVEREF(__pyx_t_6); PyTuple_SET_ITEM(__pyx_t_8, 0, __pyx_t_6); __pyx_t_6 = NULL;
-    __Pyx_GIVEREF(__pyx_t_5);
-    PyTuple_SET_ITEM(__pyx_t_8, 0+1, __pyx_t_5);
-    __pyx_t_5 = 0;
-    __pyx_t_3 = __Pyx_PyObject_Call(__pyx_t_7, __pyx_t_8, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 63, __pyx_L1_error)
+    __pyx_t_6 = PyTuple_New(1+1); if (unlikely(!__pyx_t_6)) __PYX_ERR(0, 74, __pyx_L1_error)
+    __Pyx_GOTREF(__pyx_t_6);
+    __Pyx_GIVEREF(__pyx_t_5); PyTuple_SET_ITEM(__pyx_t_6, 0, __pyx_t_5); __pyx_t_5 = NULL;
+    __Pyx_INCREF(__pyx_v_self->_bytes);
+    __Pyx_GIVEREF(__pyx_v_self->_bytes);
+    PyTuple_SET_ITEM(__pyx_t_6, 0+1, __pyx_v_self->_bytes);
+    __pyx_t_3 = __Pyx_PyObject_Call(__pyx_t_4, __pyx_t_6, NULL); if (unlikely(!__pyx_t_3)) __PYX_ERR(0, 74, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_3);
-    __Pyx_DECREF(__pyx_t_8); __pyx_t_8 = 0;
+    __Pyx_DECREF(__pyx_t_6); __pyx_t_6 = 0;
   }
-  __Pyx_DECREF(__pyx_t_7); __pyx_t_7 = 0;
-  __pyx_t_7 = PyTuple_New(3); if (unlikely(!__pyx_t_7)) __PYX_ERR(0, 63, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_t_7);
+  __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
+  __pyx_t_4 = PyTuple_New(3); if (unlikely(!__pyx_t_4)) __PYX_ERR(0, 74, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_4);
   __Pyx_INCREF(__pyx_kp_s_image_jpeg);
   __Pyx_GIVEREF(__pyx_kp_s_image_jpeg);
-  PyTuple_SET_ITEM(__pyx_t_7, 0, __pyx_kp_s_image_jpeg);
-  __Pyx_GIVEREF(__pyx_t_4);
-  PyTuple_SET_ITEM(__pyx_t_7, 1, __pyx_t_4);
+  PyTuple_SET_ITEM(__pyx_t_4, 0, __pyx_kp_s_image_jpeg);
+  __Pyx_GIVEREF(__pyx_t_1);
+  PyTuple_SET_ITEM(__pyx_t_4, 1, __pyx_t_1);
   __Pyx_GIVEREF(__pyx_t_3);
-  PyTuple_SET_ITEM(__pyx_t_7, 2, __pyx_t_3);
-  __pyx_t_4 = 0;
+  PyTuple_SET_ITEM(__pyx_t_4, 2, __pyx_t_3);
+  __pyx_t_1 = 0;
   __pyx_t_3 = 0;
-  __pyx_r = __pyx_t_7;
-  __pyx_t_7 = 0;
+  __pyx_r = __pyx_t_4;
+  __pyx_t_4 = 0;
   goto __pyx_L0;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":57
+  /* "src/v4l2_camera/v4l2_camera.pyx":72
  * 
  *     @property
  *     def imagefile(self):             # <<<<<<<<<<<<<<
- *         if self.py_buffer is None:
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
+ *         # cStringIO reads the str in place
+ *         return ("image/jpeg", len(self._bytes), StringIO(self._bytes))
  */
 
   /* function exit code */
   __pyx_L1_error:;
+  __Pyx_XDECREF(__pyx_t_1);
   __Pyx_XDECREF(__pyx_t_3);
   __Pyx_XDECREF(__pyx_t_4);
   __Pyx_XDECREF(__pyx_t_5);
   __Pyx_XDECREF(__pyx_t_6);
-  __Pyx_XDECREF(__pyx_t_7);
-  __Pyx_XDECREF(__pyx_t_8);
   __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.imagefile.__get__", __pyx_clineno, __pyx_lineno, __pyx_filename);
   __pyx_r = NULL;
   __pyx_L0:;
@@ -1452,8 +1651,8 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   return __pyx_r;
 }
 
-/* "src/v4l2_camera/v4l2_camera.pyx":65
- *         return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))
+/* "src/v4l2_camera/v4l2_camera.pyx":76
+ *         return ("image/jpeg", len(self._bytes), StringIO(self._bytes))
  * 
  *     cpdef attach(self):             # <<<<<<<<<<<<<<
  *         if self.fd > 0:
@@ -1476,7 +1675,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
   if (unlikely(__pyx_skip_dispatch)) ;
   /* Check if overridden in Python */
   else if (unlikely(Py_TYPE(((PyObject *)__pyx_v_self))->tp_dictoffset != 0)) {
-    __pyx_t_1 = __Pyx_PyObject_GetAttrStr(((PyObject *)__pyx_v_self), __pyx_n_s_attach); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 65, __pyx_L1_error)
+    __pyx_t_1 = __Pyx_PyObject_GetAttrStr(((PyObject *)__pyx_v_self), __pyx_n_s_attach); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 76, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_1);
     if (!PyCFunction_Check(__pyx_t_1) || (PyCFunction_GET_FUNCTION(__pyx_t_1) != (PyCFunction)__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_7attach)) {
       __Pyx_XDECREF(__pyx_r);
@@ -1492,10 +1691,10 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
         }
       }
       if (__pyx_t_4) {
-        __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 65, __pyx_L1_error)
+        __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 76, __pyx_L1_error)
         __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
       } else {
-        __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 65, __pyx_L1_error)
+        __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 76, __pyx_L1_error)
       }
       __Pyx_GOTREF(__pyx_t_2);
       __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
@@ -1507,7 +1706,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
     __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
   }
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":66
+  /* "src/v4l2_camera/v4l2_camera.pyx":77
  * 
  *     cpdef attach(self):
  *         if self.fd > 0:             # <<<<<<<<<<<<<<
@@ -1517,18 +1716,18 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
   __pyx_t_5 = ((__pyx_v_self->fd > 0) != 0);
   if (__pyx_t_5) {
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":67
+    /* "src/v4l2_camera/v4l2_camera.pyx":78
  *     cpdef attach(self):
  *         if self.fd > 0:
  *             self.release()             # <<<<<<<<<<<<<<
  *         self.fd = attach_camera(self.camera_port, self._buf, self.width, self.height)
  * 
  */
-    __pyx_t_1 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->release(__pyx_v_self, 0); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 67, __pyx_L1_error)
+    __pyx_t_1 = ((struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self->__pyx_vtab)->release(__pyx_v_self, 0); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 78, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_1);
     __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":66
+    /* "src/v4l2_camera/v4l2_camera.pyx":77
  * 
  *     cpdef attach(self):
  *         if self.fd > 0:             # <<<<<<<<<<<<<<
@@ -1537,19 +1736,19 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
  */
   }
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":68
+  /* "src/v4l2_camera/v4l2_camera.pyx":79
  *         if self.fd > 0:
  *             self.release()
  *         self.fd = attach_camera(self.camera_port, self._buf, self.width, self.height)             # <<<<<<<<<<<<<<
  * 
  *     cpdef release(self):
  */
-  __pyx_t_6 = __Pyx_PyInt_As_int(__pyx_v_self->width); if (unlikely((__pyx_t_6 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 68, __pyx_L1_error)
-  __pyx_t_7 = __Pyx_PyInt_As_int(__pyx_v_self->height); if (unlikely((__pyx_t_7 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 68, __pyx_L1_error)
+  __pyx_t_6 = __Pyx_PyInt_As_int(__pyx_v_self->width); if (unlikely((__pyx_t_6 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 79, __pyx_L1_error)
+  __pyx_t_7 = __Pyx_PyInt_As_int(__pyx_v_self->height); if (unlikely((__pyx_t_7 == (int)-1) && PyErr_Occurred())) __PYX_ERR(0, 79, __pyx_L1_error)
   __pyx_v_self->fd = attach_camera(__pyx_v_self->camera_port, __pyx_v_self->_buf, __pyx_t_6, __pyx_t_7);
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":65
- *         return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))
+  /* "src/v4l2_camera/v4l2_camera.pyx":76
+ *         return ("image/jpeg", len(self._bytes), StringIO(self._bytes))
  * 
  *     cpdef attach(self):             # <<<<<<<<<<<<<<
  *         if self.fd > 0:
@@ -1591,7 +1790,7 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   PyObject *__pyx_t_1 = NULL;
   __Pyx_RefNannySetupContext("attach", 0);
   __Pyx_XDECREF(__pyx_r);
-  __pyx_t_1 = __pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_attach(__pyx_v_self, 1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 65, __pyx_L1_error)
+  __pyx_t_1 = __pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_attach(__pyx_v_self, 1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 76, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
   __pyx_r = __pyx_t_1;
   __pyx_t_1 = 0;
@@ -1608,7 +1807,7 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   return __pyx_r;
 }
 
-/* "src/v4l2_camera/v4l2_camera.pyx":70
+/* "src/v4l2_camera/v4l2_camera.pyx":81
  *         self.fd = attach_camera(self.camera_port, self._buf, self.width, self.height)
  * 
  *     cpdef release(self):             # <<<<<<<<<<<<<<
@@ -1630,7 +1829,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
   if (unlikely(__pyx_skip_dispatch)) ;
   /* Check if overridden in Python */
   else if (unlikely(Py_TYPE(((PyObject *)__pyx_v_self))->tp_dictoffset != 0)) {
-    __pyx_t_1 = __Pyx_PyObject_GetAttrStr(((PyObject *)__pyx_v_self), __pyx_n_s_release); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 70, __pyx_L1_error)
+    __pyx_t_1 = __Pyx_PyObject_GetAttrStr(((PyObject *)__pyx_v_self), __pyx_n_s_release); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 81, __pyx_L1_error)
     __Pyx_GOTREF(__pyx_t_1);
     if (!PyCFunction_Check(__pyx_t_1) || (PyCFunction_GET_FUNCTION(__pyx_t_1) != (PyCFunction)__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_9release)) {
       __Pyx_XDECREF(__pyx_r);
@@ -1646,10 +1845,10 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
         }
       }
       if (__pyx_t_4) {
-        __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 70, __pyx_L1_error)
+        __pyx_t_2 = __Pyx_PyObject_CallOneArg(__pyx_t_3, __pyx_t_4); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 81, __pyx_L1_error)
         __Pyx_DECREF(__pyx_t_4); __pyx_t_4 = 0;
       } else {
-        __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 70, __pyx_L1_error)
+        __pyx_t_2 = __Pyx_PyObject_CallNoArg(__pyx_t_3); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 81, __pyx_L1_error)
       }
       __Pyx_GOTREF(__pyx_t_2);
       __Pyx_DECREF(__pyx_t_3); __pyx_t_3 = 0;
@@ -1661,7 +1860,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
     __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
   }
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":71
+  /* "src/v4l2_camera/v4l2_camera.pyx":82
  * 
  *     cpdef release(self):
  *         if self.fd > 0:             # <<<<<<<<<<<<<<
@@ -1671,7 +1870,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
   __pyx_t_5 = ((__pyx_v_self->fd > 0) != 0);
   if (__pyx_t_5) {
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":72
+    /* "src/v4l2_camera/v4l2_camera.pyx":83
  *     cpdef release(self):
  *         if self.fd > 0:
  *             release_camera(self.fd, self._buf)             # <<<<<<<<<<<<<<
@@ -1679,14 +1878,14 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
  */
     release_camera(__pyx_v_self->fd, __pyx_v_self->_buf);
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":73
+    /* "src/v4l2_camera/v4l2_camera.pyx":84
  *         if self.fd > 0:
  *             release_camera(self.fd, self._buf)
  *             self.fd = -1             # <<<<<<<<<<<<<<
  */
     __pyx_v_self->fd = -1;
 
-    /* "src/v4l2_camera/v4l2_camera.pyx":71
+    /* "src/v4l2_camera/v4l2_camera.pyx":82
  * 
  *     cpdef release(self):
  *         if self.fd > 0:             # <<<<<<<<<<<<<<
@@ -1695,7 +1894,7 @@ static PyObject *__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_
  */
   }
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":70
+  /* "src/v4l2_camera/v4l2_camera.pyx":81
  *         self.fd = attach_camera(self.camera_port, self._buf, self.width, self.height)
  * 
  *     cpdef release(self):             # <<<<<<<<<<<<<<
@@ -1738,7 +1937,7 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   PyObject *__pyx_t_1 = NULL;
   __Pyx_RefNannySetupContext("release", 0);
   __Pyx_XDECREF(__pyx_r);
-  __pyx_t_1 = __pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_release(__pyx_v_self, 1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 70, __pyx_L1_error)
+  __pyx_t_1 = __pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_release(__pyx_v_self, 1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 81, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
   __pyx_r = __pyx_t_1;
   __pyx_t_1 = 0;
@@ -1754,6 +1953,50 @@ static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera
   __Pyx_RefNannyFinishContext();
   return __pyx_r;
 }
+
+/* "src/v4l2_camera/v4l2_camera.pyx":25
+ *     cdef int camera_port
+ *     cdef int fd
+ *     cdef readonly float ts             # <<<<<<<<<<<<<<
+ *     cdef width
+ *     cdef height
+ */
+
+/* Python wrapper */
+static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts_1__get__(PyObject *__pyx_v_self); /*proto*/
+static PyObject *__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts_1__get__(PyObject *__pyx_v_self) {
+  PyObject *__pyx_r = 0;
+  __Pyx_RefNannyDeclarations
+  __Pyx_RefNannySetupContext("__get__ (wrapper)", 0);
+  __pyx_r = __pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts___get__(((struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)__pyx_v_self));
+
+  /* function exit code */
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+
+static PyObject *__pyx_pf_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts___get__(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *__pyx_v_self) {
+  PyObject *__pyx_r = NULL;
+  __Pyx_RefNannyDeclarations
+  PyObject *__pyx_t_1 = NULL;
+  __Pyx_RefNannySetupContext("__get__", 0);
+  __Pyx_XDECREF(__pyx_r);
+  __pyx_t_1 = PyFloat_FromDouble(__pyx_v_self->ts); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 25, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_1);
+  __pyx_r = __pyx_t_1;
+  __pyx_t_1 = 0;
+  goto __pyx_L0;
+
+  /* function exit code */
+  __pyx_L1_error:;
+  __Pyx_XDECREF(__pyx_t_1);
+  __Pyx_AddTraceback("fluxmonitor.hal.camera._v4l2_camera.V4l2Camera.ts.__get__", __pyx_clineno, __pyx_lineno, __pyx_filename);
+  __pyx_r = NULL;
+  __pyx_L0:;
+  __Pyx_XGIVEREF(__pyx_r);
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
 static struct __pyx_vtabstruct_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera __pyx_vtable_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera;
 
 static PyObject *__pyx_tp_new_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera(PyTypeObject *t, CYTHON_UNUSED PyObject *a, CYTHON_UNUSED PyObject *k) {
@@ -1767,7 +2010,7 @@ static PyObject *__pyx_tp_new_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Came
   if (unlikely(!o)) return 0;
   p = ((struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)o);
   p->__pyx_vtab = __pyx_vtabptr_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera;
-  p->py_buffer = Py_None; Py_INCREF(Py_None);
+  p->_bytes = Py_None; Py_INCREF(Py_None);
   p->width = Py_None; Py_INCREF(Py_None);
   p->height = Py_None; Py_INCREF(Py_None);
   return o;
@@ -1781,7 +2024,7 @@ static void __pyx_tp_dealloc_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camer
   }
   #endif
   PyObject_GC_UnTrack(o);
-  Py_CLEAR(p->py_buffer);
+  Py_CLEAR(p->_bytes);
   Py_CLEAR(p->width);
   Py_CLEAR(p->height);
   (*Py_TYPE(o)->tp_free)(o);
@@ -1790,8 +2033,8 @@ static void __pyx_tp_dealloc_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camer
 static int __pyx_tp_traverse_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera(PyObject *o, visitproc v, void *a) {
   int e;
   struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *p = (struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)o;
-  if (p->py_buffer) {
-    e = (*v)(p->py_buffer, a); if (e) return e;
+  if (p->_bytes) {
+    e = (*v)(p->_bytes, a); if (e) return e;
   }
   if (p->width) {
     e = (*v)(p->width, a); if (e) return e;
@@ -1805,8 +2048,8 @@ static int __pyx_tp_traverse_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camer
 static int __pyx_tp_clear_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera(PyObject *o) {
   PyObject* tmp;
   struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *p = (struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *)o;
-  tmp = ((PyObject*)p->py_buffer);
-  p->py_buffer = Py_None; Py_INCREF(Py_None);
+  tmp = ((PyObject*)p->_bytes);
+  p->_bytes = Py_None; Py_INCREF(Py_None);
   Py_XDECREF(tmp);
   tmp = ((PyObject*)p->width);
   p->width = Py_None; Py_INCREF(Py_None);
@@ -1817,10 +2060,18 @@ static int __pyx_tp_clear_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera(P
   return 0;
 }
 
+static PyObject *__pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_imagebytes(PyObject *o, CYTHON_UNUSED void *x) {
+  return __pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_10imagebytes_1__get__(o);
+}
+
 static PyObject *__pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_imagefile(PyObject *o, CYTHON_UNUSED void *x) {
   return __pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_9imagefile_1__get__(o);
 }
 
+static PyObject *__pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_ts(PyObject *o, CYTHON_UNUSED void *x) {
+  return __pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_2ts_1__get__(o);
+}
+
 static PyMethodDef __pyx_methods_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera[] = {
   {"live", (PyCFunction)__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_3live, METH_NOARGS, 0},
   {"fetch", (PyCFunction)__pyx_pw_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_5fetch, METH_VARARGS|METH_KEYWORDS, 0},
@@ -1830,7 +2081,9 @@ static PyMethodDef __pyx_methods_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2C
 };
 
 static struct PyGetSetDef __pyx_getsets_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera[] = {
+  {(char *)"imagebytes", __pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_imagebytes, 0, (char *)"Last frame as str", 0},
   {(char *)"imagefile", __pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_imagefile, 0, (char *)0, 0},
+  {(char *)"ts", __pyx_getprop_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_ts, 0, (char *)0, 0},
   {0, 0, 0, 0, 0}
 };
 
@@ -1915,20 +2168,22 @@ static struct PyModuleDef __pyx_moduledef = {
 #endif
 
 static __Pyx_StringTabEntry __pyx_string_tab[] = {
-  {&__pyx_n_s_BytesIO, __pyx_k_BytesIO, sizeof(__pyx_k_BytesIO), 0, 0, 1, 1},
+  {&__pyx_n_s_CAMERA, __pyx_k_CAMERA, sizeof(__pyx_k_CAMERA), 0, 0, 1, 1},
+  {&__pyx_n_s_HARDWARE_ERROR, __pyx_k_HARDWARE_ERROR, sizeof(__pyx_k_HARDWARE_ERROR), 0, 0, 1, 1},
+  {&__pyx_n_s_RuntimeError, __pyx_k_RuntimeError, sizeof(__pyx_k_RuntimeError), 0, 0, 1, 1},
+  {&__pyx_n_s_StringIO, __pyx_k_StringIO, sizeof(__pyx_k_StringIO), 0, 0, 1, 1},
   {&__pyx_n_s_attach, __pyx_k_attach, sizeof(__pyx_k_attach), 0, 0, 1, 1},
+  {&__pyx_n_s_cStringIO, __pyx_k_cStringIO, sizeof(__pyx_k_cStringIO), 0, 0, 1, 1},
   {&__pyx_n_s_camera_id, __pyx_k_camera_id, sizeof(__pyx_k_camera_id), 0, 0, 1, 1},
   {&__pyx_n_s_clear_cache, __pyx_k_clear_cache, sizeof(__pyx_k_clear_cache), 0, 0, 1, 1},
-  {&__pyx_n_s_fetch, __pyx_k_fetch, sizeof(__pyx_k_fetch), 0, 0, 1, 1},
+  {&__pyx_n_s_fluxmonitor_err_codes, __pyx_k_fluxmonitor_err_codes, sizeof(__pyx_k_fluxmonitor_err_codes), 0, 0, 1, 1},
   {&__pyx_n_s_fluxmonitor_misc_systime, __pyx_k_fluxmonitor_misc_systime, sizeof(__pyx_k_fluxmonitor_misc_systime), 0, 0, 1, 1},
   {&__pyx_n_s_height, __pyx_k_height, sizeof(__pyx_k_height), 0, 0, 1, 1},
   {&__pyx_kp_s_image_jpeg, __pyx_k_image_jpeg, sizeof(__pyx_k_image_jpeg), 0, 0, 1, 0},
   {&__pyx_n_s_import, __pyx_k_import, sizeof(__pyx_k_import), 0, 0, 1, 1},
-  {&__pyx_n_s_io, __pyx_k_io, sizeof(__pyx_k_io), 0, 0, 1, 1},
   {&__pyx_n_s_main, __pyx_k_main, sizeof(__pyx_k_main), 0, 0, 1, 1},
   {&__pyx_n_s_pyx_vtable, __pyx_k_pyx_vtable, sizeof(__pyx_k_pyx_vtable), 0, 0, 1, 1},
   {&__pyx_n_s_release, __pyx_k_release, sizeof(__pyx_k_release), 0, 0, 1, 1},
-  {&__pyx_n_s_seek, __pyx_k_seek, sizeof(__pyx_k_seek), 0, 0, 1, 1},
   {&__pyx_n_s_systime, __pyx_k_systime, sizeof(__pyx_k_systime), 0, 0, 1, 1},
   {&__pyx_n_s_test, __pyx_k_test, sizeof(__pyx_k_test), 0, 0, 1, 1},
   {&__pyx_n_s_time, __pyx_k_time, sizeof(__pyx_k_time), 0, 0, 1, 1},
@@ -1936,45 +2191,22 @@ static __Pyx_StringTabEntry __pyx_string_tab[] = {
   {0, 0, 0, 0, 0, 0, 0}
 };
 static int __Pyx_InitCachedBuiltins(void) {
+  __pyx_builtin_RuntimeError = __Pyx_GetBuiltinName(__pyx_n_s_RuntimeError); if (!__pyx_builtin_RuntimeError) __PYX_ERR(0, 52, __pyx_L1_error)
   return 0;
+  __pyx_L1_error:;
+  return -1;
 }
 
 static int __Pyx_InitCachedConstants(void) {
   __Pyx_RefNannyDeclarations
   __Pyx_RefNannySetupContext("__Pyx_InitCachedConstants", 0);
-
-  /* "src/v4l2_camera/v4l2_camera.pyx":36
- *     def live(self):
- *         if time() - self.ts > 0.1:
- *             self.fetch(0)             # <<<<<<<<<<<<<<
- *         return self.ts
- * 
- */
-  __pyx_tuple_ = PyTuple_Pack(1, __pyx_int_0); if (unlikely(!__pyx_tuple_)) __PYX_ERR(0, 36, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_tuple_);
-  __Pyx_GIVEREF(__pyx_tuple_);
-
-  /* "src/v4l2_camera/v4l2_camera.pyx":61
- *             self.py_buffer = BytesIO(self._buf[:self.buf_length])
- *         else:
- *             self.py_buffer.seek(0)             # <<<<<<<<<<<<<<
- * 
- *         return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))
- */
-  __pyx_tuple__2 = PyTuple_Pack(1, __pyx_int_0); if (unlikely(!__pyx_tuple__2)) __PYX_ERR(0, 61, __pyx_L1_error)
-  __Pyx_GOTREF(__pyx_tuple__2);
-  __Pyx_GIVEREF(__pyx_tuple__2);
   __Pyx_RefNannyFinishContext();
   return 0;
-  __pyx_L1_error:;
-  __Pyx_RefNannyFinishContext();
-  return -1;
 }
 
 static int __Pyx_InitGlobals(void) {
   if (__Pyx_InitStrings(__pyx_string_tab) < 0) __PYX_ERR(0, 1, __pyx_L1_error);
   __pyx_float_0_1 = PyFloat_FromDouble(0.1); if (unlikely(!__pyx_float_0_1)) __PYX_ERR(0, 1, __pyx_L1_error)
-  __pyx_int_0 = PyInt_FromLong(0); if (unlikely(!__pyx_int_0)) __PYX_ERR(0, 1, __pyx_L1_error)
   __pyx_int_4 = PyInt_FromLong(4); if (unlikely(!__pyx_int_4)) __PYX_ERR(0, 1, __pyx_L1_error)
   __pyx_int_480 = PyInt_FromLong(480); if (unlikely(!__pyx_int_480)) __PYX_ERR(0, 1, __pyx_L1_error)
   __pyx_int_640 = PyInt_FromLong(640); if (unlikely(!__pyx_int_640)) __PYX_ERR(0, 1, __pyx_L1_error)
@@ -2069,12 +2301,13 @@ PyMODINIT_FUNC PyInit__v4l2_camera(void)
   /*--- Function export code ---*/
   /*--- Type init code ---*/
   __pyx_vtabptr_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera = &__pyx_vtable_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera;
+  __pyx_vtable_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.capture = (PyObject *(*)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int))__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_capture;
   __pyx_vtable_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.attach = (PyObject *(*)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int __pyx_skip_dispatch))__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_attach;
   __pyx_vtable_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.release = (PyObject *(*)(struct __pyx_obj_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera *, int __pyx_skip_dispatch))__pyx_f_11fluxmonitor_3hal_6camera_12_v4l2_camera_10V4l2Camera_release;
-  if (PyType_Ready(&__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 15, __pyx_L1_error)
+  if (PyType_Ready(&__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 19, __pyx_L1_error)
   __pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.tp_print = 0;
-  if (__Pyx_SetVtable(__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.tp_dict, __pyx_vtabptr_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 15, __pyx_L1_error)
-  if (PyObject_SetAttrString(__pyx_m, "V4l2Camera", (PyObject *)&__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 15, __pyx_L1_error)
+  if (__Pyx_SetVtable(__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera.tp_dict, __pyx_vtabptr_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 19, __pyx_L1_error)
+  if (PyObject_SetAttrString(__pyx_m, "V4l2Camera", (PyObject *)&__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera) < 0) __PYX_ERR(0, 19, __pyx_L1_error)
   __pyx_ptype_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera = &__pyx_type_11fluxmonitor_3hal_6camera_12_v4l2_camera_V4l2Camera;
   /*--- Type import code ---*/
   /*--- Variable import code ---*/
@@ -2085,54 +2318,75 @@ PyMODINIT_FUNC PyInit__v4l2_camera(void)
   #endif
 
   /* "src/v4l2_camera/v4l2_camera.pyx":1
- * from io import BytesIO             # <<<<<<<<<<<<<<
+ * from cStringIO import StringIO             # <<<<<<<<<<<<<<
  * 
- * from libc.stdlib cimport free
+ * import cython
  */
   __pyx_t_1 = PyList_New(1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 1, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
-  __Pyx_INCREF(__pyx_n_s_BytesIO);
-  __Pyx_GIVEREF(__pyx_n_s_BytesIO);
-  PyList_SET_ITEM(__pyx_t_1, 0, __pyx_n_s_BytesIO);
-  __pyx_t_2 = __Pyx_Import(__pyx_n_s_io, __pyx_t_1, -1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 1, __pyx_L1_error)
+  __Pyx_INCREF(__pyx_n_s_StringIO);
+  __Pyx_GIVEREF(__pyx_n_s_StringIO);
+  PyList_SET_ITEM(__pyx_t_1, 0, __pyx_n_s_StringIO);
+  __pyx_t_2 = __Pyx_Import(__pyx_n_s_cStringIO, __pyx_t_1, -1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 1, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_2);
   __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
-  __pyx_t_1 = __Pyx_ImportFrom(__pyx_t_2, __pyx_n_s_BytesIO); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 1, __pyx_L1_error)
+  __pyx_t_1 = __Pyx_ImportFrom(__pyx_t_2, __pyx_n_s_StringIO); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 1, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
-  if (PyDict_SetItem(__pyx_d, __pyx_n_s_BytesIO, __pyx_t_1) < 0) __PYX_ERR(0, 1, __pyx_L1_error)
+  if (PyDict_SetItem(__pyx_d, __pyx_n_s_StringIO, __pyx_t_1) < 0) __PYX_ERR(0, 1, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":7
+  /* "src/v4l2_camera/v4l2_camera.pyx":6
  * 
  * 
- * from fluxmonitor.misc.systime import systime as time             # <<<<<<<<<<<<<<
+ * from fluxmonitor.err_codes import HARDWARE_ERROR             # <<<<<<<<<<<<<<
+ * from fluxmonitor.misc.systime import systime as time
  * 
- * cdef extern from "v4l2_camera_module.h":
  */
-  __pyx_t_2 = PyList_New(1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 7, __pyx_L1_error)
+  __pyx_t_2 = PyList_New(1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 6, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_2);
-  __Pyx_INCREF(__pyx_n_s_systime);
-  __Pyx_GIVEREF(__pyx_n_s_systime);
-  PyList_SET_ITEM(__pyx_t_2, 0, __pyx_n_s_systime);
-  __pyx_t_1 = __Pyx_Import(__pyx_n_s_fluxmonitor_misc_systime, __pyx_t_2, -1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 7, __pyx_L1_error)
+  __Pyx_INCREF(__pyx_n_s_HARDWARE_ERROR);
+  __Pyx_GIVEREF(__pyx_n_s_HARDWARE_ERROR);
+  PyList_SET_ITEM(__pyx_t_2, 0, __pyx_n_s_HARDWARE_ERROR);
+  __pyx_t_1 = __Pyx_Import(__pyx_n_s_fluxmonitor_err_codes, __pyx_t_2, -1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 6, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
-  __pyx_t_2 = __Pyx_ImportFrom(__pyx_t_1, __pyx_n_s_systime); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 7, __pyx_L1_error)
+  __pyx_t_2 = __Pyx_ImportFrom(__pyx_t_1, __pyx_n_s_HARDWARE_ERROR); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 6, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_2);
-  if (PyDict_SetItem(__pyx_d, __pyx_n_s_time, __pyx_t_2) < 0) __PYX_ERR(0, 7, __pyx_L1_error)
+  if (PyDict_SetItem(__pyx_d, __pyx_n_s_HARDWARE_ERROR, __pyx_t_2) < 0) __PYX_ERR(0, 6, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
   __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
 
-  /* "src/v4l2_camera/v4l2_camera.pyx":1
- * from io import BytesIO             # <<<<<<<<<<<<<<
+  /* "src/v4l2_camera/v4l2_camera.pyx":7
+ * 
+ * from fluxmonitor.err_codes import HARDWARE_ERROR
+ * from fluxmonitor.misc.systime import systime as time             # <<<<<<<<<<<<<<
  * 
- * from libc.stdlib cimport free
+ * cdef extern from "v4l2_camera_module.h":
  */
-  __pyx_t_1 = PyDict_New(); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 1, __pyx_L1_error)
+  __pyx_t_1 = PyList_New(1); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 7, __pyx_L1_error)
   __Pyx_GOTREF(__pyx_t_1);
-  if (PyDict_SetItem(__pyx_d, __pyx_n_s_test, __pyx_t_1) < 0) __PYX_ERR(0, 1, __pyx_L1_error)
+  __Pyx_INCREF(__pyx_n_s_systime);
+  __Pyx_GIVEREF(__pyx_n_s_systime);
+  PyList_SET_ITEM(__pyx_t_1, 0, __pyx_n_s_systime);
+  __pyx_t_2 = __Pyx_Import(__pyx_n_s_fluxmonitor_misc_systime, __pyx_t_1, -1); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 7, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_2);
+  __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+  __pyx_t_1 = __Pyx_ImportFrom(__pyx_t_2, __pyx_n_s_systime); if (unlikely(!__pyx_t_1)) __PYX_ERR(0, 7, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_1);
+  if (PyDict_SetItem(__pyx_d, __pyx_n_s_time, __pyx_t_1) < 0) __PYX_ERR(0, 7, __pyx_L1_error)
   __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+  __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
+
+  /* "src/v4l2_camera/v4l2_camera.pyx":1
+ * from cStringIO import StringIO             # <<<<<<<<<<<<<<
+ * 
+ * import cython
+ */
+  __pyx_t_2 = PyDict_New(); if (unlikely(!__pyx_t_2)) __PYX_ERR(0, 1, __pyx_L1_error)
+  __Pyx_GOTREF(__pyx_t_2);
+  if (PyDict_SetItem(__pyx_d, __pyx_n_s_test, __pyx_t_2) < 0) __PYX_ERR(0, 1, __pyx_L1_error)
+  __Pyx_DECREF(__pyx_t_2); __pyx_t_2 = 0;
 
   /*--- Wrapped vars code ---*/
 
@@ -2175,6 +2429,20 @@ end:
 }
 #endif
 
+/* GetBuiltinName */
+static PyObject *__Pyx_GetBuiltinName(PyObject *name) {
+    PyObject* result = __Pyx_PyObject_GetAttrStr(__pyx_b, name);
+    if (unlikely(!result)) {
+        PyErr_Format(PyExc_NameError,
+#if PY_MAJOR_VERSION >= 3
+            "name '%U' is not defined", name);
+#else
+            "name '%.200s' is not defined", PyString_AS_STRING(name));
+#endif
+    }
+    return result;
+}
+
 /* RaiseDoubleKeywords */
 static void __Pyx_RaiseDoubleKeywordsError(
     const char* func_name,
@@ -2317,20 +2585,6 @@ static void __Pyx_RaiseArgtupleInvalid(
                  (num_expected == 1) ? "" : "s", num_found);
 }
 
-/* GetBuiltinName */
-static PyObject *__Pyx_GetBuiltinName(PyObject *name) {
-    PyObject* result = __Pyx_PyObject_GetAttrStr(__pyx_b, name);
-    if (unlikely(!result)) {
-        PyErr_Format(PyExc_NameError,
-#if PY_MAJOR_VERSION >= 3
-            "name '%U' is not defined", name);
-#else
-            "name '%.200s' is not defined", PyString_AS_STRING(name));
-#endif
-    }
-    return result;
-}
-
 /* GetModuleGlobalName */
 static CYTHON_INLINE PyObject *__Pyx_GetModuleGlobalName(PyObject *name) {
     PyObject *result;
@@ -2440,8 +2694,195 @@ static CYTHON_INLINE PyObject* __Pyx_PyObject_CallNoArg(PyObject *func) {
 }
 #endif
 
+/* PyErrFetchRestore */
+      #if CYTHON_COMPILING_IN_CPYTHON
+static CYTHON_INLINE void __Pyx_ErrRestoreInState(PyThreadState *tstate, PyObject *type, PyObject *value, PyObject *tb) {
+    PyObject *tmp_type, *tmp_value, *tmp_tb;
+    tmp_type = tstate->curexc_type;
+    tmp_value = tstate->curexc_value;
+    tmp_tb = tstate->curexc_traceback;
+    tstate->curexc_type = type;
+    tstate->curexc_value = value;
+    tstate->curexc_traceback = tb;
+    Py_XDECREF(tmp_type);
+    Py_XDECREF(tmp_value);
+    Py_XDECREF(tmp_tb);
+}
+static CYTHON_INLINE void __Pyx_ErrFetchInState(PyThreadState *tstate, PyObject **type, PyObject **value, PyObject **tb) {
+    *type = tstate->curexc_type;
+    *value = tstate->curexc_value;
+    *tb = tstate->curexc_traceback;
+    tstate->curexc_type = 0;
+    tstate->curexc_value = 0;
+    tstate->curexc_traceback = 0;
+}
+#endif
+
+/* RaiseException */
+      #if PY_MAJOR_VERSION < 3
+static void __Pyx_Raise(PyObject *type, PyObject *value, PyObject *tb,
+                        CYTHON_UNUSED PyObject *cause) {
+    __Pyx_PyThreadState_declare
+    Py_XINCREF(type);
+    if (!value || value == Py_None)
+        value = NULL;
+    else
+        Py_INCREF(value);
+    if (!tb || tb == Py_None)
+        tb = NULL;
+    else {
+        Py_INCREF(tb);
+        if (!PyTraceBack_Check(tb)) {
+            PyErr_SetString(PyExc_TypeError,
+                "raise: arg 3 must be a traceback or None");
+            goto raise_error;
+        }
+    }
+    if (PyType_Check(type)) {
+#if CYTHON_COMPILING_IN_PYPY
+        if (!value) {
+            Py_INCREF(Py_None);
+            value = Py_None;
+        }
+#endif
+        PyErr_NormalizeException(&type, &value, &tb);
+    } else {
+        if (value) {
+            PyErr_SetString(PyExc_TypeError,
+                "instance exception may not have a separate value");
+            goto raise_error;
+        }
+        value = type;
+        type = (PyObject*) Py_TYPE(type);
+        Py_INCREF(type);
+        if (!PyType_IsSubtype((PyTypeObject *)type, (PyTypeObject *)PyExc_BaseException)) {
+            PyErr_SetString(PyExc_TypeError,
+                "raise: exception class must be a subclass of BaseException");
+            goto raise_error;
+        }
+    }
+    __Pyx_PyThreadState_assign
+    __Pyx_ErrRestore(type, value, tb);
+    return;
+raise_error:
+    Py_XDECREF(value);
+    Py_XDECREF(type);
+    Py_XDECREF(tb);
+    return;
+}
+#else
+static void __Pyx_Raise(PyObject *type, PyObject *value, PyObject *tb, PyObject *cause) {
+    PyObject* owned_instance = NULL;
+    if (tb == Py_None) {
+        tb = 0;
+    } else if (tb && !PyTraceBack_Check(tb)) {
+        PyErr_SetString(PyExc_TypeError,
+            "raise: arg 3 must be a traceback or None");
+        goto bad;
+    }
+    if (value == Py_None)
+        value = 0;
+    if (PyExceptionInstance_Check(type)) {
+        if (value) {
+            PyErr_SetString(PyExc_TypeError,
+                "instance exception may not have a separate value");
+            goto bad;
+        }
+        value = type;
+        type = (PyObject*) Py_TYPE(value);
+    } else if (PyExceptionClass_Check(type)) {
+        PyObject *instance_class = NULL;
+        if (value && PyExceptionInstance_Check(value)) {
+            instance_class = (PyObject*) Py_TYPE(value);
+            if (instance_class != type) {
+                int is_subclass = PyObject_IsSubclass(instance_class, type);
+                if (!is_subclass) {
+                    instance_class = NULL;
+                } else if (unlikely(is_subclass == -1)) {
+                    goto bad;
+                } else {
+                    type = instance_class;
+                }
+            }
+        }
+        if (!instance_class) {
+            PyObject *args;
+            if (!value)
+                args = PyTuple_New(0);
+            else if (PyTuple_Check(value)) {
+                Py_INCREF(value);
+                args = value;
+            } else
+                args = PyTuple_Pack(1, value);
+            if (!args)
+                goto bad;
+            owned_instance = PyObject_Call(type, args, NULL);
+            Py_DECREF(args);
+            if (!owned_instance)
+                goto bad;
+            value = owned_instance;
+            if (!PyExceptionInstance_Check(value)) {
+                PyErr_Format(PyExc_TypeError,
+                             "calling %R should have returned an instance of "
+                             "BaseException, not %R",
+                             type, Py_TYPE(value));
+                goto bad;
+            }
+        }
+    } else {
+        PyErr_SetString(PyExc_TypeError,
+            "raise: exception class must be a subclass of BaseException");
+        goto bad;
+    }
+#if PY_VERSION_HEX >= 0x03030000
+    if (cause) {
+#else
+    if (cause && cause != Py_None) {
+#endif
+        PyObject *fixed_cause;
+        if (cause == Py_None) {
+            fixed_cause = NULL;
+        } else if (PyExceptionClass_Check(cause)) {
+            fixed_cause = PyObject_CallObject(cause, NULL);
+            if (fixed_cause == NULL)
+                goto bad;
+        } else if (PyExceptionInstance_Check(cause)) {
+            fixed_cause = cause;
+            Py_INCREF(fixed_cause);
+        } else {
+            PyErr_SetString(PyExc_TypeError,
+                            "exception causes must derive from "
+                            "BaseException");
+            goto bad;
+        }
+        PyException_SetCause(value, fixed_cause);
+    }
+    PyErr_SetObject(type, value);
+    if (tb) {
+#if CYTHON_COMPILING_IN_PYPY
+        PyObject *tmp_type, *tmp_value, *tmp_tb;
+        PyErr_Fetch(&tmp_type, &tmp_value, &tmp_tb);
+        Py_INCREF(tb);
+        PyErr_Restore(tmp_type, tmp_value, tb);
+        Py_XDECREF(tmp_tb);
+#else
+        PyThreadState *tstate = PyThreadState_GET();
+        PyObject* tmp_tb = tstate->curexc_traceback;
+        if (tb != tmp_tb) {
+            Py_INCREF(tb);
+            tstate->curexc_traceback = tb;
+            Py_XDECREF(tmp_tb);
+        }
+#endif
+    }
+bad:
+    Py_XDECREF(owned_instance);
+    return;
+}
+#endif
+
 /* SetVTable */
-      static int __Pyx_SetVtable(PyObject *dict, void *vtable) {
+        static int __Pyx_SetVtable(PyObject *dict, void *vtable) {
 #if PY_VERSION_HEX >= 0x02070000
     PyObject *ob = PyCapsule_New(vtable, 0, 0);
 #else
@@ -2459,7 +2900,7 @@ bad:
 }
 
 /* Import */
-      static PyObject *__Pyx_Import(PyObject *name, PyObject *from_list, int level) {
+        static PyObject *__Pyx_Import(PyObject *name, PyObject *from_list, int level) {
     PyObject *empty_list = 0;
     PyObject *module = 0;
     PyObject *global_dict = 0;
@@ -2533,7 +2974,7 @@ bad:
 }
 
 /* ImportFrom */
-      static PyObject* __Pyx_ImportFrom(PyObject* module, PyObject* name) {
+        static PyObject* __Pyx_ImportFrom(PyObject* module, PyObject* name) {
     PyObject* value = __Pyx_PyObject_GetAttrStr(module, name);
     if (unlikely(!value) && PyErr_ExceptionMatches(PyExc_AttributeError)) {
         PyErr_Format(PyExc_ImportError,
@@ -2547,7 +2988,7 @@ bad:
 }
 
 /* CodeObjectCache */
-      static int __pyx_bisect_code_objects(__Pyx_CodeObjectCacheEntry* entries, int count, int code_line) {
+        static int __pyx_bisect_code_objects(__Pyx_CodeObjectCacheEntry* entries, int count, int code_line) {
     int start = 0, mid = 0, end = count - 1;
     if (end >= 0 && code_line > entries[end].code_line) {
         return count;
@@ -2627,7 +3068,7 @@ static void __pyx_insert_code_object(int code_line, PyCodeObject* code_object) {
 }
 
 /* AddTraceback */
-      #include "compile.h"
+        #include "compile.h"
 #include "frameobject.h"
 #include "traceback.h"
 static PyCodeObject* __Pyx_CreateCodeObjectForTraceback(
@@ -2708,7 +3149,7 @@ bad:
 }
 
 /* CIntFromPyVerify */
-      #define __PYX_VERIFY_RETURN_INT(target_type, func_type, func_value)\
+        #define __PYX_VERIFY_RETURN_INT(target_type, func_type, func_value)\
     __PYX__VERIFY_RETURN_INT(target_type, func_type, func_value, 0)
 #define __PYX_VERIFY_RETURN_INT_EXC(target_type, func_type, func_value)\
     __PYX__VERIFY_RETURN_INT(target_type, func_type, func_value, 1)
@@ -2730,7 +3171,7 @@ bad:
     }
 
 /* CIntToPy */
-      static CYTHON_INLINE PyObject* __Pyx_PyInt_From_int(int value) {
+        static CYTHON_INLINE PyObject* __Pyx_PyInt_From_int(int value) {
     const int neg_one = (int) -1, const_zero = (int) 0;
     const int is_unsigned = neg_one > const_zero;
     if (is_unsigned) {
@@ -2757,7 +3198,7 @@ bad:
 }
 
 /* CIntFromPy */
-      static CYTHON_INLINE int __Pyx_PyInt_As_int(PyObject *x) {
+        static CYTHON_INLINE int __Pyx_PyInt_As_int(PyObject *x) {
     const int neg_one = (int) -1, const_zero = (int) 0;
     const int is_unsigned = neg_one > const_zero;
 #if PY_MAJOR_VERSION < 3
@@ -2942,7 +3383,7 @@ raise_neg_overflow:
 }
 
 /* CIntToPy */
-      static CYTHON_INLINE PyObject* __Pyx_PyInt_From_long(long value) {
+        static CYTHON_INLINE PyObject* __Pyx_PyInt_From_long(long value) {
     const long neg_one = (long) -1, const_zero = (long) 0;
     const int is_unsigned = neg_one > const_zero;
     if (is_unsigned) {
@@ -2969,7 +3410,7 @@ raise_neg_overflow:
 }
 
 /* CIntFromPy */
-      static CYTHON_INLINE long __Pyx_PyInt_As_long(PyObject *x) {
+        static CYTHON_INLINE long __Pyx_PyInt_As_long(PyObject *x) {
     const long neg_one = (long) -1, const_zero = (long) 0;
     const int is_unsigned = neg_one > const_zero;
 #if PY_MAJOR_VERSION < 3
@@ -3154,7 +3595,7 @@ raise_neg_overflow:
 }
 
 /* CheckBinaryVersion */
-      static int __Pyx_check_binary_version(void) {
+        static int __Pyx_check_binary_version(void) {
     char ctversion[4], rtversion[4];
     PyOS_snprintf(ctversion, 4, "%d.%d", PY_MAJOR_VERSION, PY_MINOR_VERSION);
     PyOS_snprintf(rtversion, 4, "%s", Py_GetVersion());
@@ -3170,7 +3611,7 @@ raise_neg_overflow:
 }
 
 /* InitStrings */
-      static int __Pyx_InitStrings(__Pyx_StringTabEntry *t) {
+        static int __Pyx_InitStrings(__Pyx_StringTabEntry *t) {
     while (t->p) {
         #if PY_MAJOR_VERSION < 3
         if (t->is_unicode) {
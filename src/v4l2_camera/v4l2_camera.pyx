@@ -1,25 +1,28 @@
-from io import BytesIO
+from cStringIO import StringIO
 
-from libc.stdlib cimport free
 import cython
 
 
+from fluxmonitor.err_codes import HARDWARE_ERROR
 from fluxmonitor.misc.systime import systime as time
 
 cdef extern from "v4l2_camera_module.h":
     int attach_camera(int video_name,unsigned char* &_buf, int width, int height)
     int release_camera(int fd, unsigned char* &buffer)
-    int capture_image(int fd, unsigned char* &buffer)
+    int capture_image(int fd, unsigned char* &buffer, int max_age)
+
+# Live view accepts a frame completed within this period (microseconds)
+# instead of waiting for next one
+DEF LIVE_MAX_AGE = 100000
 
 
 cdef class V4l2Camera:
-    cdef object py_buffer
+    cdef object _bytes
 
     cdef unsigned char * _buf
-    cdef int buf_length
     cdef int camera_port
     cdef int fd
-    cdef float ts
+    cdef readonly float ts
     cdef width
     cdef height
 
@@ -27,40 +30,48 @@ cdef class V4l2Camera:
         self.camera_port = camera_id
         self.fd = -1
         self.ts = time()
-        self.py_buffer = None
+        self._bytes = None
         self.width = width
         self.height = height
 
     def live(self):
         if time() - self.ts > 0.1:
-            self.fetch(0)
+            self.capture(LIVE_MAX_AGE)
         return self.ts
 
     def fetch(self, clear_cache=4):
-        # Take a new photo immediately
-        if self.fd < 0:
-            self.attach()
+        # Take a new photo, exposed after this call
+        self.capture(0)
 
-        self.buf_length = capture_image(self.fd, self._buf)
-        # print('lengh: ', self.buf_length)
-        # success_count = 0
-        # for i in range(16):  # try at most 16 times
-        #     if success_count >= clear_cache:  # 4 success is enough
-        #         break
-        #     if self.obj.grab():
-        #         success_count += 1
+    cdef capture(self, int max_age):
+        cdef int length
 
+        if self.fd < 0:
+            self.attach()
+            if self.fd < 0:
+                raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+                                   str(self.camera_port))
+
+        self._bytes = None
+        length = capture_image(self.fd, self._buf, max_age)
+        if length < 0:
+            raise RuntimeError(HARDWARE_ERROR, "CAMERA",
+                               str(self.camera_port))
+
+        # Copy the frame once, the driver buffer is given back at next
+        # capture and the driver fills other queued buffers meanwhile.
+        self._bytes = self._buf[:length]
         self.ts = time()
-        self.py_buffer = None
+
+    property imagebytes:
+        """Last frame as str"""
+        def __get__(self):
+            return self._bytes
 
     @property
     def imagefile(self):
-        if self.py_buffer is None:
-            self.py_buffer = BytesIO(self._buf[:self.buf_length])
-        else:
-            self.py_buffer.seek(0)
-
-        return ("image/jpeg", self.buf_length, BytesIO(self._buf[:self.buf_length]))
+        # cStringIO reads the str in place
+        return ("image/jpeg", len(self._bytes), StringIO(self._bytes))
 
     cpdef attach(self):
         if self.fd > 0:
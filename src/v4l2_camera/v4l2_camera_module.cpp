@@ -12,6 +12,7 @@
 #include <string.h>
 #include <sys/ioctl.h>
 #include <sys/mman.h>
+#include <time.h>
 #include <unistd.h>
 #include <stdlib.h>
 #include <typeinfo>
@@ -26,81 +27,204 @@ static int xioctl(int fd, int request, void *arg)
         return r;
 }
 
+// Buffers are kept queued in the driver while streaming, so the next frame
+// is being captured while the caller still reads the previous one.
+#define BUFFER_COUNT 4
+
+struct mmap_buffer {
+    void *start;
+    size_t length;
+};
+
+static struct mmap_buffer buffers[BUFFER_COUNT];
+static unsigned int n_buffers = 0;
+// Index of the buffer handed out by capture_image, -1 if none. It is not
+// queued back until next capture or release, the driver never writes into
+// a frame which is being read.
+static int held_index = -1;
+
+// Microseconds since the frame was completed, driver without monotonic
+// timestamp is treated as the frame is too old.
+static long frame_age(struct v4l2_buffer *buf)
+{
+    if((buf->flags & V4L2_BUF_FLAG_TIMESTAMP_MASK) !=
+       V4L2_BUF_FLAG_TIMESTAMP_MONOTONIC)
+    {
+        return -1;
+    }
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return (now.tv_sec - buf->timestamp.tv_sec) * 1000000L +
+           (now.tv_nsec / 1000 - buf->timestamp.tv_usec);
+}
+
+static int queue_buffer(int fd, int index)
+{
+    struct v4l2_buffer buf = {0};
+    buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
+    buf.memory = V4L2_MEMORY_MMAP;
+    buf.index = index;
+    return xioctl(fd, VIDIOC_QBUF, &buf);
+}
+
+static int wait_frame(int fd, int sec)
+{
+    fd_set fds;
+    FD_ZERO(&fds);
+    FD_SET(fd, &fds);
+    struct timeval tv = {0};
+    tv.tv_sec = sec;
+    return select(fd+1, &fds, NULL, NULL, &tv);
+}
+
+static void unmap_buffers()
+{
+    for(unsigned int i=0; i<n_buffers; i++)
+    {
+        if(-1 == munmap(buffers[i].start, buffers[i].length)){
+            perror("munmap error");
+        }
+    }
+    n_buffers = 0;
+    held_index = -1;
+}
+
 int init_mmap(int fd, unsigned char* &buffer)
 {
     struct v4l2_requestbuffers req = {0};
-    req.count = 1;
+    req.count = BUFFER_COUNT;
     req.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
     req.memory = V4L2_MEMORY_MMAP;
 
-    if (-1 == xioctl(fd, VIDIOC_REQBUFS, &req))
+    if (-1 == xioctl(fd, VIDIOC_REQBUFS, &req) || req.count < 1)
     {
         perror("Requesting Buffer");
         return 1;
     }
 
-    struct v4l2_buffer buf = {0};
-    buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
-    buf.memory = V4L2_MEMORY_MMAP;
-    buf.index = 0;
-    if(-1 == xioctl(fd, VIDIOC_QUERYBUF, &buf))
+    n_buffers = 0;
+    held_index = -1;
+    for(unsigned int i=0; i<req.count && i<BUFFER_COUNT; i++)
     {
-        perror("Querying Buffer");
-        return 1;
+        struct v4l2_buffer buf = {0};
+        buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
+        buf.memory = V4L2_MEMORY_MMAP;
+        buf.index = i;
+        if(-1 == xioctl(fd, VIDIOC_QUERYBUF, &buf))
+        {
+            perror("Querying Buffer");
+            unmap_buffers();
+            return 1;
+        }
+
+        void *start = mmap(NULL, buf.length, PROT_READ | PROT_WRITE,
+                           MAP_SHARED, fd, buf.m.offset);
+        if(MAP_FAILED == start)
+        {
+            perror("mmap");
+            unmap_buffers();
+            return 1;
+        }
+        buffers[i].start = start;
+        buffers[i].length = buf.length;
+        n_buffers++;
+
+        if(-1 == queue_buffer(fd, i))
+        {
+            perror("Query Buffer");
+            unmap_buffers();
+            return 1;
+        }
     }
 
-    buffer =  static_cast<unsigned char *>(mmap (NULL, buf.length, PROT_READ | PROT_WRITE, MAP_SHARED, fd,  buf.m.offset));
+    int type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
+    if(-1 == xioctl(fd, VIDIOC_STREAMON, &type))
+    {
+        perror("Start Capture");
+        unmap_buffers();
+        return 1;
+    }
 
+    buffer = static_cast<unsigned char *>(buffers[0].start);
     return 0;
 }
 
-int capture_image(int fd, unsigned char* &buffer){
+int capture_image(int fd, unsigned char* &buffer, int max_age){
     struct v4l2_buffer buf = {0};
     buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
     buf.memory = V4L2_MEMORY_MMAP;
-    buf.index = 0;
-    if(-1 == xioctl(fd, VIDIOC_QBUF, &buf))
+    int ready = 0;
+
+    // Last frame belongs to the driver from here, caller must not read it
+    // even if this capture fails.
+    buffer = NULL;
+
+    // Give the frame read by caller back to driver
+    if(held_index >= 0)
     {
-        perror("Query Buffer");
-        return 1;
+        if(-1 == queue_buffer(fd, held_index))
+        {
+            perror("Query Buffer");
+            return -1;
+        }
+        held_index = -1;
     }
 
-    if(-1 == xioctl(fd, VIDIOC_STREAMON, &buf.type))
+    // Keep the newest completed frame, older ones are given back
+    while(wait_frame(fd, 0) > 0)
     {
-        perror("Start Capture");
-        return 1;
+        if(ready && -1 == queue_buffer(fd, buf.index))
+        {
+            perror("Query Buffer");
+            return -1;
+        }
+        if(-1 == xioctl(fd, VIDIOC_DQBUF, &buf))
+        {
+            perror("Retrieving Frame");
+            return -1;
+        }
+        ready = 1;
     }
 
-    fd_set fds;
-    FD_ZERO(&fds);
-    FD_SET(fd, &fds);
-    struct timeval tv = {0};
-    tv.tv_sec = 2;
-    int r = select(fd+1, &fds, NULL, NULL, &tv);
+    if(ready)
+    {
+        long age = frame_age(&buf);
+        if(age >= 0 && age <= max_age)
+        {
+            held_index = buf.index;
+            buffer = static_cast<unsigned char *>(buffers[buf.index].start);
+            return buf.bytesused;
+        }
+
+        // Frame may be exposed before the scene changed (ex: laser
+        // switched), wait for a frame completed after this call.
+        if(-1 == queue_buffer(fd, buf.index))
+        {
+            perror("Query Buffer");
+            return -1;
+        }
+    }
+
+    int r = wait_frame(fd, 2);
     if(-1 == r)
     {
         perror("Waiting for Frame");
-        return 1;
+        return -1;
+    }
+    else if(0 == r)
+    {
+        fprintf(stderr, "Waiting for Frame: timeout\n");
+        return -1;
     }
 
     if(-1 == xioctl(fd, VIDIOC_DQBUF, &buf))
     {
         perror("Retrieving Frame");
-        return 1;
+        return -1;
     }
-    // printf ("%d\n", buf.bytesused);
-
-    // storing
-    // int jpgfile;
-    // if((jpgfile = open("tmp_image2.jpeg", O_WRONLY | O_CREAT, 0660)) < 0){
-    //     perror("open");
-    //     // exit(1);
-    //     return 1;
-    // }
-
-    // write(jpgfile, buffer, buf.bytesused);
-    // close(jpgfile);
 
+    held_index = buf.index;
+    buffer = static_cast<unsigned char *>(buffers[buf.index].start);
     return buf.bytesused;
 }
 
@@ -113,7 +237,7 @@ int attach_camera(int video_name, unsigned char*& buffer, int width, int height)
 
     if (fd == -1){
         perror("Opening video device");
-        return 1;
+        return -1;
     }
 
     //setting: you can use "v4l2-ctl --list-formats-ext" to checkout properties
@@ -127,32 +251,26 @@ int attach_camera(int video_name, unsigned char*& buffer, int width, int height)
     if (-1 == xioctl(fd, VIDIOC_S_FMT, &fmt))
     {
         perror("Setting Pixel Format");
-        return 1;
+        close(fd);
+        return -1;
     }
 
     if(init_mmap(fd, buffer))
+    {
+        close(fd);
         return -1;
+    }
 
     return fd;
 }
 
 int release_camera(int fd, unsigned char*& buffer){
-    // int type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
-    // if(xioctl(fd, VIDIOC_STREAMOFF, &type) < 0){
-    //     perror("VIDIOC_STREAMOFF");
-    //     return 1;
-    // }
-    struct v4l2_buffer buf = {0};
-    buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
-    buf.memory = V4L2_MEMORY_MMAP;
-    if(-1 == xioctl(fd, VIDIOC_QUERYBUF, &buf))
-    {
-        perror("Querying Buffer");
-        return 1;
-    }
-    if(-1 == munmap((void *)buffer, buf.length)){
-      perror("munmap error");
+    int type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
+    if(-1 == xioctl(fd, VIDIOC_STREAMOFF, &type)){
+        perror("VIDIOC_STREAMOFF");
     }
+    unmap_buffers();
+    buffer = NULL;
     close(fd);
     return 0;
 }
@@ -172,14 +290,14 @@ int main(int argc, char* argv[]){
     int i;
     for(i=0; i<atoi(argv[1]); i++)
     {
-      capture_image(fd, buffer);
+      capture_image(fd, buffer, 0);
     }
     release_camera(fd, buffer);
     fd = attach_camera(0, buffer, 800, 600);
     printf("Address 2: %p %d\n", buffer, fd);
     for(i=0; i<atoi(argv[1]); i++)
     {
-      capture_image(fd, buffer);
+      capture_image(fd, buffer, 0);
     }
 
     return 0;
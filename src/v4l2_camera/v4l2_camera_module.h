@@ -1,3 +1,9 @@
+// Return fd, or -1 on error
 int attach_camera(int video_name, unsigned char*& buffer, int width, int height);
 int release_camera(int fd, unsigned char*& buffer);
-int capture_image(int fd, unsigned char* &buffer);
+// Return frame size and point buffer to the frame, it is valid until next
+// capture or release. Return -1 and set buffer to NULL on error.
+// A frame completed within max_age microseconds before this call is
+// returned at once, otherwise it waits for the next frame. Use 0 to get a
+// frame exposed after this call.
+int capture_image(int fd, unsigned char* &buffer, int max_age);
@@ -1,13 +1,15 @@
 
 import unittest
 import socket
+import struct
 import pyev
 
 from msgpack import unpackb
 
 from tests._utils.virtual_device import VirtualDevice, has_data
 from fluxmonitor.controller.tasks.icontrol_task import (
-    IControlTask, CMD_G001, CMD_G028)
+    IControlTask, Telemetry, CMD_G001, CMD_G028, CMD_MOVB, CMD_THRP,
+    HEAD_RESP_MAXLEN)
 
 
 class VirtualKernal(object):
@@ -49,6 +51,49 @@ class RobotSocketHandler(object):
 #                   (socket)
 
 
+class FakeClock(object):
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class TelemetryTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.sent = []
+        self.telemetry = Telemetry(pyev.Loop(), self.sent.append,
+                                   clock=self.clock)
+        self.telemetry.configure(0.1, 1.0, 1)
+
+    def test_on_change(self):
+        t = self.telemetry
+        t.update(0, "a")
+        t.update(0, "a")
+        self.assertEqual(self.sent, ["a"])
+
+        # Changed within interval, wait for timer
+        self.clock.t += 0.05
+        t.update(0, "b")
+        self.assertEqual(self.sent, ["a"])
+        self.assertTrue(t.timer.active)
+
+        self.clock.t += 0.05
+        t.timer.stop()
+        t.on_timer(t.timer, 0)
+        self.assertEqual(self.sent, ["a", "b"])
+
+        # Unchanged message resent when heartbeat reached
+        self.clock.t += 1.0
+        t.update(0, "b")
+        self.assertEqual(self.sent, ["a", "b", "b"])
+
+    def test_configure(self):
+        self.assertRaises(ValueError, self.telemetry.configure, 0.001, 1, 1)
+        self.assertRaises(ValueError, self.telemetry.configure, 2, 1, 1)
+
+
 class IControlTest(unittest.TestCase):
     def setUp(self):
         self.virtual_device = VirtualDevice()
@@ -107,3 +152,63 @@ class IControlTest(unittest.TestCase):
         self.icontrol.process_cmd(self.handler, 2, CMD_G001,
                                   {"X": 300.2, "F": 10})
         self.assertReturn((0xff, 2, 0x01))
+
+    def test_move_batch(self):
+        self.icontrol.known_position = [0, 0, 240]
+
+        # Each move takes one command index
+        moves = struct.pack("<9f", 600, 1, 1, 600, 2, 2, 600, 3, 3)
+        self.icontrol.process_cmd(self.handler, 0, CMD_MOVB, ("F", "X", "Y"),
+                                  moves)
+        self.assertEqual(self.icontrol.cmd_index, 3)
+        self.assertEqual(self.icontrol.buflen, 3)
+        self.assertEqual(self.icontrol.known_position, [3, 3, 240])
+        self.assertNoReturn()
+
+        # Second move over limit, nothing queued
+        moves = struct.pack("<2f", 10, 300)
+        self.icontrol.process_cmd(self.handler, 3, CMD_MOVB, ("X", ), moves)
+        self.assertReturn((0xff, 3, 0x01))
+        self.assertEqual(self.icontrol.cmd_index, 3)
+        self.assertEqual(self.icontrol.known_position, [3, 3, 240])
+
+        # Moves size does not match fields
+        self.icontrol.process_cmd(self.handler, 3, CMD_MOVB, ("X", "Y"),
+                                  struct.pack("<3f", 1, 1, 1))
+        self.assertReturn((0xff, 3, 0x03))
+
+        # Infinite feedrate or position is not a valid move
+        for fields in (("F", "X"), ("X", "E0")):
+            self.icontrol.process_cmd(self.handler, 3, CMD_MOVB, fields,
+                                      struct.pack("<2f", float("inf"), 1))
+            self.assertReturn((0xff, 3, 0x03))
+            self.icontrol.process_cmd(self.handler, 3, CMD_MOVB, fields,
+                                      struct.pack("<2f", 1, float("-inf")))
+            self.assertReturn((0xff, 3, 0x03))
+        self.assertEqual(self.icontrol.cmd_index, 3)
+
+        # Feedrate below 1 would be sent as F0
+        for feedrate in (0.5, 0, -10):
+            self.icontrol.process_cmd(self.handler, 3, CMD_MOVB, ("F", "X"),
+                                      struct.pack("<2f", feedrate, 1))
+            self.assertReturn((0xff, 3, 0x01))
+        self.assertEqual(self.icontrol.cmd_index, 3)
+
+    def test_toolhead_raw_push(self):
+        # Only USER toolhead has raw response
+        self.icontrol.process_cmd(self.handler, 0, CMD_THRP, 1)
+        self.assertReturn((0xff, 0, 0x01))
+
+        self.icontrol.head_resp_stack = []
+        self.icontrol.toolhead_message_callback(None, "A")
+        self.icontrol.process_cmd(self.handler, 0, CMD_THRP, 1)
+        self.assertReturn((CMD_THRP, 0, ["A"]))
+
+        # Oldest responses are dropped, sequence number shows the gap
+        for i in range(HEAD_RESP_MAXLEN + 2):
+            self.icontrol.toolhead_message_callback(None, "R%i" % i)
+        self.icontrol.push_head_resp()
+        ret = unpackb(self.client.recv(4096))
+        self.assertEqual(ret[1], 3)
+        self.assertEqual(ret[2][0], "R2")
+        self.assertEqual(len(ret[2]), HEAD_RESP_MAXLEN)
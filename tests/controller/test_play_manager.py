@@ -0,0 +1,183 @@
+import unittest
+
+from fluxmonitor.controller.tasks import play_manager
+from fluxmonitor.interfaces.player import HEARTBEAT_INTERVAL
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeSocket(object):
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, buf):
+        self.sent.append(buf)
+
+    def getsockname(self):
+        return "/tmp/fake-player-manager-sock"
+
+    def close(self):
+        self.closed = True
+
+
+class FakeWatcher(object):
+    active = False
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+
+class FakeProcess(object):
+    killed = False
+
+    def poll(self):
+        return 9 if self.killed else None
+
+    def kill(self):
+        self.killed = True
+
+
+class FakePlayerManager(play_manager.PlayerManager):
+    child_watcher = None
+
+    def __init__(self):
+        # Skip player process bootstrap
+        self._requests = {}
+        self._timeout_watcher = FakeWatcher()
+        self._sock = FakeSocket()
+        self.proc = FakeProcess()
+
+
+class PlayerManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._time = play_manager.time
+        play_manager.time = self.clock
+        self.manager = FakePlayerManager()
+
+    def tearDown(self):
+        play_manager.time = self._time
+
+
+class RequestTest(PlayerManagerTestCase):
+    def setUp(self):
+        super(RequestTest, self).setUp()
+        self.replies = []
+
+    def callback(self, name):
+        return lambda ret: self.replies.append((name, ret))
+
+    def test_response_matching(self):
+        m = self.manager
+        m.request("PAUSE", self.callback("pause"))
+        m.request("RESUME", self.callback("resume"))
+        self.assertEqual(m._sock.sent, ["#1 PAUSE", "#2 RESUME"])
+        self.assertTrue(m._timeout_watcher.active)
+
+        # Responses may come in any order
+        m._handle_message("#2 ok")
+        self.assertEqual(self.replies, [("resume", "ok")])
+
+        # Unknown and malformed ids are dropped
+        for buf in ("#2 ok", "#99 ok", "#x ok", "#1", "#", "garbage"):
+            m._handle_message(buf)
+        self.assertEqual(self.replies, [("resume", "ok")])
+
+        m._handle_message("#1 error RESOURCE_BUSY")
+        self.assertEqual(self.replies, [("resume", "ok"),
+                                        ("pause", "error RESOURCE_BUSY")])
+        self.assertEqual(m._requests, {})
+
+    def test_request_timeout(self):
+        m = self.manager
+        m.request("PAUSE", self.callback("pause"))
+        self.clock.t += 1
+        m.request("RESUME", self.callback("resume"))
+
+        self.clock.t += play_manager.REQUEST_TIMEOUT - 0.5
+        m.on_request_timer(m._timeout_watcher, 0)
+        self.assertEqual(self.replies,
+                         [("pause", play_manager.NO_RESPONSE_REPLY)])
+        self.assertTrue(m._timeout_watcher.active)
+
+        self.clock.t += 1
+        m.on_request_timer(m._timeout_watcher, 0)
+        self.assertEqual(self.replies[1],
+                         ("resume", play_manager.NO_RESPONSE_REPLY))
+        self.assertFalse(m._timeout_watcher.active)
+
+        # Late response is dropped
+        m._handle_message("#1 ok")
+        self.assertEqual(len(self.replies), 2)
+
+    def test_close_sock(self):
+        m = self.manager
+        sock = m._sock
+        m.request("PAUSE", self.callback("pause"))
+        m.request("ABORT", self.callback("abort"))
+        m._close_sock()
+
+        self.assertTrue(sock.closed)
+        self.assertIsNone(m._sock)
+        self.assertEqual(sorted(self.replies),
+                         [("abort", play_manager.NO_RESPONSE_REPLY),
+                          ("pause", play_manager.NO_RESPONSE_REPLY)])
+        self.assertEqual(m._requests, {})
+        self.assertFalse(m._timeout_watcher.active)
+
+    def test_quit(self):
+        m = self.manager
+        m.quit(self.callback("quit"))
+        self.assertEqual(m._sock.sent, ["#1 QUIT"])
+        m._handle_message("#1 ok")
+        self.assertEqual(self.replies, [("quit", "ok")])
+        self.assertFalse(m.proc.killed)
+
+    def test_quit_timeout(self):
+        m = self.manager
+        m.quit(self.callback("quit"))
+        self.clock.t += play_manager.REQUEST_TIMEOUT + 0.1
+        m.on_request_timer(m._timeout_watcher, 0)
+
+        # Player does not answer, terminate the process
+        self.assertTrue(m.proc.killed)
+        self.assertEqual(self.replies,
+                         [("quit", play_manager.NO_RESPONSE_REPLY)])
+
+
+class ReportTest(PlayerManagerTestCase):
+    def setUp(self):
+        super(ReportTest, self).setUp()
+        self.manager.status = {"st_id": 16}
+        self.manager.status_seq = 3
+
+    def subscribes(self):
+        return [b for b in self.manager._sock.sent
+                if b.startswith("SUBSCRIBE")]
+
+    def test_resubscribe_once_a_heartbeat(self):
+        m = self.manager
+        m.subscribe()
+        # Status push stopped
+        m.status_at = self.clock.t
+        self.clock.t += HEARTBEAT_INTERVAL * 2
+
+        for i in range(5):
+            m.report(lambda ret: None)
+        self.assertEqual(len(self.subscribes()), 2)
+        self.assertEqual(len(m._requests), 5)
+
+        self.clock.t += HEARTBEAT_INTERVAL
+        m.report(lambda ret: None)
+        self.assertEqual(len(self.subscribes()), 3)
@@ -0,0 +1,305 @@
+from io import BytesIO
+import unittest
+import socket
+
+import msgpack
+
+from fluxmonitor.controller.tasks import scan_task
+
+
+class FakeMainboard(object):
+    buffered_cmd_size = 0
+    ready = True
+    error = None
+
+    def __init__(self):
+        self.cmds = []
+
+    def send_cmd(self, cmd):
+        self.cmds.append(cmd)
+
+    def handle_recv(self):
+        if self.error:
+            raise self.error
+
+    def close(self):
+        pass
+
+
+class FakeCamera(object):
+    def __init__(self):
+        self.requests = []
+        self.history = []
+
+    def async_oneshot(self, callback, errback=None):
+        self.request(("image/jpeg", 4, BytesIO("jpeg")), callback, errback,
+                     "oneshot")
+
+    def async_store_frame(self, name, callback, errback=None):
+        self.request(("ok", None), callback, errback, "store", name)
+
+    def async_laser_lines(self, off_name, on_names, callback, errback=None):
+        self.request(["left", "right"], callback, errback, "lines",
+                     off_name, on_names)
+
+    def request(self, result, callback, errback, *args):
+        self.history.append(args)
+        self.requests.append((result, callback, errback))
+
+    def reply(self):
+        result, callback, errback = self.requests.pop(0)
+        callback(result)
+
+    def fail(self, *args):
+        result, callback, errback = self.requests.pop(0)
+        errback(*args)
+
+    def close(self):
+        pass
+
+
+class FakeHandler(object):
+    def __init__(self):
+        self.texts = []
+        self.binaries = []
+        self.sending = []
+
+    def send_text(self, text):
+        self.texts.append(text)
+
+    def async_send_binary(self, mimetype, length, stream, callback):
+        self.binaries.append((mimetype, msgpack.unpackb(stream.read())))
+        self.sending.append(callback)
+
+    def sent(self):
+        self.sending.pop(0)(self)
+
+
+class FakeStack(object):
+    exited = False
+
+    def exit_task(self, task):
+        self.exited = True
+        task.clean()
+
+
+class FakeMetadata(object):
+    def update_device_status(self, *args):
+        pass
+
+
+class FakeWatcher(object):
+    def stop(self):
+        pass
+
+
+class FakeScanTask(scan_task.ScanTask):
+    def __init__(self):
+        # Skip mainboard, headboard and camera connections
+        self.stack = FakeStack()
+        self.handler = FakeHandler()
+        self.camera = FakeCamera()
+        self.mainboard = FakeMainboard()
+        self._settle_watcher = FakeWatcher()
+
+    def settle(self, callback):
+        callback()
+
+
+class ScanTaskTestCase(unittest.TestCase):
+    def setUp(self):
+        self._metadata = scan_task.metadata
+        scan_task.metadata = FakeMetadata()
+        self.task = FakeScanTask()
+        self.handler = self.task.handler
+        self.camera = self.task.camera
+
+    def tearDown(self):
+        scan_task.metadata = self._metadata
+
+    def step(self):
+        # Complete one pending mainboard, camera or client operation
+        if self.task._macro:
+            self.task._macro.on_command_empty(self.task)
+        elif self.camera.requests:
+            self.camera.reply()
+        elif self.handler.sending:
+            self.handler.sent()
+        else:
+            return False
+        return True
+
+    def run_until_idle(self):
+        while self.step():
+            pass
+
+    def dispatch(self, *args):
+        self.task.dispatch_cmd(self.handler, *args)
+
+
+class ScanBatchTest(ScanTaskTestCase):
+    def test_batch(self):
+        self.dispatch("scan_batch", "2", "0.9")
+        self.assertTrue(self.task.busying)
+        self.assertRaises(RuntimeError, self.dispatch, "oneshot")
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["ok"])
+        self.assertEqual([b[1][0] for b in self.handler.binaries], [0, 1])
+        self.assertEqual(len(self.handler.binaries[1][1][1]), 3)
+        self.assertEqual(self.task.mainboard.cmds.count("G1 F500 E0.90000"), 1)
+        self.assertFalse(self.task.busying)
+        self.assertIsNone(self.task._batch)
+
+    def test_abort(self):
+        self.dispatch("scan_batch", "100")
+        # Abort while first image is being taken
+        while not self.camera.requests:
+            self.step()
+        self.dispatch("scan_abort")
+        self.assertEqual(self.handler.texts, [])
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["ok aborted"])
+        self.assertEqual(self.handler.binaries, [])
+        self.assertEqual(self.task.mainboard.cmds[-1], "X1E0")
+        self.assertFalse(self.task.busying)
+        self.assertRaises(RuntimeError, self.dispatch, "scan_abort")
+
+    def test_quit(self):
+        self.dispatch("scan_batch", "100")
+        while not self.handler.sending:
+            self.step()
+        self.dispatch("quit")
+        self.assertTrue(self.task.stack.exited)
+        # Reply after the binary being sent
+        self.assertEqual(self.handler.texts, [])
+        self.handler.sent()
+        self.assertEqual(self.handler.texts, ["ok"])
+        self.assertEqual(self.camera.requests, [])
+
+    def test_camera_error(self):
+        self.dispatch("scan_batch", "100")
+        while not self.camera.requests:
+            self.step()
+        self.camera.fail("HARDWARE_ERROR", "CAMERA", "0")
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["error HARDWARE_ERROR CAMERA 0"])
+        self.assertFalse(self.task.busying)
+        self.assertIsNone(self.task._macro)
+
+    def test_mainboard_error(self):
+        self.dispatch("scan_batch", "100")
+        while not self.task._batch.moving:
+            self.step()
+        self.task.mainboard.error = SystemError("HARDWARE_ERROR", "SENSOR")
+        self.task.on_mainboard_message(None, 0)
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["error HARDWARE_ERROR SENSOR"])
+        self.assertEqual(self.task.mainboard.cmds[-1], "X1E0")
+        self.assertFalse(self.task.busying)
+        self.assertIsNone(self.task._macro)
+
+    def test_bad_params(self):
+        for args in (("0", ), ("100000", ), ("10", "nan"), ("10", "inf"),
+                     ("10", "-0.45"), ("10", "0")):
+            with self.assertRaises(RuntimeError) as cm:
+                self.dispatch("scan_batch", *args)
+            self.assertEqual(cm.exception.args, ("BAD_PARAMS", ))
+        self.assertFalse(self.task.busying)
+
+
+class LaserLinesTest(ScanTaskTestCase):
+    def test_lines(self):
+        self.dispatch("scanimages", "lines")
+        self.run_until_idle()
+
+        self.assertEqual(self.camera.history,
+                         [("store", "L"), ("store", "R"), ("store", "O"),
+                          ("lines", "O", ("L", "R"))])
+        self.assertEqual(self.handler.binaries,
+                         [(scan_task.LINES_MIMETYPE, ["left", "right"])])
+        self.assertEqual(self.handler.texts, ["ok"])
+        self.assertFalse(self.task.busying)
+
+    def test_store_frame_error(self):
+        self.dispatch("scanimages", "lines")
+        while not self.camera.requests:
+            self.step()
+        # Analysis queue of camera service is full
+        self.camera.fail("RESOURCE_BUSY")
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["error RESOURCE_BUSY"])
+        self.assertEqual(self.camera.history, [("store", "L")])
+        self.assertEqual(self.task.mainboard.cmds[-1], "X1E0")
+        self.assertFalse(self.task.busying)
+
+    def test_laser_lines_error(self):
+        self.dispatch("scanimages", "lines")
+        while not self.camera.history or \
+                self.camera.history[-1][0] != "lines":
+            self.step()
+        self.camera.fail("BAD_PARAMS", "NO_FRAME")
+
+        self.run_until_idle()
+        self.assertEqual(self.handler.texts, ["error BAD_PARAMS NO_FRAME"])
+        self.assertEqual(self.handler.binaries, [])
+        self.assertFalse(self.task.busying)
+
+
+class FakeIoWatcher(object):
+    callback = None
+    active = False
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+
+class CameraInterfaceTest(unittest.TestCase):
+    def setUp(self):
+        self.sock, self.service = socket.socketpair()
+        self.camera = scan_task.CameraInterface.__new__(
+            scan_task.CameraInterface)
+        self.camera.sock = self.sock
+        self.camera.unpacker = msgpack.Unpacker()
+        self.camera.watcher = FakeIoWatcher()
+        self.results = []
+        self.errors = []
+
+    def tearDown(self):
+        self.sock.close()
+        self.service.close()
+
+    def reply(self, payload):
+        self.service.send(msgpack.packb(payload))
+        self.camera.watcher.callback(self.camera.watcher, 0)
+
+    def test_laser_lines(self):
+        self.camera.async_laser_lines("O", ("L", "R"), self.results.append,
+                                      self.errors.append)
+        self.assertEqual(msgpack.unpackb(self.service.recv(4096)),
+                         [7, 0, "O", ["L", "R"]])
+        self.reply(("ok", ["left", "right"]))
+        self.assertEqual(self.results, [["left", "right"]])
+        self.assertEqual(self.errors, [])
+        self.assertFalse(self.camera.watcher.active)
+
+    def test_error_reply(self):
+        def errback(*args):
+            self.errors.append(args)
+
+        self.camera.async_store_frame("L", self.results.append, errback)
+        self.reply(("er", "HARDWARE_ERROR", "CAMERA", "0"))
+        self.camera.async_laser_lines("O", ("L", "R"), self.results.append,
+                                      errback)
+        self.reply(("er", "BAD_PARAMS", "NO_FRAME"))
+
+        self.assertEqual(self.results, [])
+        self.assertEqual(self.errors, [("HARDWARE_ERROR", "CAMERA", "0"),
+                                       ("BAD_PARAMS", "NO_FRAME")])
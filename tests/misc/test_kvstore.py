@@ -0,0 +1,107 @@
+from tempfile import mkdtemp
+from shutil import rmtree
+import unittest
+import os
+
+from fluxmonitor.misc.kvstore import KVStore
+
+
+class FakeGeneration(object):
+    value = 0
+
+    def get(self):
+        return self.value
+
+    def bump(self):
+        self.value += 1
+
+
+class KVStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "meta.db")
+        self.legacy = os.path.join(self.tmpdir, "meta")
+
+    def tearDown(self):
+        KVStore._caches.clear()
+        rmtree(self.tmpdir)
+
+    def test_set_get_delete(self):
+        s = KVStore(self.filename)
+        self.assertIsNone(s["nickname"])
+        s["nickname"] = "Apple"
+        self.assertEqual(s["nickname"], "Apple")
+        self.assertIn("nickname", s)
+
+        # Another instance (or process) sees the change
+        KVStore._caches.clear()
+        self.assertEqual(KVStore(self.filename)["nickname"], "Apple")
+
+        del s["nickname"]
+        del s["not_exist"]
+        self.assertNotIn("nickname", s)
+        self.assertFalse(os.path.exists(self.filename + ".tmp"))
+
+    def test_batch(self):
+        s = KVStore(self.filename)
+        s["b"] = "2"
+        with s.batch() as b:
+            b["a"] = "1"
+            b["c"] = "3"
+            del b["b"]
+        self.assertEqual(sorted(s.keys()), ["a", "c"])
+
+    def test_external_change(self):
+        s1 = KVStore(self.filename)
+        s1["leveling"] = "0 0 0"
+        self.assertEqual(s1["leveling"], "0 0 0")
+
+        # Simulate another process writing the file
+        KVStore._caches.clear()
+        KVStore(self.filename)["leveling"] = "1 1 1"
+        self.assertEqual(s1["leveling"], "1 1 1")
+
+    def test_migrate(self):
+        os.makedirs(self.legacy)
+        with open(os.path.join(self.legacy, "nickname"), "w") as f:
+            f.write("Banana")
+        with open(os.path.join(self.legacy, "broadcast"), "w") as f:
+            f.write("L")
+
+        s = KVStore(self.filename, legacy_dir=self.legacy)
+        self.assertEqual(s["nickname"], "Banana")
+        self.assertTrue(os.path.exists(self.filename))
+
+        # Legacy files are not read again after migrated
+        with open(os.path.join(self.legacy, "nickname"), "w") as f:
+            f.write("Cherry")
+        KVStore._caches.clear()
+        self.assertEqual(s["nickname"], "Banana")
+        self.assertEqual(s["broadcast"], "L")
+
+    def test_write_before_migrate(self):
+        os.makedirs(self.legacy)
+        with open(os.path.join(self.legacy, "nickname"), "w") as f:
+            f.write("Banana")
+
+        s = KVStore(self.filename, legacy_dir=self.legacy)
+        s["broadcast"] = "A"
+        self.assertEqual(s["nickname"], "Banana")
+        self.assertEqual(s["broadcast"], "A")
+
+    def test_generation(self):
+        gen = FakeGeneration()
+        s = KVStore(self.filename, generation=gen)
+        s["nickname"] = "Apple"
+        self.assertEqual(gen.value, 1)
+
+        # Write without bumping generation, cached value is still used
+        with open(self.filename + ".tmp", "wb") as f:
+            f.write(open(self.filename, "rb").read().replace("Apple",
+                                                             "Mango"))
+        os.rename(self.filename + ".tmp", self.filename)
+        self.assertEqual(s["nickname"], "Apple")
+
+        # Another process bumped generation
+        gen.bump()
+        self.assertEqual(s["nickname"], "Mango")
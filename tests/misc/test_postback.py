@@ -0,0 +1,75 @@
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+import unittest
+
+from fluxmonitor.misc.postback import PostbackWorker
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.paths.append(self.path)
+        code = server.codes.pop(0) if server.codes else 200
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class PostbackWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.paths = []
+        self.server.codes = []
+        self.thread = Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.url = "http://127.0.0.1:%i" % self.server.server_port
+        self.worker = PostbackWorker(maxsize=2, timeout=1.0, retries=2,
+                                     backoff=0.01)
+
+    def tearDown(self):
+        self.worker.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_deliver(self):
+        self.worker.submit(self.url + "/status?st_id=64")
+        self.worker.submit(self.url + "/status?st_id=128")
+        self.worker.close()
+        self.assertEqual(self.server.paths,
+                         ["/status?st_id=64", "/status?st_id=128"])
+        metrics = self.worker.get_metrics()
+        self.assertEqual(metrics["delivered"], 2)
+        self.assertEqual(metrics["latency"]["count"], 2)
+
+    def test_retry(self):
+        self.server.codes = [503, 502]
+        self.assertTrue(self.worker.deliver(self.url + "/a", 0))
+        self.assertEqual(len(self.server.paths), 3)
+        self.assertEqual(self.worker.retried, 2)
+
+        self.server.codes = [404]
+        self.assertFalse(self.worker.deliver(self.url + "/b", 0))
+        self.assertEqual(self.worker.failed, 1)
+
+    def test_connection_error(self):
+        self.server.server_close()
+        self.assertFalse(self.worker.deliver(self.url + "/a", 0))
+        self.assertEqual(self.worker.retried, 2)
+        self.assertEqual(self.worker.failed, 1)
+
+    def test_queue_full(self):
+        # Worker thread not started, oldest request is dropped
+        worker = PostbackWorker(maxsize=2, autostart=False)
+        for i in range(4):
+            worker.submit(self.url + "/%i" % i)
+        self.assertEqual(worker.dropped, 2)
+        self.assertEqual(worker.queue.qsize(), 2)
+
+        worker.start()
+        worker.close()
+        self.assertEqual(self.server.paths, ["/2", "/3"])
+        self.assertEqual(worker.get_metrics()["delivered"], 2)
@@ -0,0 +1,26 @@
+from math import isnan
+import unittest
+
+import cv2
+
+from fluxmonitor.misc.scan_checking import ScanChecking
+from tests.fixtures import Fixtures
+
+
+class LaserLineTest(unittest.TestCase):
+    def test_find_laser_line(self):
+        # Fixture laser line is at x = 20.25 + 0.2 * (row - 8) from row 8
+        img_off = cv2.imread(Fixtures.scan.path("laser_off.png"))
+        img_on = cv2.imread(Fixtures.scan.path("laser_on.png"))
+        result = ScanChecking.find_laser_line(img_off, img_on)
+
+        self.assertEqual(len(result), 48)
+        for row in range(8):
+            self.assertTrue(isnan(result[row]))
+        for row in range(8, 48):
+            self.assertAlmostEqual(result[row], 20.25 + 0.2 * (row - 8),
+                                   delta=0.1)
+
+        # Same frame has no laser line
+        result = ScanChecking.find_laser_line(img_off, img_off)
+        self.assertTrue(all(isnan(x) for x in result))
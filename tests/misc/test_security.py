@@ -41,6 +41,27 @@ class MiscSecurityTest(unittest.TestCase):
         self.assertTrue(security.is_trusted_remote(keyobj=keyobj))
         self.assertTrue(security.is_trusted_remote(access_id=access_id))
 
+    def test_trusted_key_index(self):
+        ac = security.AccessControl()
+        keyobj = security.get_keyobj(der=PUBLICKEY_1)
+        access_id = ac.add(keyobj, label="studio")
+
+        cached = ac.get_keyobj(access_id=access_id)
+        self.assertIs(ac.get_keyobj(access_id=access_id), cached)
+        self.assertEqual(ac.get_metadata(access_id)["label"], "studio")
+
+        # Removed by another process
+        ac.storage.unlink(access_id)
+        self.assertIsNone(ac.get_keyobj(access_id=access_id))
+
+        ac.add(keyobj, label="usb")
+        self.assertIsNot(ac.get_keyobj(access_id=access_id), cached)
+        self.assertEqual(ac.get_metadata(access_id)["label"], "usb")
+
+        ac.remove_all()
+        self.assertIsNone(ac.get_keyobj(access_id=access_id))
+        self.assertEqual(ac.get_metadata(access_id), {})
+
     def test_validate_timestamp(self):
         t = time()
         self.assertFalse(validate_timestamp((t - 40, b"a" * 128)))
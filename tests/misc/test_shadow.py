@@ -0,0 +1,104 @@
+import unittest
+import json
+
+from fluxmonitor.misc.shadow import ShadowReporter, diff_state
+
+
+class FakeMQTTClient(object):
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, topic, payload, qos):
+        self.messages.append((topic, json.loads(payload)))
+        return True
+
+    def pop_reported(self):
+        reported = [m[1]["state"]["reported"] for m in self.messages]
+        self.messages = []
+        return reported
+
+
+def make_status(st_id=16, progress=0.0, timestamp=0.0, **kw):
+    st = {"timestamp": timestamp, "st_id": st_id, "progress": progress,
+          "head_type": "EXTRUDER", "err_label": "", "ip_addr": "10.0.0.3"}
+    st.update(kw)
+    return st
+
+
+class ShadowReporterTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeMQTTClient()
+        self.reporter = ShadowReporter(window=10.0, budget=1024)
+
+    def tick(self, state, now):
+        self.reporter.update(state, now)
+        return self.reporter.flush(
+            lambda buf: self.client.publish("shadow", buf, 0), now)
+
+    def test_diff_state(self):
+        self.assertEqual(
+            diff_state({"a": 1, "t": {"x": 1, "y": 2}, "z": 0},
+                       {"a": 1, "t": {"x": 1, "y": 3}}),
+            {"t": {"y": 3}, "z": None})
+
+    def test_delta_and_coalesce(self):
+        self.assertTrue(self.tick(make_status(), 0))
+        self.assertEqual(self.client.pop_reported(), [make_status()])
+
+        # Timestamp only is not a change
+        self.assertFalse(self.tick(make_status(timestamp=3.0), 3))
+
+        # Progress changes are coalesced in window
+        for i, now in enumerate((6, 9, 12)):
+            self.assertFalse(self.tick(
+                make_status(progress=0.1 * (i + 1), timestamp=now), now))
+        self.assertTrue(self.tick(
+            make_status(progress=0.3, timestamp=16.0), 16))
+        self.assertEqual(self.client.pop_reported(),
+                         [{"progress": 0.3, "timestamp": 16.0}])
+
+        # Status change is urgent
+        self.assertTrue(self.tick(
+            make_status(st_id=48, progress=0.3, timestamp=17.0), 17))
+        self.assertEqual(self.client.pop_reported(),
+                         [{"st_id": 48, "timestamp": 17.0}])
+
+    def test_nested_and_removed(self):
+        self.tick(make_status(telemetry={"prog": 0.1, "rt": [200.0]}), 0)
+        self.client.pop_reported()
+        self.assertFalse(
+            self.tick(make_status(telemetry={"prog": 0.1, "rt": [201.0]}), 20))
+        self.tick(make_status(telemetry={"prog": 0.1, "rt": [201.0]}), 30)
+        self.assertEqual(self.client.pop_reported(),
+                         [{"telemetry": {"rt": [201.0]}}])
+        self.tick(make_status(st_id=64), 21)
+        self.assertEqual(self.client.pop_reported(),
+                         [{"st_id": 64, "telemetry": None}])
+
+    def test_budget(self):
+        self.reporter.budget = 200
+        self.tick(make_status(telemetry={"pos": [1.0] * 40}), 0)
+        self.tick(make_status(telemetry={"pos": [1.0] * 40}), 3)
+        reported = self.client.pop_reported()
+        self.assertEqual(len(reported), 2)
+        self.assertNotIn("telemetry", reported[0])
+        self.assertEqual(reported[1].keys(), ["telemetry"])
+        self.assertFalse(self.tick(make_status(
+            telemetry={"pos": [1.0] * 40}), 4))
+
+    def test_failed_publish(self):
+        def publish(buf):
+            raise RuntimeError("publishQueueDisabled")
+
+        self.reporter.update(make_status(), 0)
+        self.assertRaises(RuntimeError, self.reporter.flush, publish, 0)
+        self.assertTrue(self.tick(make_status(), 1))
+        self.assertEqual(self.client.pop_reported(), [make_status()])
+
+    def test_heartbeat(self):
+        self.reporter.heartbeat = 100
+        self.tick(make_status(), 0)
+        self.client.pop_reported()
+        self.assertFalse(self.tick(make_status(), 50))
+        self.assertTrue(self.tick(make_status(), 100))
+        self.assertEqual(self.client.pop_reported(), [make_status()])
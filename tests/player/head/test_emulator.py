@@ -0,0 +1,85 @@
+from fluxmonitor.diagnosis.toolhead_emulator import (
+    ToolheadEmulator, ThermalModel, ER_RESET, build_message, parse_message)
+from fluxmonitor.player.head_controller import HeadController
+from .sharedlib import SharedTestCase
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class ProtocolTest(SharedTestCase):
+    def test_framing(self):
+        self.assertEqual(build_message("HELLO"), "1 HELLO *115\n")
+        self.assertEqual(build_message("H:0 T:200.0"), "1 H:0 T:200.0 *17\n")
+        self.assertEqual(parse_message("1 PING *33"), "PING")
+        self.assertIsNone(parse_message("1 PING *34"))
+
+
+class ThermalModelTest(SharedTestCase):
+    def test_first_order(self):
+        clock = FakeClock()
+        m = ThermalModel(ambient=30.0, tau=10.0, clock=clock)
+        m.set_target(200.0)
+        clock.t += 10.0
+        # One time constant reaches 63.2% of the step
+        self.assertAlmostEqual(m.update(), 30 + 170 * 0.632, delta=0.5)
+        clock.t += 100.0
+        self.assertTrue(m.is_reached())
+
+        m.set_target(0)
+        clock.t += 100.0
+        self.assertAlmostEqual(m.update(), 30.0, delta=0.1)
+
+
+class EmulatorExtruderTest(SharedTestCase):
+    def setUp(self):
+        SharedTestCase.setUp(self)
+        self.clock = FakeClock()
+        self.emulator = ToolheadEmulator(
+            self.lsock, latency=0, clock=self.clock,
+            thermal=ThermalModel(ambient=30.0, tau=10.0, clock=self.clock))
+        self.t = HeadController(self.rsock.fileno(),
+                                required_module="EXTRUDER")
+
+    def roundtrip(self):
+        self.emulator.handle_recv()
+        self.emulator.process()
+        self.t.handle_recv()
+
+    def test_bootstrap_and_heatup(self):
+        self.t.bootstrap()
+        self.roundtrip()
+        self.assertTrue(self.t.ready)
+        self.assertEqual(self.t.module_name, "EXTRUDER")
+
+        self.t.ext.set_heater(0, 200)
+        self.roundtrip()
+        self.assertTrue(self.t.sendable())
+        self.assertFalse(self.t.allset)
+
+        self.clock.t += 100.0
+        self.t.lastupdate = 0
+        self.t.patrol()
+        self.roundtrip()
+        self.assertEqual(self.t.status["tt"], (200.0, ))
+        self.assertTrue(self.t.allset)
+        self.assertEqual(self.emulator.heatup_times, [100.0])
+
+    def test_reset_injection(self):
+        self.t.bootstrap()
+        self.roundtrip()
+
+        self.emulator.inject_error(ER_RESET)
+        self.t.lastupdate = 0
+        self.t.patrol()
+        self.assertRaises(RuntimeError, self.roundtrip)
+        self.assertFalse(self.t.ready)
+
+        self.t.bootstrap()
+        self.roundtrip()
+        self.assertTrue(self.t.ready)
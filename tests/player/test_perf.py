@@ -0,0 +1,86 @@
+import unittest
+
+from fluxmonitor.player.perf import PlayerPerf, Histogram
+from fluxmonitor.player import perf as perf_module
+
+
+class FakeMainboard(object):
+    _ln = 0
+    _resend_inhibit = 0
+    send_retry = 0
+    buffered_cmd_size = 0
+
+    def send(self, n=1):
+        self._ln += n
+        self.buffered_cmd_size += n
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets(self):
+        h = Histogram(buckets=(1, 10))
+        for sec in (0.0005, 0.005, 0.008, 0.5):
+            h.add(sec)
+        d = h.to_dict()
+        self.assertEqual(d["count"], 4)
+        self.assertEqual(d["buckets"], [1, 2, 1])
+        self.assertAlmostEqual(d["max"], 500.0)
+
+
+class PlayerPerfTest(unittest.TestCase):
+    def test_mainboard_window(self):
+        mb = FakeMainboard()
+        perf = PlayerPerf(bufsize=4)
+
+        mb.send(3)
+        perf.sync_mainboard(mb)
+        self.assertEqual(perf.mb_window.cur, 3)
+        self.assertEqual(perf.ack_latency.count, 0)
+
+        mb.buffered_cmd_size = 1
+        perf.sync_mainboard(mb)
+        self.assertEqual(perf.ack_latency.count, 2)
+
+        mb.send_retry = 2
+        mb._resend_inhibit = 3
+        perf.sync_mainboard(mb)
+        perf.sync_mainboard(mb)
+        self.assertEqual(perf.timeouts, 2)
+        self.assertEqual(perf.resends, 1)
+
+        # Line number restarts after mainboard bootstrap
+        mb._ln = mb.buffered_cmd_size = 0
+        mb.send(1)
+        perf.sync_mainboard(mb)
+        mb.buffered_cmd_size = 0
+        perf.sync_mainboard(mb)
+        self.assertEqual(perf.ack_latency.count, 3)
+
+    def test_sent_timestamp(self):
+        mb = FakeMainboard()
+        perf = PlayerPerf(bufsize=4)
+
+        # Sent outside recv path, acknowledged one second later
+        perf_time = perf_module.time
+        try:
+            perf_module.time = lambda: 1000.0
+            mb.send(2)
+            perf.on_mainboard_sent(mb)
+            perf_module.time = lambda: 1001.0
+            perf.sync_mainboard(mb)
+            mb.buffered_cmd_size = 0
+            perf.sync_mainboard(mb)
+        finally:
+            perf_module.time = perf_time
+
+        d = perf.ack_latency.to_dict()
+        self.assertEqual(d["count"], 2)
+        self.assertAlmostEqual(d["max"], 1000.0)
+
+    def test_head_wait(self):
+        perf = PlayerPerf(bufsize=4)
+        perf.set_head_waiting(True)
+        perf.set_head_waiting(True)
+        perf.set_head_waiting(False)
+        d = perf.to_dict()
+        self.assertEqual(d["head_wait_count"], 1)
+        self.assertGreaterEqual(d["head_wait"], 0)
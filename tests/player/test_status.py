@@ -0,0 +1,64 @@
+import unittest
+
+from fluxmonitor.player.status import (StatusTracker, pack_status,
+                                       unpack_status, is_status_message)
+
+
+class StatusTrackerTest(unittest.TestCase):
+    def test_pack_unpack(self):
+        buf = pack_status(7, {"st_id": 16, "prog": 0.5, "pos": (1.0, 2.0)})
+        self.assertTrue(is_status_message(buf))
+        self.assertFalse(is_status_message('{"st_id": 16}'))
+        seq, st = unpack_status(buf)
+        self.assertEqual(seq, 7)
+        self.assertEqual(st, {"st_id": 16, "prog": 0.5, "pos": (1.0, 2.0)})
+
+    def test_sequence(self):
+        t = StatusTracker()
+        self.assertTrue(t.update({"st_id": 4, "time_total": 1.0}))
+        self.assertEqual(t.seq, 1)
+
+        # Time fields do not trigger a new sequence
+        self.assertFalse(t.update({"st_id": 4, "time_total": 2.0}))
+        self.assertEqual(t.seq, 1)
+
+        self.assertTrue(t.update({"st_id": 16, "time_total": 3.0}))
+        self.assertEqual(t.seq, 2)
+
+        # NaN progress is not a change
+        t.update({"st_id": 16, "prog": float("nan")})
+        self.assertFalse(t.update({"st_id": 16, "prog": float("nan")}))
+        self.assertEqual(unpack_status(t.pack())[0], t.seq)
+
+    def test_inplace_update(self):
+        # Executor returns the same dict and updates it in place
+        st = {"st_id": 16, "prog": 0.1}
+        t = StatusTracker()
+        self.assertTrue(t.update(st))
+        st["prog"] = 0.2
+        self.assertTrue(t.update(st))
+        self.assertEqual(t.seq, 2)
+        self.assertEqual(t.status, {"st_id": 16, "prog": 0.2})
+        self.assertFalse(t.update(st))
+
+    def test_unchanged_reply(self):
+        t = StatusTracker()
+        t.update({"st_id": 16, "prog": 0.1})
+        seq = t.seq
+        self.assertEqual(unpack_status(t.pack(since=seq)), (seq, None))
+        self.assertEqual(unpack_status(t.pack(since=seq - 1)),
+                         (seq, {"st_id": 16, "prog": 0.1}))
+
+    def test_unchanged_reply_after_inplace_update(self):
+        # Client holding current seq must get the new status after executor
+        # updated its status dict in place (REPORT MSGPACK <seq>)
+        st = {"st_id": 16, "prog": 0.1}
+        t = StatusTracker()
+        t.update(st)
+        seq = t.seq
+        st["prog"] = 0.2
+        t.update(st)
+        self.assertEqual(unpack_status(t.pack(since=seq)),
+                         (seq + 1, {"st_id": 16, "prog": 0.2}))
+        self.assertEqual(unpack_status(t.pack(since=seq + 1)),
+                         (seq + 1, None))
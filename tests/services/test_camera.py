@@ -0,0 +1,237 @@
+from collections import deque
+from threading import Event, Timer
+import unittest
+import time
+
+import pyev
+
+from fluxmonitor.services import camera
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeInterface(object):
+    def __init__(self):
+        self.clients = []
+
+
+class FakeCamera(object):
+    def __init__(self, clock):
+        self.clock = clock
+        self.ts = 0
+        self.fetched = 0
+
+    def live(self):
+        if self.clock() - self.ts > 0.1:
+            self.fetch()
+        return self.ts
+
+    def fetch(self, clear_cache=4):
+        self.fetched += 1
+        self.ts = self.clock()
+        self.imagebytes = "jpeg%i" % self.fetched
+
+    @property
+    def imagefile(self):
+        return ("image/jpeg", len(self.imagebytes), None)
+
+
+class FakeCameras(object):
+    released = False
+    rotate = 0
+
+    def __init__(self, clock=None):
+        self.camera = FakeCamera(clock)
+
+    def __getitem__(self, camera_id):
+        return self.camera
+
+    def release(self):
+        self.released = True
+
+
+class FakeSubscriber(object):
+    def __init__(self, ts, spf):
+        self.ts = ts
+        self.spf = spf
+        self.frames = 0
+
+    def next_frame(self):
+        self.frames += 1
+
+    def on_error(self):
+        pass
+
+
+class FakeCameraService(camera.CameraService):
+    def __init__(self, clock=None):
+        # Skip camera and interfaces bootstrap
+        self.loop = pyev.Loop()
+        self.cameras = FakeCameras(clock)
+        self.capture_seq = 0
+        self._live_ts = None
+        self.internal_ifce = FakeInterface()
+        self.public_ifce = FakeInterface()
+        self.live_queue = deque()
+        self._scaled_frames = {}
+        self.live_timer = self.loop.timer(self.IDLE_INTERVAL,
+                                          self.IDLE_INTERVAL, self.on_live)
+
+
+class LiveScheduleTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._systime = camera.systime
+        camera.systime = self.clock
+        self.service = FakeCameraService()
+        self.service.public_ifce.clients.append(None)
+
+    def tearDown(self):
+        self.service.live_timer.stop()
+        camera.systime = self._systime
+
+    def test_schedule_from_last_frame(self):
+        s = self.service
+        # Frame sent 0.1s ago, 4 fps subscriber is due in 0.15s
+        h = FakeSubscriber(self.clock.t - 0.1, 0.25)
+        s.add_to_live_queue(h)
+        self.assertAlmostEqual(s.live_timer.remaining, 0.15, delta=0.01)
+
+        # A later subscriber does not delay the timer
+        s.add_to_live_queue(FakeSubscriber(self.clock.t, 1.0))
+        self.assertAlmostEqual(s.live_timer.remaining, 0.15, delta=0.01)
+
+        # Idle timer is replaced by an earlier deadline
+        s.live_queue.clear()
+        s.update_live_timer()
+        s.live_timer.stop()
+        s.update_live_timer()
+        self.assertAlmostEqual(s.live_timer.remaining, s.IDLE_INTERVAL,
+                               delta=0.01)
+        s.add_to_live_queue(h)
+        self.assertAlmostEqual(s.live_timer.remaining, 0.15, delta=0.01)
+
+    def test_serve_due_subscribers(self):
+        s = self.service
+        fast = FakeSubscriber(self.clock.t - 0.25, 0.25)
+        slow = FakeSubscriber(self.clock.t - 0.25, 1.0)
+        s.add_to_live_queue(fast)
+        s.add_to_live_queue(slow)
+
+        s.live_timer.stop()
+        s.on_live()
+        self.assertEqual(fast.frames, 1)
+        self.assertEqual(slow.frames, 0)
+        self.assertEqual(list(s.live_queue), [slow])
+        # Next tick when slow subscriber is due
+        self.assertAlmostEqual(s.live_timer.remaining, 0.75, delta=0.01)
+
+    def test_release_camera_when_idle(self):
+        s = self.service
+        s.public_ifce.clients.pop()
+        s.on_live()
+        self.assertTrue(s.cameras.released)
+        self.assertFalse(s.live_timer.active)
+
+
+class FrameSeqTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self._systime = camera.systime
+        camera.systime = self.clock
+        self.service = FakeCameraService(self.clock)
+        self.camera = self.service.cameras[0]
+
+    def tearDown(self):
+        self.service.live_timer.stop()
+        camera.systime = self._systime
+
+    def test_live_after_capture(self):
+        s = self.service
+        seq, buf = s.prepare_frame(0)
+        self.assertEqual((seq, buf), (1, "jpeg1"))
+
+        # Live preview serves the captured frame, it is the same capture
+        s.live(0)
+        self.assertEqual(s.capture_seq, 1)
+        self.assertEqual(s.prepare_frame(0, reuse=True), (1, "jpeg1"))
+        self.assertEqual(self.camera.fetched, 1)
+
+        self.clock.t += 0.5
+        s.live(0)
+        self.assertEqual(s.prepare_frame(0, reuse=True), (2, "jpeg2"))
+        s.live(0)
+        self.assertEqual(s.capture_seq, 2)
+        self.assertEqual(s.prepare_frame(0), (3, "jpeg3"))
+
+
+class AnalysisWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = pyev.Loop()
+        self.worker = camera.AnalysisWorker(self.loop, maxsize=1)
+        self.results = []
+        self.started = Event()
+        self.unblock = Event()
+
+    def tearDown(self):
+        self.unblock.set()
+        self.worker.close()
+
+    def blocking_job(self):
+        self.started.set()
+        self.unblock.wait(5)
+        return "done"
+
+    def on_result(self, ret, error):
+        self.results.append((ret, error))
+
+    def wait_results(self, count):
+        # Results are delivered to the loop through async watcher
+        timeout = time.time() + 2
+        while len(self.results) < count and time.time() < timeout:
+            self.loop.start(pyev.EVRUN_NOWAIT)
+            time.sleep(0.01)
+
+    def test_resource_busy(self):
+        self.worker.submit(self.blocking_job, self.on_result)
+        self.assertTrue(self.started.wait(2))
+        self.worker.submit(lambda: "queued", self.on_result)
+
+        with self.assertRaises(RuntimeError) as cm:
+            self.worker.submit(lambda: "rejected", self.on_result)
+        self.assertEqual(cm.exception.args, ("RESOURCE_BUSY", ))
+
+        self.unblock.set()
+        self.wait_results(2)
+        self.assertEqual(self.results, [("done", None), ("queued", None)])
+
+    def test_error_delivery(self):
+        def failed_job():
+            raise RuntimeError("HARDWARE_ERROR", "CAMERA")
+
+        self.worker.submit(failed_job, self.on_result)
+        self.wait_results(1)
+        self.worker.submit(lambda: 1 / 0, self.on_result)
+        self.wait_results(2)
+        self.assertIsNone(self.results[0][0])
+        self.assertEqual(self.results[0][1].args, ("HARDWARE_ERROR", "CAMERA"))
+        self.assertIsInstance(self.results[1][1], ZeroDivisionError)
+
+    def test_close_with_full_queue(self):
+        self.worker.submit(self.blocking_job, self.on_result)
+        self.assertTrue(self.started.wait(2))
+        self.worker.submit(lambda: "dropped", self.on_result)
+
+        Timer(0.1, self.unblock.set).start()
+        begin = time.time()
+        self.worker.close()
+        self.assertLess(time.time() - begin, 1.0)
+        self.assertFalse(self.worker.thread.is_alive())
+        self.wait_results(1)
+        self.assertNotIn(("dropped", None), self.results)
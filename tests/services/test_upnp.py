@@ -0,0 +1,167 @@
+import unittest
+import pytest
+import socket
+
+import pyev
+
+from fluxmonitor.services import upnp
+
+
+class FakeKey(object):
+    def __init__(self):
+        self.sign_counter = 0
+
+    def sign(self, buf):
+        self.sign_counter += 1
+        return "SIGNATURE"
+
+    def export_pubkey_der(self):
+        return "PUBKEY"
+
+
+class FakeMeta(object):
+    nickname = "Apple"
+
+
+class FakeServer(object):
+    def __init__(self):
+        self.meta = FakeMeta()
+        self.master_key = FakeKey()
+        self.slave_pkey = FakeKey()
+        self.slave_pkey_ts = 1.0
+
+
+@pytest.mark.usefixtures("empty_security")
+class TouchResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeServer()
+        self.interface = upnp.InterfaceBaseV1(self.server)
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(("127.0.0.1", 0))
+        self.client.settimeout(0.5)
+
+    def tearDown(self):
+        self.interface.close()
+        self.client.close()
+
+    def test_cache(self):
+        buf = self.interface.get_touch_response()
+        self.assertEqual(self.interface.get_touch_response(), buf)
+        self.assertEqual(self.server.slave_pkey.sign_counter, 1)
+
+        self.server.meta.nickname = "Banana"
+        self.assertIn("name=Banana", self.interface.get_touch_response())
+        self.assertEqual(self.server.slave_pkey.sign_counter, 2)
+
+        self.server.slave_pkey_ts = 2.0
+        self.interface.get_touch_response()
+        self.assertEqual(self.server.slave_pkey.sign_counter, 3)
+
+    def test_rate_limit(self):
+        endpoint = self.client.getsockname()
+        self.interface.on_touch(endpoint)
+        self.interface.on_touch(endpoint)
+        self.assertTrue(self.client.recv(4096).startswith("FLUX"))
+        self.assertRaises(socket.timeout, self.client.recv, 4096)
+        self.assertFalse(self.interface.is_touch_limited("192.168.1.2"))
+
+    def test_rate_limit_sources(self):
+        ifce = self.interface
+        for i in range(upnp.TOUCH_SOURCE_LIMIT):
+            ifce.is_touch_limited("10.0.%i.%i" % (i // 256, i % 256))
+
+        # Burst from too many sources, new source is refused
+        self.assertTrue(ifce.is_touch_limited("192.168.1.3"))
+        self.assertEqual(len(ifce._touch_sources), upnp.TOUCH_SOURCE_LIMIT)
+
+        # Expired sources are pruned
+        for key in ifce._touch_sources:
+            ifce._touch_sources[key] -= upnp.TOUCH_MIN_INTERVAL
+        self.assertFalse(ifce.is_touch_limited("192.168.1.3"))
+        self.assertEqual(len(ifce._touch_sources), 1)
+
+
+class FakeNetworkMonitor(object):
+    def __init__(self):
+        self.ipaddrs = []
+
+    def read(self):
+        return True
+
+    def full_status(self):
+        return {"wlan0": {"ipaddr": list(self.ipaddrs)}}
+
+
+class FakeUpnpService(upnp.UpnpService):
+    def __init__(self, storage):
+        # Skip service bootstrap (root check, RSA keys, netlink)
+        self.interface_specs = {}
+        self.storage = storage
+        self.loop = pyev.Loop()
+        self.meta = FakeMeta()
+        self.meta.mversion = 0
+        self.master_key = FakeKey()
+        self.slave_pkey = FakeKey()
+        self.slave_pkey_ts = 1.0
+        self.nw_monitor = FakeNetworkMonitor()
+
+    def get_interface_specs(self):
+        backup = upnp.meta_storage
+        upnp.meta_storage = lambda: self.storage
+        try:
+            return super(FakeUpnpService, self).get_interface_specs()
+        finally:
+            upnp.meta_storage = backup
+
+    def interfaces(self):
+        return dict((slot, getattr(self, slot)[0])
+                    for slot in upnp.INTERFACE_SLOTS if getattr(self, slot))
+
+
+@pytest.mark.usefixtures("empty_security")
+class ReconcileTest(unittest.TestCase):
+    def setUp(self):
+        self.service = FakeUpnpService({"bare": "N", "broadcast": "N"})
+
+    def tearDown(self):
+        self.service.teardown_upnp_sock()
+
+    def test_address_change(self):
+        s = self.service
+        s.reconcile_upnp_sock()
+        ifces = s.interfaces()
+        self.assertEqual(sorted(ifces.keys()), ["mcst", "ucst"])
+
+        # DHCP renew, address lost, new address
+        for ipaddrs in (["192.168.1.5"], [], ["192.168.1.9"],
+                        ["192.168.1.9", "10.0.0.3"]):
+            s.nw_monitor.ipaddrs = ipaddrs
+            s.on_network_changed(None, None)
+            self.assertEqual(s.ipaddress, ipaddrs)
+            self.assertEqual(s.interfaces(), ifces)
+
+        s.storage["broadcast"] = "A"
+        s.reconcile_upnp_sock()
+        current = s.interfaces()
+        self.assertIn("bcst", current)
+        self.assertIs(current["mcst"], ifces["mcst"])
+        self.assertIs(current["ucst"], ifces["ucst"])
+
+        s.storage["bare"] = "Y"
+        s.reconcile_upnp_sock()
+        for slot, ifce in s.interfaces().items():
+            self.assertIsNot(ifce, current[slot])
+            self.assertEqual(ifce.PROTO_VER, 2)
+
+    def test_metadata_change(self):
+        s = self.service
+        s.reconcile_upnp_sock()
+        ucst = s.ucst[0]
+        first = ucst._touch_payload
+        s.meta.mversion = 1
+        s.slave_pkey_ts = None
+        s.check_metadata()
+        self.assertIs(s.ucst[0], ucst)
+        self.assertNotEqual(s.slave_pkey_ts, None)
+        self.assertIsNone(ucst._touch_payload_buf)
+        self.assertNotEqual(ucst._touch_payload, first)
@@ -0,0 +1,165 @@
+import unittest
+
+from fluxmonitor import storage
+
+
+class FakeShm(object):
+    """In process replacement of sysv_ipc.SharedMemory. on_read is invoked
+    after each read, it is used to run a writer between reader steps."""
+
+    def __init__(self, size):
+        self.buf = bytearray(size)
+        self.on_read = None
+        self.reads = []
+
+    def read(self, size, offset=0):
+        ret = bytes(self.buf[offset:offset + size])
+        self.reads.append(offset)
+        if self.on_read:
+            hook, self.on_read = self.on_read, None
+            # Hook returns True to keep itself installed
+            if hook(offset):
+                self.on_read = hook
+        return ret
+
+    def write(self, buf, offset=0):
+        self.buf[offset:offset + len(buf)] = buf
+
+    def detach(self):
+        pass
+
+
+def create_metadata(shm):
+    meta = storage.Metadata.__new__(storage.Metadata)
+    meta.shm = shm
+    return meta
+
+
+class SeqlockTest(unittest.TestCase):
+    def setUp(self):
+        self.shm = FakeShm(4096)
+        self.reader = create_metadata(self.shm)
+        self.writer = create_metadata(self.shm)
+        self.writer.cloud_status = (1, "old")
+
+    def test_retry_on_changed_sequence(self):
+        def write_during_read(offset):
+            if offset == 2048:
+                self.writer.cloud_status = (2, "new")
+            else:
+                return True
+
+        self.shm.on_read = write_during_read
+        self.shm.reads = []
+        self.assertEqual(self.reader.cloud_status, (2, "new"))
+        # Region is read again after sequence changed
+        self.assertEqual(self.shm.reads.count(2048), 2)
+
+    def test_retry_on_odd_sequence(self):
+        # Writer started but not finished
+        seq = self.shm.read(4, storage.SEQ_CLOUD)
+        self.shm.write(b"\x07\x00\x00\x00", storage.SEQ_CLOUD)
+        self.shm.write(b"\xff" * 16, 2048)
+        count = [0]
+
+        def finish_write(offset):
+            count[0] += 1
+            if count[0] < 5:
+                return True
+            self.shm.write(seq, storage.SEQ_CLOUD)
+            self.writer.cloud_status = (3, "done")
+
+        self.shm.on_read = finish_write
+        self.assertEqual(self.reader.cloud_status, (3, "done"))
+
+    def test_killed_writer(self):
+        # Sequence stays odd, reader gives up after retries and next writer
+        # recovers the lock
+        self.shm.write(b"\x07\x00\x00\x00", storage.SEQ_CLOUD)
+        self.assertEqual(self.reader.cloud_status, (1, "old"))
+        self.writer.cloud_status = (4, "recovered")
+        self.assertEqual(self.shm.read(1, storage.SEQ_CLOUD), b"\x0a")
+        self.assertEqual(self.reader.cloud_status, (4, "recovered"))
+
+    def test_snapshot_consistency(self):
+        self.writer.cloud_hash = b"a" * 32
+
+        def write_during_snapshot(offset):
+            if offset == 0:
+                # Both fields change after reader copied the segment
+                self.writer.cloud_status = (5, "new")
+                self.writer.cloud_hash = b"b" * 32
+            else:
+                return True
+
+        self.shm.on_read = write_during_snapshot
+        snapshot = self.reader.snapshot()
+        self.assertEqual(snapshot["cloud_status"], (5, "new"))
+        self.assertEqual(snapshot["cloud_hash"], b"b" * 32)
+
+    def test_snapshot_waits_writer(self):
+        self.shm.write(b"\x01\x00\x00\x00", storage.SEQ_NICKNAME)
+        count = [0]
+
+        def finish_write(offset):
+            count[0] += 1
+            if count[0] < 3:
+                return True
+            self.shm.write(b"\x02\x00\x00\x00", storage.SEQ_NICKNAME)
+
+        self.shm.on_read = finish_write
+        self.reader.snapshot()
+        # Segment is read again until no writer holds a lock
+        self.assertGreaterEqual(self.shm.reads.count(0), 3)
+
+
+def create_telemetry_region(shm):
+    region = storage.TelemetryRegion.__new__(storage.TelemetryRegion)
+    region.shm = shm
+    return region
+
+
+class TelemetryRegionTest(unittest.TestCase):
+    def setUp(self):
+        self.shm = FakeShm(storage.TELEMETRY_SIZE)
+        self.region = create_telemetry_region(self.shm)
+
+    def test_round_trip(self):
+        self.region.write({"st_id": 16, "pos": (1.0, 2.0, 3.0)})
+        doc = self.region.read()
+        self.assertEqual(doc["st_id"], 16)
+        self.assertEqual(doc["pos"], (1.0, 2.0, 3.0))
+        self.assertIn("timestamp", doc)
+
+        # Readers in other processes share the segment
+        other = create_telemetry_region(self.shm)
+        self.region.write({"st_id": 48})
+        self.assertEqual(other.read()["st_id"], 48)
+
+    def test_empty_region(self):
+        self.assertIsNone(self.region.read())
+
+    def test_version_mismatch(self):
+        self.region.write({"st_id": 16})
+        buf = storage.TELEMETRY_HEADER.unpack(
+            self.shm.read(storage.TELEMETRY_HEADER.size, 0))
+        self.shm.write(storage.TELEMETRY_HEADER.pack(
+            buf[0], storage.TELEMETRY_SCHEMA_VERSION + 1, *buf[2:]), 0)
+        self.assertIsNone(self.region.read())
+
+    def test_overflow(self):
+        self.assertRaises(SystemError, self.region.write,
+                          {"data": "x" * storage.TELEMETRY_SIZE})
+        self.assertIsNone(self.region.read())
+
+    def test_retry_during_write(self):
+        self.region.write({"st_id": 16})
+
+        def write_during_read(offset):
+            if offset == storage.TELEMETRY_HEADER.size:
+                self.region.write({"st_id": 48})
+            else:
+                return True
+
+        self.shm.on_read = write_during_read
+        self.assertEqual(self.region.read()["st_id"], 48)